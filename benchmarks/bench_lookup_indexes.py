@@ -0,0 +1,106 @@
+"""
+Latency of the create_careplan hot-path lookups at scale, with and without
+the indexes from migration 0005.
+
+Usage: python benchmarks/bench_lookup_indexes.py [n_patients] [n_lookups]
+
+Builds TEMP copies of the patient / careplan tables in the configured
+Postgres database (nothing persists), fills them with n_patients patients
+(default 1,000,000) and one care plan each — 2% still active — then times:
+
+- patient lookup:  WHERE first_name=.. AND last_name=.. AND date_of_birth=..
+- duplicate check: WHERE patient_id=.. AND status IN (active)
+"""
+
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+ACTIVE = "('pending', 'processing', 'partial')"
+
+
+def setup(cur, n):
+    cur.execute("""
+        CREATE TEMP TABLE bench_patient (LIKE careplan_patient INCLUDING DEFAULTS);
+        CREATE TEMP TABLE bench_careplan (LIKE careplan_careplan INCLUDING DEFAULTS);
+    """)
+    cur.execute("""
+        INSERT INTO bench_patient (id, first_name, last_name, date_of_birth, medications,
+                                   medications_canonical, allergies, health_conditions)
+        SELECT g, 'First' || (g %% 5000), 'Last' || (g / 5000), DATE '1930-01-01' + (g %% 20000),
+               'Metformin 500mg', 'metformin 500mg', '', ''
+        FROM generate_series(1, %s) g
+    """, [n])
+    cur.execute("""
+        INSERT INTO bench_careplan (id, patient_id, status, care_plan_text, created_at, updated_at)
+        SELECT g, g, CASE WHEN g %% 50 = 0 THEN 'pending' ELSE 'completed' END, '', now(), now()
+        FROM generate_series(1, %s) g
+    """, [n])
+    cur.execute("ANALYZE bench_patient; ANALYZE bench_careplan;")
+
+
+def add_indexes(cur):
+    cur.execute(f"""
+        CREATE UNIQUE INDEX ON bench_patient (first_name, last_name, date_of_birth);
+        CREATE INDEX ON bench_careplan (patient_id) WHERE status IN {ACTIVE};
+        ANALYZE bench_patient; ANALYZE bench_careplan;
+    """)
+
+
+def time_queries(cur, sql, params_list):
+    timings = []
+    for params in params_list:
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.99) - 1]
+
+
+def run(cur, label, patients, ids):
+    for name, sql, params in (
+        ('patient lookup',
+         "SELECT id FROM bench_patient WHERE first_name=%s AND last_name=%s AND date_of_birth=%s",
+         patients),
+        ('duplicate check',
+         f"SELECT 1 FROM bench_careplan WHERE patient_id=%s AND status IN {ACTIVE} LIMIT 1",
+         ids),
+    ):
+        p50, p99 = time_queries(cur, sql, params)
+        print(f"{label:<10} {name:<16} p50 {p50:>9.3f} ms   p99 {p99:>9.3f} ms")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    n_lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    rng = random.Random(42)
+    ids = [rng.randint(1, n) for _ in range(n_lookups)]
+
+    with connection.cursor() as cur:
+        print(f"Loading {n:,} patients and care plans ...")
+        setup(cur, n)
+        cur.execute(
+            "SELECT first_name, last_name, date_of_birth FROM bench_patient WHERE id = ANY(%s)", [ids],
+        )
+        patients = cur.fetchall()
+        ids = [(i,) for i in ids]
+
+        run(cur, 'no index', patients, ids)
+        add_indexes(cur)
+        run(cur, 'indexed', patients, ids)
+
+
+if __name__ == '__main__':
+    main()
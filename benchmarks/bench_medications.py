@@ -0,0 +1,51 @@
+"""
+Throughput of the medication-list normalizer (careplan/medications.py).
+
+Usage: python benchmarks/bench_medications.py [n_lists]
+
+Reports lists/sec for unique inputs (cold, every list parsed from scratch)
+and for a realistic mix where most lists repeat (warm, memoized).
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from careplan.medications import canonicalize_medications, parse_item, parse_medications  # noqa: E402
+
+DRUGS = ['Metformin', 'Lisinopril', 'Atorvastatin', 'Aspirin', 'Levothyroxine',
+         'Omeprazole', 'Amlodipine', 'Sertraline', 'Warfarin', 'Ibuprofen']
+UNITS = ['mg', ' mg', 'MG', 'mcg', 'µg']
+
+
+def make_list(rng, unique):
+    items = []
+    for drug in rng.sample(DRUGS, rng.randint(1, 4)):
+        strength = rng.randint(1, 100000) if unique else rng.choice([5, 10, 20, 50, 81, 500])
+        items.append(f"{drug} {strength}{rng.choice(UNITS)}")
+    return ', '.join(items)
+
+
+def run(label, lists, clear):
+    if clear:
+        for fn in (canonicalize_medications, parse_medications, parse_item):
+            fn.cache_clear()
+    start = time.perf_counter()
+    for text in lists:
+        canonicalize_medications(text)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<8} {len(lists):>8} lists  {len(lists) / elapsed:>12,.0f} lists/sec")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    rng = random.Random(42)
+    run('cold', [make_list(rng, unique=True) for _ in range(n)], clear=True)
+    run('warm', [make_list(rng, unique=False) for _ in range(n)], clear=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Per-request cost of the HTTP instrumentation, with the view itself a no-op:
+
+- before:  django_prometheus Before/After pair + a tracing span + the old
+           PrometheusMetricsMiddleware (path split per request, .labels() per
+           metric)
+- after:   the single PrometheusMetricsMiddleware (route label, cached bound
+           metrics, root span)
+
+Usage: python benchmarks/bench_metrics_middleware.py [n_requests]
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.http import HttpResponse  # noqa: E402
+from django.test import RequestFactory  # noqa: E402
+from django.urls import resolve  # noqa: E402
+from django_prometheus.middleware import PrometheusAfterMiddleware, PrometheusBeforeMiddleware  # noqa: E402
+
+from careplan import tracing  # noqa: E402
+from careplan.metrics import http_request_duration_seconds, http_request_errors_total  # noqa: E402
+from careplan.metrics_middleware import PrometheusMetricsMiddleware  # noqa: E402
+
+PATHS = ['/api/careplans/', '/api/careplans/17/status/', '/api/careplans/42/download/', '/api/generate/']
+
+
+class OldMetricsMiddleware:
+    """PrometheusMetricsMiddleware and TracingMiddleware as they were."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with tracing.span('http.request') as span:
+            start = time.monotonic()
+            response = self.get_response(request)
+            duration = time.monotonic() - start
+
+            endpoint = self._normalize_path(request.path)
+            method = request.method
+            status_code = str(response.status_code)
+            http_request_duration_seconds.labels(
+                method=method, endpoint=endpoint, status_code=status_code,
+            ).observe(duration)
+            if response.status_code >= 400:
+                http_request_errors_total.labels(
+                    method=method, endpoint=endpoint, status_code=status_code,
+                ).inc()
+        response['X-Trace-Id'] = span.trace_id
+        return response
+
+    @staticmethod
+    def _normalize_path(path):
+        parts = path.strip('/').split('/')
+        normalized = ['{id}' if part.isdigit() else part for part in parts]
+        return '/' + '/'.join(normalized) + '/' if normalized else '/'
+
+
+def view(request):
+    return HttpResponse(b'')
+
+
+def chain(*middleware):
+    handler = view
+    for cls in reversed(middleware):
+        handler = cls(handler)
+    return handler
+
+
+def requests(n):
+    factory = RequestFactory()
+    built = []
+    for path in PATHS:
+        request = factory.get(path)
+        request.resolver_match = resolve(path)
+        built.append(request)
+    return (built * (n // len(built) + 1))[:n]
+
+
+def per_request_us(handler, batch):
+    start = time.perf_counter()
+    for request in batch:
+        handler(request)
+    return (time.perf_counter() - start) / len(batch) * 1e6
+
+
+def run(label, handler, batch, baseline=0.0):
+    per_request_us(handler, batch[:1000])  # warm up
+    us = min(per_request_us(handler, batch) for _ in range(5)) - baseline
+    print(f"{label:<10} {'+' if baseline else ' '}{us:>7.2f} µs/request")
+    return us
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    batch = requests(n)
+    baseline = run('view only', view, batch)
+    run('before', chain(PrometheusBeforeMiddleware, OldMetricsMiddleware, PrometheusAfterMiddleware),
+        batch, baseline)
+    run('after', chain(PrometheusMetricsMiddleware), batch, baseline)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""
+Care plan search at scale: the old three-way icontains filter against the
+tsvector column + GIN index from migration 0008.
+
+Usage: python benchmarks/bench_search.py [n_plans ...]   (default: 100000 1000000)
+
+For each size, builds TEMP copies of the patient / careplan tables in the
+configured Postgres database (nothing persists), one plan per patient, and
+times the first page (50 rows) of a few searches:
+
+- old: ILIKE '%q%' on first_name OR last_name OR medications, newest first
+- new: prefix tsquery against patient.search, best match first
+"""
+
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+
+DRUGS = ['Metformin', 'Lisinopril', 'Atorvastatin', 'Amlodipine', 'Metoprolol', 'Omeprazole',
+         'Simvastatin', 'Losartan', 'Albuterol', 'Gabapentin', 'Hydrochlorothiazide', 'Sertraline',
+         'Warfarin', 'Aspirin', 'Furosemide', 'Levothyroxine', 'Prednisone', 'Tramadol']
+
+QUERIES = [
+    ('rare surname', 'Zyl1234'),
+    ('first name', 'Name42'),
+    ('common drug', 'metformin'),
+    ('drug prefix', 'metf'),
+]
+
+OLD_SQL = """
+    SELECT c.id, p.first_name, p.last_name, p.medications, c.status, c.created_at
+    FROM bench_careplan c JOIN bench_patient p ON p.id = c.patient_id
+    WHERE p.first_name ILIKE %(like)s OR p.last_name ILIKE %(like)s OR p.medications ILIKE %(like)s
+    ORDER BY c.created_at DESC, c.id DESC
+    LIMIT 50
+"""
+
+NEW_SQL = """
+    SELECT c.id, p.first_name, p.last_name, p.medications, c.status, c.created_at,
+           ts_rank(p.search, q)::float8 AS rank
+    FROM bench_careplan c JOIN bench_patient p ON p.id = c.patient_id,
+         to_tsquery('simple', %(tsquery)s) q
+    WHERE p.search @@ q
+    ORDER BY rank DESC, c.created_at DESC, c.id DESC
+    LIMIT 50
+"""
+
+
+def setup(cur, n):
+    cur.execute("""
+        DROP TABLE IF EXISTS bench_careplan, bench_patient;
+        CREATE TEMP TABLE bench_patient (LIKE careplan_patient INCLUDING DEFAULTS INCLUDING GENERATED);
+        CREATE TEMP TABLE bench_careplan (LIKE careplan_careplan INCLUDING DEFAULTS);
+    """)
+    cur.execute("""
+        INSERT INTO bench_patient (id, first_name, last_name, date_of_birth, medications,
+                                   medications_canonical, allergies, health_conditions)
+        SELECT g, 'Name' || (g %% 997), 'Zyl' || (g %% 20011), DATE '1930-01-01' + (g %% 20000),
+               (%(drugs)s::text[])[1 + g %% 18] || ' ' || (5 + g %% 7 * 10) || 'mg, '
+                   || (%(drugs)s::text[])[1 + (g / 18) %% 18] || ' 10mg',
+               '', '', ''
+        FROM generate_series(1, %(n)s) g
+    """, {'n': n, 'drugs': DRUGS})
+    cur.execute("""
+        INSERT INTO bench_careplan (id, patient_id, status, care_plan_text, created_at, updated_at)
+        SELECT g, g, 'completed', '', now() - g * interval '1 second', now()
+        FROM generate_series(1, %s) g
+    """, [n])
+    cur.execute("""
+        CREATE INDEX ON bench_careplan (created_at DESC, id DESC);
+        CREATE INDEX ON bench_careplan (patient_id);
+        CREATE INDEX ON bench_patient USING gin (search);
+        ANALYZE bench_patient; ANALYZE bench_careplan;
+    """)
+
+
+def time_query(cur, sql, params, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        cur.fetchall()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 1_000_000]
+    with connection.cursor() as cur:
+        for n in sizes:
+            print(f"Loading {n:,} patients and care plans ...")
+            setup(cur, n)
+            for label, query in QUERIES:
+                old = time_query(cur, OLD_SQL, {'like': f'%{query}%'}, repeat=5)
+                new = time_query(cur, NEW_SQL, {'tsquery': f'{query.lower()}:*'}, repeat=5)
+                print(f"{n:>9,}  {label:<13} old p50 {old:>9.2f} ms   new p50 {new:>9.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+Per-span cost of careplan/tracing.py: enter + exit of one span nested in a
+parent, with no sinks, with the stage histogram (what the Django app always
+runs), and with the histogram plus the JSON-lines trace log.
+
+Usage: python benchmarks/bench_tracing.py [n_spans]
+
+The budget is 50 µs per span; a care plan records about ten of them.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+from careplan import tracing  # noqa: E402
+from careplan.apps import StageHistogram  # noqa: E402
+
+NAMES = ['create.insert', 'create.enqueue', 'task.load', 'llm.call']
+
+
+def per_span_us(n):
+    names = NAMES * (n // len(NAMES))
+    with tracing.span('bench.parent'):
+        start = time.perf_counter()
+        for name in names:
+            with tracing.span(name):
+                pass
+        elapsed = time.perf_counter() - start
+    return elapsed / len(names) * 1e6
+
+
+def run(label, sinks, n):
+    saved = tracing._sinks[:]
+    tracing._sinks[:] = sinks
+    try:
+        per_span_us(1000)  # warm up: bound histogram children, file buffers
+        us = min(per_span_us(n) for _ in range(5))
+    finally:
+        tracing._sinks[:] = saved
+    print(f"{label:<24} {us:>7.2f} µs/span")
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    with tempfile.TemporaryDirectory() as tmp:
+        log = tracing.TraceLog(os.path.join(tmp, 'trace.jsonl'))
+        run('no sinks', [], n)
+        run('stage histogram', [StageHistogram()], n)
+        run('histogram + trace log', [StageHistogram(), log], n)
+        log.file.close()
+
+
+if __name__ == '__main__':
+    main()
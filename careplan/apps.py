@@ -0,0 +1,25 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class CareplanConfig(AppConfig):
+    name = 'careplan'
+
+    def ready(self):
+        from . import tracing
+        tracing.add_sink(StageHistogram())
+        tracing.log_to(settings.CAREPLAN_TRACE_LOG)
+
+
+class StageHistogram:
+    """Tracing sink: span durations into careplan_stage_duration_seconds."""
+
+    def __init__(self):
+        self.children = {}  # span name -> bound histogram, skips .labels() per span
+
+    def __call__(self, span):
+        child = self.children.get(span.name)
+        if child is None:
+            from .metrics import careplan_stage_duration_seconds
+            child = self.children[span.name] = careplan_stage_duration_seconds.labels(stage=span.name)
+        child.observe(span.duration)
@@ -0,0 +1,173 @@
+"""
+Asyncio execution mode for care plan generation.
+
+generate_careplan_task spends almost all of its time waiting on the LLM, so a
+solo Celery worker handles one plan at a time. AsyncCarePlanWorker runs many
+generations on one event loop instead:
+
+- claims 'pending' plans straight from the DB (SELECT ... FOR UPDATE SKIP LOCKED),
+  so several worker containers can run side by side
+- at most `concurrency` generations in flight, each bounded by `task_timeout`
+- same retry semantics as the Celery task: 3 retries, 2 ** n seconds backoff;
+  every call waits on the shared rate limiter first and 429s don't use a retry;
+  any other error (loading, caching, saving) marks the plan failed
+- DB writes go through sync_to_async; LLM calls use acall_llm on the per-loop
+  pooled client
+
+Enable with CAREPLAN_WORKER_MODE=async (create_careplan then stops enqueueing
+Celery tasks) and run `python manage.py run_async_worker`.
+"""
+
+import asyncio
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from . import coalesce, events, generation, ratelimit, status_cache, tracing
+from .metrics import (
+    celery_task_duration_seconds,
+    celery_task_failures_total,
+    celery_task_retries_total,
+)
+from .models import CarePlan
+from .services import acall_llm
+
+TASK_NAME = 'generate_careplan_async'
+
+
+def claim_pending(limit):
+    """Atomically move up to `limit` of the oldest pending plans to 'processing'."""
+    close_old_connections()  # long-running loop: recycle broken/expired connections
+    with transaction.atomic():
+        ids = list(
+            CarePlan.objects.select_for_update(skip_locked=True)
+            .filter(status='pending')
+            .order_by('created_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            CarePlan.objects.filter(id__in=ids).update(
+                status='processing', care_plan_text='', updated_at=timezone.now(),
+            )
+    status_cache.invalidate(*ids)
+    return ids
+
+
+def requeue_stale(older_than_seconds):
+    """Put plans orphaned by a crashed worker back to 'pending'."""
+    cutoff = timezone.now() - timedelta(seconds=older_than_seconds)
+    return CarePlan.objects.filter(
+        status__in=['processing', 'partial'], updated_at__lt=cutoff,
+    ).update(status='pending', care_plan_text='', updated_at=timezone.now())
+
+
+class AsyncCarePlanWorker:
+
+    def __init__(self, concurrency=50, task_timeout=90, max_retries=3, poll_interval=1.0):
+        self.concurrency = concurrency
+        self.task_timeout = task_timeout
+        self.max_retries = max_retries
+        self.poll_interval = poll_interval
+        self.active = set()
+
+    async def run(self, stop=None):
+        """Claim and process plans until `stop` (an asyncio.Event) is set."""
+        stop = stop or asyncio.Event()
+        while not stop.is_set():
+            free = self.concurrency - len(self.active)
+            if free > 0:
+                for careplan_id in await sync_to_async(claim_pending)(free):
+                    task = asyncio.create_task(self.process(careplan_id))
+                    self.active.add(task)
+                    task.add_done_callback(self.active.discard)
+
+            if self.active:
+                await asyncio.wait(
+                    self.active, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED,
+                )
+            else:
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+        if self.active:
+            await asyncio.wait(self.active)
+        await sync_to_async(connections.close_all)()
+
+    async def process(self, careplan_id):
+        # Claimed from the DB rather than a message, so each plan starts its own trace
+        start = time.monotonic()
+        with tracing.span('task.run', careplan_id=careplan_id):
+            try:
+                plan = await self._process(careplan_id)
+            except Exception as e:
+                # Loading, the LLM cache, coalescing or saving the result broke:
+                # don't leave the plan 'processing' until the next requeue_stale
+                print(f"[Async] CarePlan #{careplan_id} failed: {e!r}")
+                celery_task_failures_total.labels(task_name=TASK_NAME).inc()
+                plan = await sync_to_async(generation.fail_careplan)(careplan_id, e)
+        if plan is not None:
+            generation.observe_finished(plan, time.monotonic() - start)
+
+    async def _process(self, careplan_id):
+        plan = await sync_to_async(generation.load_careplan)(careplan_id)
+        print(f"[Async] Processing CarePlan #{plan.id}")
+        # No message here: a pending plan is due from the moment it was submitted
+        generation.observe_queue_wait(plan.created_at.timestamp())
+
+        if await sync_to_async(generation.complete_from_cache)(plan):
+            print(f"[Async] CarePlan #{plan.id} completed from cache")
+            return plan
+        flight, completed = await generation.ajoin_inflight(plan)
+        if completed:
+            print(f"[Async] CarePlan #{plan.id} completed by an identical in-flight generation")
+            return plan
+        try:
+            return await self._generate(plan, flight)
+        except Exception:
+            # Let followers generate on their own instead of waiting out the lease
+            await sync_to_async(coalesce.abandon)(flight)
+            raise
+
+    async def _generate(self, plan, flight):
+        events.publish_status(plan)
+
+        llm_kwargs = await sync_to_async(generation.llm_kwargs)(plan)
+        estimated_tokens = ratelimit.estimate_request_tokens(**llm_kwargs)
+        attempt = 0
+        while True:
+            await ratelimit.aacquire(estimated_tokens)
+            start = time.monotonic()
+            try:
+                with tracing.span('llm.call'):
+                    result = await asyncio.wait_for(acall_llm(**llm_kwargs), timeout=self.task_timeout)
+                break
+            except Exception as e:
+                celery_task_duration_seconds.labels(task_name=TASK_NAME).observe(time.monotonic() - start)
+                if ratelimit.is_rate_limit_error(e):
+                    # The limiter is paused now; wait behind it without using a retry
+                    print(f"[Async] CarePlan #{plan.id} got 429, waiting for the rate limiter")
+                    continue
+                print(f"[Async] CarePlan #{plan.id} failed (attempt {attempt + 1}/{self.max_retries}): {e!r}")
+                if attempt == self.max_retries:
+                    await sync_to_async(generation.mark_failed)(plan, e, flight)
+                    celery_task_failures_total.labels(task_name=TASK_NAME).inc()
+                    print(f"[Async] CarePlan #{plan.id} permanently failed after {self.max_retries} retries")
+                    return plan
+                celery_task_retries_total.labels(task_name=TASK_NAME).inc()
+                await asyncio.sleep(self.backoff(attempt))
+                attempt += 1
+
+        duration = time.monotonic() - start
+        celery_task_duration_seconds.labels(task_name=TASK_NAME).observe(duration)
+        # Outside the retry loop: a failed save is not a reason to call the LLM again
+        await sync_to_async(generation.mark_completed)(plan, result, duration, flight)
+        print(f"[Async] CarePlan #{plan.id} completed")
+        return plan
+
+    def backoff(self, attempt):
+        return 2 ** attempt
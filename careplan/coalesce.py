@@ -0,0 +1,126 @@
+"""
+Single-flight coalescing of identical in-flight generations.
+
+A care home submitting 40 residents on the same regimen would otherwise start
+40 identical LLM calls before the first one lands in the LLM cache. Instead:
+
+- the first task for a profile (llm_cache.profile_hash) takes a Redis lease
+  careplan:inflight:<hash> and calls the LLM — the leader
+- tasks arriving while the lease is held subscribe to
+  careplan:inflight:done:<hash> and adopt the leader's text — followers, each
+  completing its own CarePlan row
+- the leader keeps the lease across its own retries and releases it when it
+  completes or permanently fails; followers of a failed leader generate on
+  their own
+
+The lease expires after CAREPLAN_COALESCE_LEASE_SECONDS, so a crashed leader
+only holds followers up until then. A waiting Celery follower occupies its
+worker slot for as long as the leader's LLM call (at most the lease); that is
+a slot that would otherwise be making the same call. Followers in the async
+worker wait on their own thread and hold only a concurrency slot. Only active when real LLM output is cached
+(mock text contains the patient's name) and CAREPLAN_REDIS_URL is set.
+"""
+
+import json
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from . import llm_cache
+from .metrics import careplan_coalesced_total
+from .redis_client import get_redis
+
+LEASE_PREFIX = 'careplan:inflight'
+
+# Delete the lease only if we still own it
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class Flight:
+    profile: str
+    owner: str
+    leader: bool
+
+    @property
+    def lease_key(self):
+        return f'{LEASE_PREFIX}:{self.profile}'
+
+    @property
+    def channel(self):
+        return f'{LEASE_PREFIX}:done:{self.profile}'
+
+
+def join(plan):
+    """Take or join the in-flight generation for this plan's profile. None without Redis."""
+    client = get_redis()
+    if client is None:
+        return None
+
+    patient = plan.patient
+    profile = llm_cache.profile_hash(patient.medications, patient.allergies, patient.health_conditions)
+    flight = Flight(profile=profile, owner=str(plan.id), leader=False)
+    lease_ms = int(settings.CAREPLAN_COALESCE_LEASE_SECONDS * 1000)
+
+    if client.set(flight.lease_key, flight.owner, nx=True, px=lease_ms):
+        flight.leader = True
+    elif client.get(flight.lease_key) == flight.owner:
+        # Our own lease from a previous attempt of this task
+        client.pexpire(flight.lease_key, lease_ms)
+        flight.leader = True
+    return flight
+
+
+def wait_for_leader(flight, plan, timeout=None):
+    """Follower: block until the leader publishes. Returns its text, or None to generate alone."""
+    client = get_redis()
+    timeout = settings.CAREPLAN_COALESCE_LEASE_SECONDS if timeout is None else timeout
+    patient = plan.patient
+
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(flight.channel)
+    try:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=1.0)
+            if message is not None:
+                payload = json.loads(message['data'])
+                if payload['status'] != 'completed':
+                    return None
+                careplan_coalesced_total.inc()
+                return payload['text']
+            if not client.exists(flight.lease_key):
+                # Leader finished before we subscribed (text is in the LLM cache) or died
+                return llm_cache.get_cached_careplan(
+                    patient.medications, patient.allergies, patient.health_conditions,
+                )
+        return None
+    finally:
+        pubsub.close()
+
+
+def finish(flight, text):
+    """Leader: hand the text to every follower and release the lease."""
+    _publish(flight, {'status': 'completed', 'text': text})
+
+
+def abandon(flight):
+    """Leader gave up: followers fall back to generating on their own."""
+    _publish(flight, {'status': 'failed'})
+
+
+def _publish(flight, payload):
+    if flight is None or not flight.leader:
+        return
+    client = get_redis()
+    try:
+        client.publish(flight.channel, json.dumps(payload))
+        client.eval(_RELEASE_LUA, 1, flight.lease_key, flight.owner)
+    except Exception as e:
+        print(f"[coalesce] release of {flight.lease_key} failed: {e}")
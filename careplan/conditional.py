@@ -0,0 +1,44 @@
+"""
+Conditional GET for the read endpoints, with validators from careplan/etags.py.
+
+Like django.views.decorators.http.condition, but ETag and Last-Modified come
+from one lookup, and the 304 is decided before the view loads anything.
+"""
+
+from functools import wraps
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def conditional(get_validators):
+    """get_validators(request, *args, **kwargs) -> (etag, last_modified datetime or None)."""
+    def decorator(view):
+        @wraps(view)
+        def inner(request, *args, **kwargs):
+            etag, last_modified = get_validators(request, *args, **kwargs)
+            response = not_modified(request, etag, last_modified)
+            if response is None:
+                response = view(request, *args, **kwargs)
+            return with_validators(response, etag, last_modified)
+        return inner
+    return decorator
+
+
+def is_conditional(request):
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 response if the client's copy is current, else None."""
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp()) if last_modified else None,
+    )
+
+
+def with_validators(response, etag, last_modified):
+    if 200 <= response.status_code < 300 or response.status_code == 304:
+        response.headers.setdefault('ETag', etag)
+        if last_modified:
+            response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    return response
@@ -0,0 +1,57 @@
+"""
+HTTP validators (ETag / Last-Modified) for care plan read endpoints.
+
+Plain Python (no Django imports) so the Lambdas can share it.
+
+Everything is derived from the last-modified time of a plan: the later of
+CarePlan.updated_at, which every write bumps, and the patient's updated_at,
+which the upserts bump when the medications / allergies / conditions shown
+in the plan change. A validator costs an indexed lookup of two timestamps —
+never care_plan_text:
+
+- one plan:    "<id>-<last modified in µs>"
+- list page:   digest of count, max(last modified) and sum(id) over the
+               page's rows, plus the query string (other params → other body)
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def careplan_etag(careplan_id, last_modified):
+    return f'"{careplan_id}-{(_aware(last_modified) - _EPOCH) // timedelta(microseconds=1)}"'
+
+
+def list_etag(count, last_modified, id_sum, variant=''):
+    stamp = last_modified.isoformat() if last_modified else ''
+    digest = hashlib.sha1(f'{count}|{stamp}|{id_sum}|{variant}'.encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+def http_date(moment):
+    return format_datetime(_aware(moment).astimezone(timezone.utc).replace(microsecond=0), usegmt=True)
+
+
+def not_modified(if_none_match, if_modified_since, etag, last_modified):
+    """
+    RFC 9110 evaluation for GET: If-None-Match wins when present; otherwise
+    If-Modified-Since against last_modified (whole seconds, like the header).
+    """
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or etag in tags or f'W/{etag}' in tags
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return _aware(last_modified).replace(microsecond=0) <= _aware(since)
+    return False
+
+
+def _aware(moment):
+    # The Lambdas' schema uses TIMESTAMP without time zone, written by NOW() in UTC
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
@@ -0,0 +1,136 @@
+"""
+Care plan progress events, pushed to browsers over Server-Sent Events.
+
+generate_careplan_task publishes every status change and every streamed text
+chunk to the Redis channel careplan:events:<id>. The SSE view subscribes to
+that channel, so a waiting browser costs one DB read up front instead of one
+per poll.
+
+Event types (the "event:" field of the SSE frame):
+- status: {"id", "status", "care_plan_text"}  — full snapshot
+- delta:  {"id", "status", "offset", "text"} — text appended at character
+          `offset` of care_plan_text
+
+The channel is subscribed before the snapshot is read, so a delta can arrive
+that the snapshot already contains; the stream drops (or trims) deltas that
+end at or before the text it has sent, and clients should do the same.
+
+Without Redis, the stream falls back to checking the DB every
+CAREPLAN_SSE_POLL_SECONDS and only emits when something changed.
+"""
+
+import json
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from .models import CarePlan
+from .redis_client import get_redis
+
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def channel_name(careplan_id):
+    return f'careplan:events:{careplan_id}'
+
+
+def publish(careplan_id, event, data):
+    """Best-effort: a missing or failing Redis must never fail generation."""
+    client = get_redis()
+    if client is None:
+        return
+    message = json.dumps({'event': event, 'data': {'id': careplan_id, **data}})
+    try:
+        client.publish(channel_name(careplan_id), message)
+    except Exception as e:
+        print(f"[events] publish for CarePlan #{careplan_id} failed: {e}")
+
+
+def publish_status(plan):
+    publish(plan.id, 'status', {
+        'status': plan.status,
+        'care_plan_text': plan.care_plan_text if plan.status in ('completed', 'partial') else '',
+    })
+
+
+def format_sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def stream_careplan_events(careplan_id):
+    """Generator of SSE frames for one care plan; ends at a terminal status."""
+    client = get_redis()
+    if client is None:
+        yield from _poll_events(careplan_id)
+        return
+
+    # Subscribe before reading the snapshot so no event falls in between
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(channel_name(careplan_id))
+    try:
+        snapshot = _snapshot(careplan_id)
+        yield format_sse('status', snapshot)
+        if snapshot['status'] in TERMINAL_STATUSES:
+            return
+        sent = len(snapshot['care_plan_text'])
+
+        deadline = time.monotonic() + settings.CAREPLAN_SSE_MAX_SECONDS
+        while time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=settings.CAREPLAN_SSE_KEEPALIVE_SECONDS)
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            payload = json.loads(message['data'])
+            data = payload['data']
+            if payload['event'] == 'delta':
+                data = _unsent(data, sent)
+                if data is None:
+                    continue
+                sent = data['offset'] + len(data['text'])
+            else:
+                sent = len(data['care_plan_text'])
+            yield format_sse(payload['event'], data)
+            if data['status'] in TERMINAL_STATUSES:
+                return
+        # Past the deadline: the browser's EventSource reconnects on its own
+    finally:
+        pubsub.close()
+
+
+def _poll_events(careplan_id):
+    last = None
+    deadline = time.monotonic() + settings.CAREPLAN_SSE_MAX_SECONDS
+    while time.monotonic() < deadline:
+        snapshot = _snapshot(careplan_id)
+        if snapshot != last:
+            yield format_sse('status', snapshot)
+            last = snapshot
+        if snapshot['status'] in TERMINAL_STATUSES:
+            return
+        time.sleep(settings.CAREPLAN_SSE_POLL_SECONDS)
+
+
+def _unsent(delta, sent):
+    """The part of a delta past the first `sent` characters; None if there is none."""
+    skip = sent - delta['offset']
+    if skip <= 0:
+        return delta
+    if skip >= len(delta['text']):
+        return None
+    return {**delta, 'offset': sent, 'text': delta['text'][skip:]}
+
+
+def _snapshot(careplan_id):
+    try:
+        status, text = CarePlan.objects.values_list('status', 'care_plan_text').get(id=careplan_id)
+    finally:
+        # A stream lasts up to CAREPLAN_SSE_MAX_SECONDS: don't hold a DB
+        # connection for all of it (the next read reconnects)
+        if not connection.in_atomic_block:
+            connection.close()
+    return {
+        'id': careplan_id,
+        'status': status,
+        'care_plan_text': text if status in ('completed', 'partial') else '',
+    }
@@ -0,0 +1,171 @@
+"""
+Streaming export of care plans for audits.
+
+GET /api/careplans/export/ walks the table with a server-side cursor
+(QuerySet.iterator) and encodes rows as it goes, so memory stays flat no
+matter how many plans there are. Rows are serialize_careplan(), oldest first.
+
+Formats: NDJSON (one JSON object per line) or CSV with a header row.
+
+GET /api/careplans/download/ does the same for format_careplan_download():
+a ZIP of careplan_<id>.txt files, written one entry at a time.
+"""
+
+import csv
+import json
+import zipfile
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .exceptions import ValidationError
+from .models import CarePlan
+from .services import format_careplan_download
+from .serializers import LIST_FIELDS, serialize_careplan
+
+FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+EXPORT_FIELDS = list(LIST_FIELDS)  # same keys and order as serialize_careplan
+LINES_PER_WRITE = 200
+
+
+def export_careplans(statuses=(), created_from=None, created_to=None):
+    """Plans to export; created_from is inclusive, created_to exclusive."""
+    plans = CarePlan.objects.select_related('patient').order_by('created_at', 'id')
+    if statuses:
+        plans = plans.filter(status__in=statuses)
+    if created_from:
+        plans = plans.filter(created_at__gte=created_from)
+    if created_to:
+        plans = plans.filter(created_at__lt=created_to)
+    return plans
+
+
+def parse_filters(params):
+    """status=a,b  from=<date|datetime>  to=<date|datetime>  (a bare `to` date includes that day)."""
+    statuses = [s.strip() for s in params.get('status', '').split(',') if s.strip()]
+    allowed = [value for value, _ in CarePlan.STATUS_CHOICES]
+    unknown = [s for s in statuses if s not in allowed]
+    if unknown:
+        raise ValidationError(
+            message=f"Unknown status: {', '.join(unknown)}", code='invalid_status',
+            detail={'allowed': allowed},
+        )
+    return {
+        'statuses': statuses,
+        'created_from': _parse_bound(params.get('from'), 'from'),
+        'created_to': _parse_bound(params.get('to'), 'to', end_of_day=True),
+    }
+
+
+def stream_ndjson(plans):
+    return _batched(
+        json.dumps(serialize_careplan(plan), ensure_ascii=False) + '\n'
+        for plan in plans.iterator(chunk_size=settings.CAREPLAN_EXPORT_CHUNK_SIZE)
+    )
+
+
+def stream_csv(plans):
+    buffer = _LineBuffer()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    header = buffer.pop()
+
+    def lines():
+        yield header
+        for plan in plans.iterator(chunk_size=settings.CAREPLAN_EXPORT_CHUNK_SIZE):
+            writer.writerow(serialize_careplan(plan))
+            yield buffer.pop()
+
+    return _batched(lines())
+
+
+def stream_zip(plans):
+    """
+    A ZIP of format_careplan_download() per plan. Each entry is compressed and
+    handed to the response as soon as it is written; zipfile emits data
+    descriptors because the output isn't seekable.
+    """
+    buffer = _ChunkBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for plan in plans.iterator(chunk_size=settings.CAREPLAN_EXPORT_CHUNK_SIZE):
+            entry = zipfile.ZipInfo(f'careplan_{plan.id}.txt', date_time=plan.created_at.timetuple()[:6])
+            entry.compress_type = zipfile.ZIP_DEFLATED
+            archive.writestr(entry, format_careplan_download(plan))
+            yield buffer.pop()
+    yield buffer.pop()  # central directory
+
+
+def parse_ids(value):
+    try:
+        ids = sorted({int(i) for i in value.split(',') if i.strip()})
+    except ValueError:
+        raise ValidationError(message="ids must be comma-separated integers.", code='invalid_ids')
+    if len(ids) > settings.CAREPLAN_BULK_MAX_ITEMS:
+        raise ValidationError(
+            message=f"At most {settings.CAREPLAN_BULK_MAX_ITEMS} ids per download.", code='too_many_ids',
+        )
+    missing = set(ids) - set(CarePlan.objects.filter(id__in=ids).values_list('id', flat=True))
+    if missing:
+        raise ValidationError(
+            message="Some care plans do not exist.", code='unknown_ids', detail={'ids': sorted(missing)},
+        )
+    return ids
+
+
+def _parse_bound(value, name, end_of_day=False):
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError(message=f"{name} must be an ISO date or datetime.", code='invalid_date')
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def _batched(lines):
+    """Join rows into larger writes; one write per row costs a syscall each."""
+    batch = []
+    for line in lines:
+        batch.append(line)
+        if len(batch) >= LINES_PER_WRITE:
+            yield ''.join(batch)
+            batch = []
+    if batch:
+        yield ''.join(batch)
+
+
+class _LineBuffer:
+    """File-like sink for csv.writer that hands back what was just written."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, text):
+        self.parts.append(text)
+        return len(text)
+
+    def pop(self):
+        text = ''.join(self.parts)
+        self.parts = []
+        return text
+
+
+class _ChunkBuffer(_LineBuffer):
+    """Unseekable bytes sink for zipfile."""
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.parts)
+        self.parts = []
+        return data
@@ -0,0 +1,174 @@
+"""
+Steps of generating one care plan, shared by both execution modes:
+
+- tasks.generate_careplan_task:  Celery, one plan per worker slot
+- async_worker.AsyncCarePlanWorker: many plans on one event loop
+
+Each step persists its status change and publishes it for SSE listeners.
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.utils import timezone
+
+from . import coalesce, events, interactions, llm_cache, status_cache
+from .metrics import (
+    careplan_end_to_end_seconds,
+    careplan_generation_duration_seconds,
+    careplan_processing_seconds,
+    careplan_queue_wait_seconds,
+    careplan_status_total,
+)
+from .models import CarePlan
+from .services import get_openai_api_key
+
+
+def load_careplan(careplan_id):
+    return CarePlan.objects.select_related('patient').get(id=careplan_id)
+
+
+def save_status(plan):
+    """Persist a status change, refresh the status cache, notify SSE listeners."""
+    plan.save()
+    status_cache.store(plan)
+    events.publish_status(plan)
+
+
+def use_llm_cache():
+    # Mock-mode output includes the patient's name, so only real LLM output is cached
+    return bool(get_openai_api_key())
+
+
+def complete_from_cache(plan):
+    """Finish the plan from the LLM cache. Returns False on a miss."""
+    if not use_llm_cache():
+        return False
+    patient = plan.patient
+    cached = llm_cache.get_cached_careplan(
+        patient.medications, patient.allergies, patient.health_conditions,
+    )
+    if cached is None:
+        return False
+
+    plan.status = 'completed'
+    plan.care_plan_text = cached
+    save_status(plan)
+    careplan_status_total.labels(status='completed').inc()
+    return True
+
+
+def join_inflight(plan):
+    """
+    Single-flight coalescing, see coalesce.py. Returns (flight, completed):
+    a leader gets its flight to pass to mark_completed / mark_failed; a
+    follower is completed here with the leader's text.
+    """
+    flight = coalesce.join(plan) if use_llm_cache() else None
+    if flight is None or flight.leader:
+        return flight, False
+
+    mark_processing(plan)
+    start = time.monotonic()
+    text = coalesce.wait_for_leader(flight, plan)
+    if text is None:
+        return None, False
+    mark_completed(plan, text, time.monotonic() - start)
+    return None, True
+
+
+async def ajoin_inflight(plan):
+    """
+    join_inflight for the event loop. The follower's blocking wait must not
+    run on the shared thread_sensitive thread: the leader's mark_completed,
+    which ends the wait, would queue behind it until the lease expired.
+    """
+    flight = await sync_to_async(coalesce.join)(plan) if use_llm_cache() else None
+    if flight is None or flight.leader:
+        return flight, False
+
+    await sync_to_async(mark_processing)(plan)
+    start = time.monotonic()
+    text = await sync_to_async(coalesce.wait_for_leader, thread_sensitive=False)(flight, plan)
+    if text is None:
+        return None, False
+    await sync_to_async(mark_completed)(plan, text, time.monotonic() - start)
+    return None, True
+
+
+def mark_processing(plan):
+    plan.status = 'processing'
+    plan.care_plan_text = ''  # drop partial text left by a failed attempt
+    save_status(plan)
+
+
+def mark_requeued(plan):
+    """Back to 'pending' while the plan waits for LLM rate limit capacity."""
+    plan.status = 'pending'
+    plan.care_plan_text = ''
+    save_status(plan)
+
+
+def llm_kwargs(plan):
+    """Arguments for call_llm / stream_llm / acall_llm, with dangers pre-screened."""
+    patient = plan.patient
+    return dict(
+        patient_name=f"{patient.first_name} {patient.last_name}",
+        medications=patient.medications,
+        allergies=patient.allergies,
+        health_conditions=patient.health_conditions,
+        known_dangers=interactions.screen(
+            patient.medications, patient.allergies, patient.health_conditions,
+        ),
+    )
+
+
+def mark_completed(plan, text, duration, flight=None):
+    if use_llm_cache():
+        patient = plan.patient
+        llm_cache.store_careplan(
+            patient.medications, patient.allergies, patient.health_conditions, text,
+        )
+
+    plan.status = 'completed'
+    plan.care_plan_text = text
+    save_status(plan)
+
+    coalesce.finish(flight, text)
+
+    careplan_status_total.labels(status='completed').inc()
+    careplan_generation_duration_seconds.observe(duration)
+
+
+def mark_failed(plan, error, flight=None):
+    plan.status = 'failed'
+    plan.care_plan_text = str(error)
+    save_status(plan)
+    coalesce.abandon(flight)
+    careplan_status_total.labels(status='failed').inc()
+
+
+def fail_careplan(careplan_id, error):
+    """mark_failed after an unexpected error, loading the plan afresh; None if even that fails."""
+    try:
+        plan = load_careplan(careplan_id)
+        mark_failed(plan, error)
+        return plan
+    except Exception as e:
+        print(f"[generation] CarePlan #{careplan_id} could not be marked failed: {e!r}")
+        return None
+
+
+def observe_queue_wait(enqueued_at):
+    """enqueued_at: epoch seconds the plan became due (the message's enqueued_at, or created_at)."""
+    careplan_queue_wait_seconds.observe(max(0.0, time.time() - enqueued_at))
+
+
+def observe_finished(plan, processing):
+    """Processing time and submit-to-finish latency, once the plan reached completed / failed."""
+    if plan.status not in ('completed', 'failed'):
+        return
+    careplan_processing_seconds.labels(status=plan.status).observe(processing)
+    careplan_end_to_end_seconds.labels(status=plan.status).observe(
+        (timezone.now() - plan.created_at).total_seconds(),
+    )
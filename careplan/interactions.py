@@ -0,0 +1,149 @@
+"""
+Local drug-interaction index.
+
+Pre-screens a patient's medications, allergies and health conditions for known
+dangerous combinations before the LLM call, using the bundled
+careplan/data/interactions.json:
+
+- aliases:      concept -> names the patient might write ("头孢", "cefuroxime" -> cephalosporin)
+- interactions: [concept_a, concept_b, danger, action]; allergies use "allergy:<concept>"
+
+The index is built once per process. Every alias is folded into one compiled
+regex, so screening a patient is a single scan per field plus a dict lookup
+per pair — microseconds, cheap enough to run on every request.
+
+A name with a negation earlier in its clause ("does not drink alcohol",
+"non-drinker", "不喝酒", "无哮喘") is not a match: the LLM is told the screened
+combinations are confirmed, so a false one is worse than a missed one, which
+the LLM is still asked to look for.
+
+Plain Python (no Django imports) so the Lambdas can share it.
+"""
+
+import hashlib
+import json
+import os
+import re
+from functools import lru_cache
+from itertools import combinations
+from typing import NamedTuple
+
+from .medications import parse_medications
+
+DEFAULT_PATH = os.path.join(os.path.dirname(__file__), 'data', 'interactions.json')
+
+ALLERGY_PREFIX = 'allergy:'
+
+# A negation applies up to the end of its clause ("no alcohol, smokes daily")
+CLAUSE_BREAK_RE = re.compile(r'[.,;:!?()\n。，；：、！？（）]|(?<![a-z])(?:but|however)(?![a-z])|但|而')
+NEGATION_RE = re.compile(
+    r"(?<![a-z])(?:not|no|non|never|without|denies|denied|quit|stopped)(?![a-z])|n't|不|无|没|未|否认|戒"
+)
+
+
+class Conflict(NamedTuple):
+    first: str      # as the patient wrote it, e.g. '头孢'
+    second: str     # e.g. '酒精'
+    danger: str
+    action: str
+
+
+class InteractionIndex:
+
+    def __init__(self, data, version=''):
+        self.version = version
+        self.concept_of = {}
+        for concept, names in data['aliases'].items():
+            for name in names:
+                self.concept_of[name.lower()] = concept
+
+        self.pairs = {}
+        for a, b, danger, action in data['interactions']:
+            self.pairs[frozenset((a, b))] = (danger, action)
+
+        # Longest names first so "grapefruit juice" wins over "grapefruit"
+        names = sorted(self.concept_of, key=len, reverse=True)
+        self._names_re = re.compile(
+            r'(?<![a-z0-9])(?:' + '|'.join(re.escape(n) for n in names) + r')(?![a-z0-9])'
+        )
+
+    def find(self, text):
+        """Yield (concept, matched_text) for every known name in text that isn't negated."""
+        text = text.lower()
+        for match in self._names_re.finditer(text):
+            if not negated(text, match.start()):
+                yield self.concept_of[match.group(0)], match.group(0)
+
+    def screen(self, medications, allergies='', health_conditions=''):
+        """Return the known dangerous combinations for one patient, in a stable order."""
+        terms = {}  # concept key -> display text (first occurrence wins)
+
+        for med in parse_medications(medications):
+            found = list(self.find(med.drug))
+            for concept, name in found:
+                terms.setdefault(concept, name)
+            if not found:
+                terms.setdefault(med.drug, med.drug)
+
+        for concept, name in self.find(health_conditions or ''):
+            terms.setdefault(concept, name)
+
+        allergy_terms = {}
+        for item in re.split(r'[,;\n、，；]+', (allergies or '').lower()):
+            item = item.strip()
+            found = list(self.find(item))
+            for concept, name in found:
+                allergy_terms.setdefault(concept, name)
+            if item and not found:
+                allergy_terms.setdefault(item, item)
+
+        conflicts = []
+
+        # Taking something the patient is directly allergic to
+        for concept, name in allergy_terms.items():
+            if concept in terms:
+                conflicts.append(Conflict(
+                    terms[concept], f"{name} allergy",
+                    f"you are allergic to {name}, and {terms[concept]} belongs to the same drug family",
+                    f"Do NOT take {terms[concept]}",
+                ))
+
+        keyed = list(terms.items()) + [
+            (ALLERGY_PREFIX + concept, f"{name} allergy") for concept, name in allergy_terms.items()
+        ]
+        for (key_a, name_a), (key_b, name_b) in combinations(keyed, 2):
+            hit = self.pairs.get(frozenset((key_a, key_b)))
+            if hit:
+                if key_a.startswith(ALLERGY_PREFIX):
+                    name_a, name_b = name_b, name_a
+                conflicts.append(Conflict(name_a, name_b, *hit))
+
+        return conflicts
+
+
+def negated(text, start):
+    """Whether the clause of `text` leading up to `start` contains a negation."""
+    clause = CLAUSE_BREAK_RE.split(text[:start])[-1]
+    return NEGATION_RE.search(clause) is not None
+
+
+@lru_cache(maxsize=None)
+def load_index(path=DEFAULT_PATH):
+    """Load and compile the index once per worker process."""
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return InteractionIndex(json.loads(raw), version=hashlib.sha256(raw).hexdigest()[:12])
+
+
+def screen(medications, allergies='', health_conditions=''):
+    return load_index().screen(medications, allergies, health_conditions)
+
+
+def format_danger_section(conflicts):
+    """Deterministic '⚠️ DANGER' section, used when the LLM is unavailable."""
+    lines = ["## ⚠️ DANGER — Must Read First"]
+    if not conflicts:
+        lines.append("No critical dangers found.")
+    for c in conflicts:
+        lines.append(f"- **{c.first} + {c.second}**: {c.danger}. {c.action}.")
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,78 @@
+"""
+Content-addressed cache for LLM-generated care plans.
+
+Patients with the same medications/allergies/conditions get the same plan, so
+the generated text is cached under a hash of the normalized inputs plus
+everything else that shapes the output (prompt version, model, temperature).
+
+- TTL:          settings.CAREPLAN_LLM_CACHE_TTL
+- Eviction:     bounded by the cache backend (LocMem MAX_ENTRIES / Redis maxmemory)
+- Invalidation: bump prompts.PROMPT_VERSION (editing the interaction data does it
+                automatically), or call invalidate() to drop everything
+"""
+
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .interactions import load_index
+from .medications import canonicalize_regimen, normalize_terms
+from .metrics import llm_cache_requests_total
+from .prompts import LLM_MODEL, LLM_TEMPERATURE, PROMPT_VERSION
+
+KEY_PREFIX = 'careplan:llm'
+GENERATION_KEY = f'{KEY_PREFIX}:generation'
+
+
+def make_key(medications, allergies, health_conditions):
+    digest = profile_hash(medications, allergies, health_conditions)
+    return f'{KEY_PREFIX}:{_generation()}:{digest}'
+
+
+def profile_hash(medications, allergies, health_conditions):
+    """sha256 of the normalized inputs and everything else that shapes the output."""
+    payload = json.dumps(
+        [
+            # Directions kept: a plan's schedule depends on them
+            canonicalize_regimen(medications),
+            normalize_terms(allergies),
+            normalize_terms(health_conditions),
+            PROMPT_VERSION,
+            load_index().version,
+            LLM_MODEL,
+            LLM_TEMPERATURE,
+        ],
+        ensure_ascii=False,
+        separators=(',', ':'),
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def get_cached_careplan(medications, allergies, health_conditions):
+    """Return cached plan text, or None on a miss."""
+    text = cache.get(make_key(medications, allergies, health_conditions))
+    llm_cache_requests_total.labels(result='hit' if text is not None else 'miss').inc()
+    return text
+
+
+def store_careplan(medications, allergies, health_conditions, text):
+    cache.set(
+        make_key(medications, allergies, health_conditions),
+        text,
+        timeout=settings.CAREPLAN_LLM_CACHE_TTL,
+    )
+
+
+def invalidate():
+    """Drop every cached plan by moving to a new key generation."""
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        # Key missing (evicted or never set) — start a fresh generation
+        cache.set(GENERATION_KEY, _generation() + 1, timeout=None)
+
+
+def _generation():
+    return cache.get_or_set(GENERATION_KEY, 1, timeout=None)
@@ -0,0 +1,82 @@
+"""
+Process-wide OpenAI clients.
+
+Building openai.OpenAI(...) per call means a fresh connection pool and a TLS
+handshake for every care plan. These helpers create the client lazily and
+reuse its keep-alive connections:
+
+- get_llm_client():       one sync client per process (thread-safe)
+- get_async_llm_client(): one async client per event loop — httpx async pools
+                          are bound to the loop that created them
+
+Pool size and keep-alive come from CAREPLAN_LLM_MAX_CONNECTIONS,
+CAREPLAN_LLM_MAX_KEEPALIVE and CAREPLAN_LLM_KEEPALIVE_SECONDS.
+
+The SDK's own retries are off (max_retries=0): its 429 retries would go around
+the shared rate limiter, and the workers already retry failed calls.
+"""
+
+import asyncio
+import os
+import threading
+import weakref
+
+import httpx
+from django.conf import settings
+
+_client = None
+_client_api_key = None
+_lock = threading.Lock()
+_async_clients = weakref.WeakKeyDictionary()  # event loop -> (api_key, client)
+
+
+def get_llm_client(api_key):
+    global _client, _client_api_key
+    if _client is None or _client_api_key != api_key:
+        with _lock:
+            if _client is None or _client_api_key != api_key:
+                import openai
+                _client = openai.OpenAI(
+                    api_key=api_key,
+                    timeout=settings.CAREPLAN_LLM_TIMEOUT,
+                    max_retries=0,
+                    http_client=openai.DefaultHttpxClient(limits=_limits()),
+                )
+                _client_api_key = api_key
+    return _client
+
+
+def get_async_llm_client(api_key):
+    loop = asyncio.get_running_loop()
+    entry = _async_clients.get(loop)
+    if entry is None or entry[0] != api_key:
+        import openai
+        client = openai.AsyncOpenAI(
+            api_key=api_key,
+            timeout=settings.CAREPLAN_LLM_TIMEOUT,
+            max_retries=0,
+            http_client=openai.DefaultAsyncHttpxClient(limits=_limits()),
+        )
+        _async_clients[loop] = (api_key, client)
+        return client
+    return entry[1]
+
+
+def _limits():
+    return httpx.Limits(
+        max_connections=settings.CAREPLAN_LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=settings.CAREPLAN_LLM_MAX_KEEPALIVE,
+        keepalive_expiry=settings.CAREPLAN_LLM_KEEPALIVE_SECONDS,
+    )
+
+
+def _reset_after_fork():
+    # Prefork workers must not share the parent's sockets
+    global _client, _client_api_key, _lock
+    _client = None
+    _client_api_key = None
+    _lock = threading.Lock()
+    _async_clients.clear()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from careplan import llm_cache
+
+
+class Command(BaseCommand):
+    help = "Invalidate all cached LLM care plans (run after editing the prompt template)"
+
+    def handle(self, *args, **options):
+        llm_cache.invalidate()
+        self.stdout.write(self.style.SUCCESS("LLM care plan cache invalidated."))
@@ -0,0 +1,43 @@
+import asyncio
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from careplan.async_worker import AsyncCarePlanWorker, requeue_stale
+from careplan.multiprocess import start_metrics_server
+from careplan.queue_depth import QueueDepthCollector
+
+
+class Command(BaseCommand):
+    help = "Generate care plans concurrently on one asyncio event loop (CAREPLAN_WORKER_MODE=async)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=settings.CAREPLAN_ASYNC_CONCURRENCY)
+        parser.add_argument('--timeout', type=float, default=settings.CAREPLAN_ASYNC_TASK_TIMEOUT)
+        parser.add_argument(
+            '--requeue-stale', type=int, default=600, metavar='SECONDS',
+            help="On startup, reset plans stuck in processing for longer than this back to pending",
+        )
+
+    def handle(self, *args, **options):
+        requeued = requeue_stale(options['requeue_stale'])
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale care plans.")
+
+        worker = AsyncCarePlanWorker(
+            concurrency=options['concurrency'],
+            task_timeout=options['timeout'],
+        )
+        self.stdout.write(
+            f"Async worker started: concurrency={worker.concurrency}, timeout={worker.task_timeout}s"
+        )
+        start_metrics_server(settings.CAREPLAN_WORKER_METRICS_PORT, [QueueDepthCollector()])
+        asyncio.run(self._run(worker))
+
+    async def _run(self, worker):
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await worker.run(stop)
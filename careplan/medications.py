@@ -0,0 +1,120 @@
+"""
+Medication-list normalizer and parser.
+
+Turns free text like "Metformin 500mg, Lisinopril 10 MG" into structured
+(drug, strength, unit, directions) records and a canonical string
+"lisinopril 10mg, metformin 500mg" that is stable across order, case,
+spacing and unit spelling.
+
+The canonical string leaves out directions (frequency, dosage form): it
+identifies what the patient takes. canonicalize_regimen() keeps them, for
+keys of anything generated from the schedule (the LLM cache, coalescing).
+
+Plain Python (no Django imports) so the Lambdas can share it. All regexes are
+compiled once at import time and results are memoized, so bulk imports and
+cache keying stay cheap.
+"""
+
+import re
+from functools import lru_cache
+from typing import NamedTuple
+
+
+class Medication(NamedTuple):
+    drug: str
+    strength: str = ''
+    unit: str = ''
+    directions: str = ''    # e.g. 'twice daily tablets', as written (lowercased)
+
+    def canonical(self):
+        if self.strength:
+            sep = ' ' if self.unit == 'units' else ''
+            return f"{self.drug} {self.strength}{sep}{self.unit}".strip()
+        return self.drug
+
+    def regimen(self):
+        return f"{self.canonical()} {self.directions}".strip()
+
+
+# Split on , ; newlines and CJK list punctuation — but not the comma in "1,000mg"
+_ITEM_SPLIT_RE = re.compile(r'(?:(?<!\d),|,(?!\d{3})|[;\n、，；])+')
+_STRENGTH_RE = re.compile(
+    r'(?P<strength>\d+(?:,\d{3})*(?:\.\d+)?)\s*'
+    r'(?P<unit>mcg|µg|μg|ug|mg|milligrams?|micrograms?|grams?|g|ml|iu|units?|%)'
+    # Per-volume strengths: 250mg/5ml, 10mg/ml
+    r'(?:\s*/\s*(?P<per>\d+(?:\.\d+)?)?\s*(?P<per_unit>ml|l)\b)?'
+    r'(?![a-z])',
+    re.IGNORECASE,
+)
+_PUNCT_RE = re.compile(r'[^\w\s\-/]+')
+_SPACE_RE = re.compile(r'\s+')
+# Directions: dropped from the drug name, kept in Medication.directions
+_NOISE_RE = re.compile(
+    r'\b(?:tabs?|tablets?|caps?|capsules?|po|qd|bid|tid|qid|prn|once|twice|daily|'
+    r'a day|per day|at night|in the morning)\b',
+    re.IGNORECASE,
+)
+
+_UNIT_ALIASES = {
+    'µg': 'mcg', 'μg': 'mcg', 'ug': 'mcg', 'microgram': 'mcg', 'micrograms': 'mcg',
+    'milligram': 'mg', 'milligrams': 'mg',
+    'gram': 'g', 'grams': 'g',
+    'unit': 'units',
+}
+
+
+@lru_cache(maxsize=8192)
+def parse_item(text):
+    """Parse one entry ("Metformin 500 mg") into a Medication, or None if empty."""
+    strength = unit = ''
+    match = _STRENGTH_RE.search(text)
+    if match:
+        strength = _normalize_number(match.group('strength'))
+        unit = match.group('unit').lower()
+        unit = _UNIT_ALIASES.get(unit, unit)
+        if match.group('per_unit'):
+            unit += f"/{_normalize_number(match.group('per') or '')}{match.group('per_unit').lower()}"
+        text = text[:match.start()] + ' ' + text[match.end():]
+
+    directions = ' '.join(_SPACE_RE.sub(' ', m.group(0)).lower() for m in _NOISE_RE.finditer(text))
+    drug = _NOISE_RE.sub(' ', text)
+    drug = _PUNCT_RE.sub(' ', drug)
+    drug = _SPACE_RE.sub(' ', drug).strip().lower()
+    if not drug and not strength:
+        return None
+    return Medication(drug, strength, unit, directions)
+
+
+@lru_cache(maxsize=4096)
+def parse_medications(text):
+    """Parse a free-text list into a sorted, de-duplicated tuple of Medication."""
+    meds = {parse_item(item.strip()) for item in _ITEM_SPLIT_RE.split(text or '')}
+    meds.discard(None)
+    return tuple(sorted(meds))
+
+
+@lru_cache(maxsize=4096)
+def canonicalize_medications(text):
+    """'Metformin 500 MG, lisinopril 10mg' -> 'lisinopril 10mg, metformin 500mg'"""
+    return ', '.join(dict.fromkeys(med.canonical() for med in parse_medications(text)))
+
+
+@lru_cache(maxsize=4096)
+def canonicalize_regimen(text):
+    """Like canonicalize_medications, keeping directions: 'metformin 500mg twice daily'."""
+    return ', '.join(med.regimen() for med in parse_medications(text))
+
+
+@lru_cache(maxsize=4096)
+def normalize_terms(text):
+    """Allergies / conditions: split, lowercase, de-duplicate and sort."""
+    terms = {_SPACE_RE.sub(' ', t).strip().lower() for t in _ITEM_SPLIT_RE.split(text or '')}
+    terms.discard('')
+    return ', '.join(sorted(terms))
+
+
+def _normalize_number(value):
+    value = value.replace(',', '')
+    if '.' in value:
+        value = value.rstrip('0').rstrip('.')
+    return value
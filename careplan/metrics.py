@@ -1,3 +1,8 @@
+"""
+Prometheus collectors. With PROMETHEUS_MULTIPROC_DIR set they are shared
+across processes, see careplan/multiprocess.py.
+"""
+
 from prometheus_client import Counter, Histogram, Gauge
 
 # ── Business Metrics ──────────────────────────────────────
@@ -18,6 +23,8 @@ careplan_active_count = Gauge(
     'careplan_active_count',
     'Current care plans by status',
     ['status'],
+    # Set by whichever worker ran update_careplan_gauge last
+    multiprocess_mode='livemostrecent',
 )
 
 careplan_duplicate_blocks_total = Counter(
@@ -26,6 +33,23 @@ careplan_duplicate_blocks_total = Counter(
     ['reason'],
 )
 
+llm_cache_requests_total = Counter(
+    'llm_cache_requests_total',
+    'Care plan LLM cache lookups',
+    ['result'],
+)
+
+careplan_status_cache_requests_total = Counter(
+    'careplan_status_cache_requests_total',
+    'Status endpoint cache lookups',
+    ['result'],
+)
+
+careplan_coalesced_total = Counter(
+    'careplan_coalesced_total',
+    'Care plans completed with the text of an identical in-flight generation',
+)
+
 # ── Performance Metrics ───────────────────────────────────
 
 http_request_duration_seconds = Histogram(
@@ -47,6 +71,45 @@ llm_call_duration_seconds = Histogram(
     buckets=[1, 5, 10, 15, 20, 30, 45, 60],
 )
 
+llm_time_to_first_token_seconds = Histogram(
+    'llm_time_to_first_token_seconds',
+    'Time from sending a streaming LLM request to the first text chunk',
+    buckets=[0.25, 0.5, 1, 2, 3, 5, 10],
+)
+
+llm_rate_limiter_wait_seconds = Histogram(
+    'llm_rate_limiter_wait_seconds',
+    'Time spent waiting for LLM rate limiter capacity before a call',
+    buckets=[0, 0.1, 0.5, 1, 2, 5, 10, 30, 60],
+)
+
+careplan_queue_wait_seconds = Histogram(
+    'careplan_queue_wait_seconds',
+    'Time a care plan waited in the queue before a worker started it',
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120, 300, 600],
+)
+
+careplan_processing_seconds = Histogram(
+    'careplan_processing_seconds',
+    'Worker time of the attempt that finished a care plan (load to final save)',
+    ['status'],
+    buckets=[0.1, 0.5, 1, 5, 10, 20, 30, 45, 60, 90, 120],
+)
+
+careplan_end_to_end_seconds = Histogram(
+    'careplan_end_to_end_seconds',
+    'Time from submit to the final status, including queueing and retries',
+    ['status'],
+    buckets=[1, 5, 10, 20, 30, 45, 60, 90, 120, 300, 600, 1800],
+)
+
+careplan_stage_duration_seconds = Histogram(
+    'careplan_stage_duration_seconds',
+    'Duration of one traced stage of a care plan (span name, see careplan/tracing.py)',
+    ['stage'],
+    buckets=[0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 5, 10, 30, 60, 120],
+)
+
 celery_task_duration_seconds = Histogram(
     'celery_task_duration_seconds',
     'Celery task execution duration',
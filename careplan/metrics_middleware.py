@@ -1,46 +1,59 @@
-import time
+import re
+from functools import lru_cache
 
+from . import tracing
 from .metrics import http_request_duration_seconds, http_request_errors_total
 
+UNMATCHED = '<unmatched>'
+METHODS = frozenset(['GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
+_CONVERTER = re.compile(r'<(?:\w+:)?(\w+)>')
+
 
 class PrometheusMetricsMiddleware:
-    """Records request duration and error counts for every HTTP request."""
+    """
+    The one instrumentation layer around every request (django_prometheus's
+    Before/After middleware pair is not installed): opens the root tracing
+    span, records duration and error counts. X-Trace-Id finds the request in
+    the trace log.
+
+    The endpoint label is the matched URL route, so ids and unknown paths
+    never become label values; the bound metrics per (method, route, status)
+    are cached, so a request costs two dict lookups instead of .labels().
+    """
 
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        start = time.monotonic()
-        response = self.get_response(request)
-        duration = time.monotonic() - start
-
-        endpoint = self._normalize_path(request.path)
-        method = request.method
-        status_code = str(response.status_code)
-
-        http_request_duration_seconds.labels(
-            method=method,
-            endpoint=endpoint,
-            status_code=status_code,
-        ).observe(duration)
-
-        if response.status_code >= 400:
-            http_request_errors_total.labels(
-                method=method,
-                endpoint=endpoint,
-                status_code=status_code,
-            ).inc()
-
+        with tracing.span('http.request') as span:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        duration, errors = _bound_metrics(
+            request.method, match.route if match is not None else None, response.status_code,
+        )
+        duration.observe(span.duration)
+        if errors is not None:
+            errors.inc()
+
+        response['X-Trace-Id'] = span.trace_id
         return response
 
-    @staticmethod
-    def _normalize_path(path):
-        """Replace numeric IDs with {id} to prevent label cardinality explosion."""
-        parts = path.strip('/').split('/')
-        normalized = []
-        for part in parts:
-            if part.isdigit():
-                normalized.append('{id}')
-            else:
-                normalized.append(part)
-        return '/' + '/'.join(normalized) + '/' if normalized else '/'
+
+@lru_cache(maxsize=1024)
+def _bound_metrics(method, route, status_code):
+    """(duration histogram, error counter or None) for one label combination."""
+    labels = {
+        'method': method if method in METHODS else 'other',
+        'endpoint': endpoint_label(route),
+        'status_code': str(status_code),
+    }
+    errors = http_request_errors_total.labels(**labels) if status_code >= 400 else None
+    return http_request_duration_seconds.labels(**labels), errors
+
+
+def endpoint_label(route):
+    """'api/careplans/<int:pk>/status/' -> '/api/careplans/{pk}/status/'; None when no URL matched."""
+    if route is None:
+        return UNMATCHED
+    return '/' + _CONVERTER.sub(r'{\1}', route)
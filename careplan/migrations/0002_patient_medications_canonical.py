@@ -0,0 +1,29 @@
+# Generated by Django 5.1 on 2026-10-16 22:31
+
+from django.db import migrations, models
+
+from careplan.medications import canonicalize_medications
+
+
+def backfill_canonical(apps, schema_editor):
+    Patient = apps.get_model('careplan', 'Patient')
+    patients = list(Patient.objects.only('id', 'medications'))
+    for patient in patients:
+        patient.medications_canonical = canonicalize_medications(patient.medications)
+    Patient.objects.bulk_update(patients, ['medications_canonical'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('careplan', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='patient',
+            name='medications_canonical',
+            field=models.TextField(blank=True, default='', editable=False, help_text='Normalized form of medications, see careplan/medications.py'),
+        ),
+        migrations.RunPython(backfill_canonical, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1 on 2026-10-16 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('careplan', '0002_patient_medications_canonical'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='careplan',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('partial', 'Partial'), ('completed', 'Completed'), ('failed', 'Failed')], default='pending', max_length=20),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1 on 2026-10-16 22:46
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_patients(apps, schema_editor):
+    """get_or_create could race into duplicate patients; keep the oldest row of each."""
+    Patient = apps.get_model('careplan', 'Patient')
+    CarePlan = apps.get_model('careplan', 'CarePlan')
+    duplicates = (
+        Patient.objects.values('first_name', 'last_name', 'date_of_birth')
+        .annotate(n=Count('id'), keep_id=Min('id'))
+        .filter(n__gt=1)
+    )
+    for dup in duplicates:
+        others = Patient.objects.filter(
+            first_name=dup['first_name'], last_name=dup['last_name'], date_of_birth=dup['date_of_birth'],
+        ).exclude(id=dup['keep_id'])
+        CarePlan.objects.filter(patient__in=others).update(patient_id=dup['keep_id'])
+        others.delete()
+
+
+class Migration(migrations.Migration):
+    # Separate from 0005: ALTER TABLE can't run in the same transaction as
+    # the FK updates here (pending deferred trigger events)
+
+    dependencies = [
+        ('careplan', '0003_careplan_partial_status'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_patients, migrations.RunPython.noop),
+    ]
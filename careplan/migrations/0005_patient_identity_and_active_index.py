@@ -0,0 +1,21 @@
+# Generated by Django 5.1 on 2026-10-16 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('careplan', '0004_merge_duplicate_patients'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='careplan',
+            index=models.Index(condition=models.Q(('status__in', ('pending', 'processing', 'partial'))), fields=['patient'], name='careplan_active_patient_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='patient',
+            constraint=models.UniqueConstraint(fields=('first_name', 'last_name', 'date_of_birth'), name='unique_patient_identity'),
+        ),
+    ]
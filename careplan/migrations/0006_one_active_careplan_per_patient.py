@@ -0,0 +1,42 @@
+# Generated by Django 5.1 on 2026-10-16 22:49
+
+from django.db import migrations, models
+
+ACTIVE_STATUSES = ('pending', 'processing', 'partial')
+
+
+def fail_extra_active_plans(apps, schema_editor):
+    """Before the unique index: where racing submits left several active plans, keep the newest."""
+    CarePlan = apps.get_model('careplan', 'CarePlan')
+    seen = set()
+    extra = []
+    for plan_id, patient_id in (
+        CarePlan.objects.filter(status__in=ACTIVE_STATUSES)
+        .order_by('patient_id', '-created_at', '-id')
+        .values_list('id', 'patient_id')
+    ):
+        if patient_id in seen:
+            extra.append(plan_id)
+        seen.add(patient_id)
+    CarePlan.objects.filter(id__in=extra).update(
+        status='failed', care_plan_text='Superseded by a newer request for the same patient.',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('careplan', '0005_patient_identity_and_active_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_extra_active_plans, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='careplan',
+            name='careplan_active_patient_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='careplan',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ('pending', 'processing', 'partial'))), fields=('patient',), name='careplan_one_active_per_patient'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1 on 2026-10-16 22:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('careplan', '0006_one_active_careplan_per_patient'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='careplan',
+            index=models.Index(fields=['-created_at', '-id'], name='careplan_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.1 on 2026-10-16 23:09
+
+from django.db import migrations, models
+
+# Statement-level triggers with transition tables: a bulk insert or a claim of
+# 50 plans is one aggregated upsert, not one per row. Rows are upserted in
+# (status, slot) order so concurrent statements can't deadlock on them.
+UPSERT = """
+    INSERT INTO careplan_careplanstatuscount (status, slot, count)
+    SELECT status, slot, sum(delta) FROM ({changes}) AS changes
+    GROUP BY status, slot
+    HAVING sum(delta) <> 0
+    ORDER BY status, slot
+    ON CONFLICT (status, slot)
+    DO UPDATE SET count = careplan_careplanstatuscount.count + EXCLUDED.count
+"""
+
+CHANGES = {
+    'insert': "SELECT status, id % 16 AS slot, 1 AS delta FROM new_rows",
+    'delete': "SELECT status, id % 16 AS slot, -1 AS delta FROM old_rows",
+    'update': """
+        SELECT o.status, o.id % 16 AS slot, -1 AS delta
+        FROM old_rows o JOIN new_rows n ON n.id = o.id WHERE n.status <> o.status
+        UNION ALL
+        SELECT n.status, n.id % 16 AS slot, 1 AS delta
+        FROM old_rows o JOIN new_rows n ON n.id = o.id WHERE n.status <> o.status
+    """,
+}
+
+TRANSITION_TABLES = {
+    'insert': 'NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+}
+
+CREATE_TRIGGERS = [
+    f"""
+    CREATE FUNCTION careplan_status_count_{op}() RETURNS trigger LANGUAGE plpgsql AS $$
+    BEGIN
+        {UPSERT.format(changes=CHANGES[op])};
+        RETURN NULL;
+    END $$;
+    CREATE TRIGGER careplan_status_count_{op}
+        AFTER {op.upper()} ON careplan_careplan
+        REFERENCING {TRANSITION_TABLES[op]}
+        FOR EACH STATEMENT EXECUTE FUNCTION careplan_status_count_{op}();
+    """
+    for op in CHANGES
+]
+
+DROP_TRIGGERS = [
+    f"""
+    DROP TRIGGER careplan_status_count_{op} ON careplan_careplan;
+    DROP FUNCTION careplan_status_count_{op}();
+    """
+    for op in CHANGES
+]
+
+BACKFILL = """
+    INSERT INTO careplan_careplanstatuscount (status, slot, count)
+    SELECT status, id % 16, count(*) FROM careplan_careplan GROUP BY 1, 2
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('careplan', '0008_patient_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CarePlanStatusCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('slot', models.SmallIntegerField()),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='careplan',
+            index=models.Index(fields=['status'], name='careplan_status_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='careplanstatuscount',
+            constraint=models.UniqueConstraint(fields=('status', 'slot'), name='careplan_status_count_slot'),
+        ),
+        migrations.RunSQL(CREATE_TRIGGERS, reverse_sql=DROP_TRIGGERS),
+        migrations.RunSQL(BACKFILL, reverse_sql=migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,51 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector, SearchVectorField
 from django.db import models
 
+from .medications import canonicalize_medications
+
 
 class Patient(models.Model):
     first_name = models.CharField(max_length=100)
     last_name = models.CharField(max_length=100)
     date_of_birth = models.DateField()
     medications = models.TextField(help_text="Free-text list of medications")
+    medications_canonical = models.TextField(
+        blank=True, default='', editable=False,
+        help_text="Normalized form of medications, see careplan/medications.py",
+    )
     allergies = models.TextField(blank=True, default='')
     health_conditions = models.TextField(blank=True, default='')
+    # The status / download bodies of the patient's plans include the fields
+    # above, so their validators use this too (CarePlan.last_modified). The
+    # raw SQL upserts bump it when those fields change.
+    updated_at = models.DateTimeField(auto_now=True)
+    # Care plan search (careplan/search.py). Computed by Postgres on every
+    # write, including the raw SQL upserts in services.py and the Lambdas.
+    search = models.GeneratedField(
+        expression=(
+            SearchVector('first_name', 'last_name', weight='A', config='simple')
+            + SearchVector('medications', weight='B', config='simple')
+        ),
+        output_field=SearchVectorField(),
+        db_persist=True,
+    )
+
+    class Meta:
+        constraints = [
+            # Patient identity: the ON CONFLICT target of the upserts in services.py
+            models.UniqueConstraint(
+                fields=['first_name', 'last_name', 'date_of_birth'],
+                name='unique_patient_identity',
+            ),
+        ]
+        indexes = [
+            GinIndex(fields=['search'], name='patient_search_gin'),
+        ]
+
+    def save(self, *args, **kwargs):
+        self.medications_canonical = canonicalize_medications(self.medications)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
@@ -17,9 +55,12 @@ class CarePlan(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('processing', 'Processing'),
+        ('partial', 'Partial'),
         ('completed', 'Completed'),
         ('failed', 'Failed'),
     ]
+    # Still being generated — blocks a second submit for the same patient
+    ACTIVE_STATUSES = ('pending', 'processing', 'partial')
 
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
@@ -27,5 +68,52 @@ class CarePlan(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        constraints = [
+            # At most one active plan per patient: create_careplan inserts with
+            # ON CONFLICT DO NOTHING against this, which makes the duplicate
+            # check race-free. Finished plans, the vast majority, stay out of it.
+            models.UniqueConstraint(
+                fields=['patient'],
+                condition=models.Q(status__in=('pending', 'processing', 'partial')),
+                name='careplan_one_active_per_patient',
+            ),
+        ]
+        indexes = [
+            # Keyset pagination of the list endpoint: ORDER BY created_at DESC, id DESC
+            models.Index(fields=['-created_at', '-id'], name='careplan_created_id_idx'),
+            # GROUP BY status when reconciling CarePlanStatusCount
+            models.Index(fields=['status'], name='careplan_status_idx'),
+        ]
+
     def __str__(self):
         return f"CarePlan #{self.id} - {self.patient} ({self.status})"
+
+    @property
+    def last_modified(self):
+        """When the status / download body last changed: the plan or its patient."""
+        return max(self.updated_at, self.patient.updated_at)
+
+
+class CarePlanStatusCount(models.Model):
+    """
+    Running number of care plans per status, for the careplan_active_count
+    gauge (see careplan/status_counts.py).
+
+    Statement triggers on the careplan table (migration 0009) apply every
+    insert, status change and delete in the same transaction, so raw-SQL and
+    bulk writes are counted too. Each status is split over 16 slots by plan
+    id so concurrent transitions don't queue on a single row lock; readers
+    sum the slots.
+    """
+    status = models.CharField(max_length=20)
+    slot = models.SmallIntegerField()
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'slot'], name='careplan_status_count_slot'),
+        ]
+
+    def __str__(self):
+        return f"{self.status}[{self.slot}] = {self.count}"
@@ -0,0 +1,65 @@
+"""
+Prometheus metrics across processes.
+
+Gunicorn workers and prefork Celery children don't share memory, so each
+would report only its own counters. With PROMETHEUS_MULTIPROC_DIR set in the
+environment (before anything imports prometheus_client), every process
+writes its samples to mmap-backed files there and a scrape merges them.
+
+- web:     django_prometheus's /metrics merges the files by itself
+- workers: start_metrics_server() serves the merged view on a port
+- cleanup: clear_metrics_dir() when the parent starts, before it imports
+           any metric (gunicorn on_starting, config/celery.py at import);
+           mark_dead(pid) when a child exits, so its live gauges disappear
+
+Without PROMETHEUS_MULTIPROC_DIR everything falls back to the in-process
+registry, as in tests and single-process local runs. Plain Python (no
+Django imports) so the gunicorn config and Celery signals can use it.
+"""
+
+import glob
+import os
+
+from prometheus_client import REGISTRY, CollectorRegistry, multiprocess, start_http_server
+
+
+def metrics_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR', '')
+
+
+def get_registry():
+    if not metrics_dir():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def start_metrics_server(port, collectors=()):
+    """
+    Serve /metrics for a non-web process (Celery, async worker); port 0 disables.
+    `collectors` are read live at each scrape, next to the merged samples.
+    """
+    if not port:
+        return
+    registry = get_registry()
+    for collector in collectors:
+        registry.register(collector)
+    start_http_server(port, registry=registry)
+    print(f"[metrics] Serving Prometheus metrics on :{port}")
+
+
+def clear_metrics_dir():
+    """Drop files left by a previous run. Only safe before any worker has started."""
+    path = metrics_dir()
+    if not path:
+        return
+    os.makedirs(path, exist_ok=True)
+    for name in glob.glob(os.path.join(path, '*.db')):
+        os.remove(name)
+
+
+def mark_dead(pid):
+    """Forget a dead process's live gauges; its counters and histograms keep counting."""
+    if metrics_dir():
+        multiprocess.mark_process_dead(pid)
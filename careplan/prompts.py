@@ -0,0 +1,88 @@
+"""
+Prompt template for care plan generation.
+
+Plain Python (no Django imports) so the Lambdas can share it.
+
+Bump PROMPT_VERSION whenever SYSTEM_PROMPT or build_prompt() changes:
+it is part of the LLM cache key, so old cached plans stop matching.
+"""
+
+PROMPT_VERSION = '4'
+
+LLM_MODEL = 'gpt-4o-mini'
+LLM_TEMPERATURE = 0.3
+LLM_MAX_TOKENS = 3000
+
+SYSTEM_PROMPT = (
+    "You are ElderMedAssist, a strict personal medication butler for elderly patients. "
+    "You speak directly to the patient as 'you'. "
+    "You are NOT an advisor — you are a butler who gives ORDERS. "
+    "Your output is a concrete daily plan the patient follows exactly, not suggestions. "
+    "NEVER say 'consult your doctor', 'talk to your healthcare provider', or 'as prescribed'. "
+    "NEVER give vague advice. Every sentence must be a specific instruction or a specific fact. "
+    "If a medication + lifestyle combination is dangerous, say so BLUNTLY in the first section — "
+    "do not bury it or soften it. "
+    "Write in simple language a 70-year-old can understand. Keep sentences short."
+)
+
+
+def build_prompt(medications, allergies, health_conditions, known_dangers=()):
+    """known_dangers: interactions.Conflict list from the local pre-screen."""
+    # The patient's name is deliberately left out: the plan only depends on
+    # meds/allergies/conditions, which keeps identical profiles cacheable.
+    if known_dangers:
+        screened = (
+            "These dangerous combinations were already confirmed by our interaction checker. "
+            "List each of them first, in your own words, with the danger and what the patient MUST do:\n"
+            + ''.join(f"- {c.first} + {c.second}: {c.danger}. {c.action}.\n" for c in known_dangers)
+            + "Then add any OTHER dangerous combination you find — only ones the patient actually "
+            "takes or does, not habits or drugs they say they avoid. For EACH of them:\n"
+        )
+    else:
+        screened = (
+            "Our interaction checker found no known dangers; add any you find. "
+            "Cross-check every medication against every other medication, every allergy, and every "
+            "health condition or lifestyle habit the patient actually has (not ones they say they avoid). "
+            "For EACH dangerous combination found:\n"
+        )
+    return (
+        f"Medications: {medications}\n"
+        f"Allergies: {allergies or 'None reported'}\n"
+        f"Health Conditions / Lifestyle: {health_conditions or 'None reported'}\n\n"
+        f"Generate the daily care plan using EXACTLY these sections and format:\n\n"
+        f"## ⚠️ DANGER — Must Read First\n"
+        f"{screened}"
+        f"- Name the two things that conflict (e.g. '头孢 + 酒精')\n"
+        f"- State the exact medical danger (e.g. 'causes disulfiram-like reaction: vomiting, racing heart, "
+        f"difficulty breathing, potentially fatal')\n"
+        f"- State what the patient MUST do (e.g. 'Do NOT drink any alcohol for the entire course of "
+        f"头孢 and 7 days after the last dose')\n"
+        f"If no dangers exist, write 'No critical dangers found.'\n\n"
+        f"## 📋 Your Daily Medication Schedule\n"
+        f"Create a SPECIFIC hour-by-hour plan using this exact format. Assign each medication to a real "
+        f"clock time based on medical best practice (absorption, food interactions, sleep effects). "
+        f"Use this template:\n"
+        f"- **7:00 AM — Wake Up**: [what to do, e.g. drink a glass of water]\n"
+        f"- **8:00 AM — Breakfast**: [which medication to take, with food or not, how to take it]\n"
+        f"- **12:00 PM — Lunch**: [which medication if any]\n"
+        f"- **6:00 PM — Dinner**: [which medication if any]\n"
+        f"- **9:30 PM — Bedtime**: [which medication if any]\n"
+        f"Add or remove time slots as needed for this patient's specific medications. "
+        f"Every medication must appear in the schedule with an exact time.\n\n"
+        f"## 💊 About Each Medication\n"
+        f"For each medication, write 2-3 sentences: what it does, its most common side effect "
+        f"for THIS patient (considering their age, conditions, and other meds), and one specific "
+        f"thing to watch for.\n\n"
+        f"## 🚫 Things You Must NOT Do\n"
+        f"List specific forbidden actions based on THIS patient's exact medications and conditions. "
+        f"Format: '[Action] — because [specific medical reason]'. "
+        f"Examples of the level of specificity required:\n"
+        f"- 'Do NOT drink alcohol while taking 头孢 — it causes a disulfiram-like reaction (vomiting, "
+        f"rapid heartbeat, potentially fatal)'\n"
+        f"- 'Do NOT take ibuprofen — it increases bleeding risk with your current medications'\n"
+        f"Do NOT write generic advice like 'be careful' or 'talk to your doctor'.\n\n"
+        f"## 🚨 Call 911 (Emergency) Immediately If\n"
+        f"List 3-5 specific emergency symptoms tied to THIS patient's medications and conditions. "
+        f"Not generic symptoms — symptoms that would specifically indicate a dangerous reaction "
+        f"to these exact medications.\n"
+    )
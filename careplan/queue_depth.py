@@ -0,0 +1,61 @@
+"""
+careplan_queue_depth: care plans waiting for a worker, read when Prometheus
+scrapes a worker's metrics endpoint (see careplan/multiprocess.py).
+
+- celery mode: LLEN of the Celery queue on the Redis broker, O(1)
+- async mode:  the pending count from the trigger-maintained summary
+               (status_counts), a few dozen small rows
+
+Read at scrape time rather than set by a beat task: a task sampling the
+queue would itself wait at the back of it, exactly when the backlog matters.
+"""
+
+import threading
+
+from django.conf import settings
+from django.db import connection
+from prometheus_client.core import GaugeMetricFamily
+
+from . import status_counts
+
+NAME = 'careplan_queue_depth'
+DOCUMENTATION = 'Care plans waiting for a worker (every worker reports it: aggregate with max)'
+
+_broker = None
+_lock = threading.Lock()
+
+
+class QueueDepthCollector:
+
+    def describe(self):
+        # Without describe(), registering would already call collect() and hit Redis
+        return [GaugeMetricFamily(NAME, DOCUMENTATION)]
+
+    def collect(self):
+        try:
+            depth = read_depth()
+        except Exception as e:
+            # The rest of the scrape is still worth having
+            print(f"[metrics] Could not read queue depth: {e!r}")
+            return
+        yield GaugeMetricFamily(NAME, DOCUMENTATION, value=depth)
+
+
+def read_depth():
+    if settings.CAREPLAN_WORKER_MODE == 'celery':
+        from config.celery import app
+        return _get_broker().llen(app.conf.task_default_queue)
+    try:
+        return status_counts.current().get('pending', 0)
+    finally:
+        connection.close()  # scrapes run on short-lived server threads
+
+
+def _get_broker():
+    global _broker
+    if _broker is None:
+        with _lock:
+            if _broker is None:
+                import redis
+                _broker = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _broker
@@ -0,0 +1,214 @@
+"""
+Distributed rate limiter for OpenAI calls, shared by every worker via Redis.
+
+Two token buckets refill continuously: requests/minute (CAREPLAN_LLM_RPM) and
+tokens/minute (CAREPLAN_LLM_TPM). Before each call a worker reserves one
+request plus the estimated prompt + max_tokens (OpenAI counts max_tokens
+against TPM up front). If either bucket is short, the worker waits in front of
+the limiter instead of sending a request that would 429.
+
+The limiter adapts to what OpenAI reports:
+- x-ratelimit-limit-*      replace the configured RPM/TPM for all workers
+- x-ratelimit-remaining-*  at zero, pause everyone until x-ratelimit-reset-*
+- 429 responses            pause everyone for retry-after / reset
+
+Waits get a little jitter so workers don't retry in lockstep. Without Redis
+(CAREPLAN_REDIS_URL empty) there are no buckets; a 429 still pauses the
+current process.
+
+The LLM call functions in services.py report headers and 429s; callers only
+decide when to try again (retry_after). aacquire and aobserve_headers run the
+Redis calls off the event loop.
+"""
+
+import asyncio
+import random
+import re
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from .metrics import llm_rate_limiter_wait_seconds
+from .prompts import LLM_MAX_TOKENS, SYSTEM_PROMPT, build_prompt
+from .redis_client import get_redis
+
+STATE_KEY = 'careplan:ratelimit:state'
+LIMITS_KEY = 'careplan:ratelimit:limits'
+COOLDOWN_KEY = 'careplan:ratelimit:cooldown'
+
+# Returns 0 when the reservation succeeded, otherwise milliseconds to wait.
+_ACQUIRE_LUA = """
+local cooldown = redis.call('PTTL', KEYS[3])
+if cooldown > 0 then return cooldown end
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local limits = redis.call('HMGET', KEYS[2], 'rpm', 'tpm')
+local rpm = tonumber(limits[1]) or tonumber(ARGV[1])
+local tpm = tonumber(limits[2]) or tonumber(ARGV[2])
+local need = math.min(tonumber(ARGV[3]), tpm)
+
+local state = redis.call('HMGET', KEYS[1], 'req', 'tok', 'ts')
+local req = tonumber(state[1]) or rpm
+local tok = tonumber(state[2]) or tpm
+local elapsed = math.max(0, now - (tonumber(state[3]) or now))
+req = math.min(rpm, req + elapsed * rpm / 60000)
+tok = math.min(tpm, tok + elapsed * tpm / 60000)
+
+local wait = 0
+if req < 1 then wait = math.ceil((1 - req) * 60000 / rpm) end
+if tok < need then wait = math.max(wait, math.ceil((need - tok) * 60000 / tpm)) end
+if wait == 0 then
+    req = req - 1
+    tok = tok - need
+end
+redis.call('HSET', KEYS[1], 'req', tostring(req), 'tok', tostring(tok), 'ts', tostring(now))
+redis.call('PEXPIRE', KEYS[1], 120000)
+return wait
+"""
+
+_script = None
+_local_pause_until = 0.0  # monotonic deadline, used when Redis is not configured
+_DURATION_RE = re.compile(r'(\d+(?:\.\d+)?)(ms|h|m|s)')
+_DURATION_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600}
+
+
+class RateLimitBackoff(Exception):
+    """Waited CAREPLAN_RATELIMIT_MAX_WAIT without capacity; retry after `wait` seconds."""
+
+    def __init__(self, wait):
+        self.wait = wait
+        super().__init__(f"LLM rate limiter busy, retry in {wait:.1f}s")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token for English; CJK runs closer to 1-2, so stay conservative
+    return len(text) // 3 + 1
+
+
+def estimate_request_tokens(medications, allergies, health_conditions, known_dangers=(), **_):
+    """Tokens one care plan request counts against TPM: prompt + max_tokens."""
+    prompt = build_prompt(medications, allergies, health_conditions, known_dangers)
+    return estimate_tokens(SYSTEM_PROMPT) + estimate_tokens(prompt) + LLM_MAX_TOKENS
+
+
+def try_acquire(tokens):
+    """Reserve capacity for one request. Returns 0 on success, else seconds to wait."""
+    global _script
+    client = get_redis()
+    if client is None:
+        return max(0.0, _local_pause_until - time.monotonic())
+    if _script is None:
+        _script = client.register_script(_ACQUIRE_LUA)
+    wait_ms = _script(
+        keys=[STATE_KEY, LIMITS_KEY, COOLDOWN_KEY],
+        args=[settings.CAREPLAN_LLM_RPM, settings.CAREPLAN_LLM_TPM, tokens],
+    )
+    return int(wait_ms) / 1000
+
+
+def acquire(tokens, max_wait=None):
+    """Block until capacity is reserved; raise RateLimitBackoff after max_wait seconds."""
+    max_wait = settings.CAREPLAN_RATELIMIT_MAX_WAIT if max_wait is None else max_wait
+    start = time.monotonic()
+    while True:
+        wait = try_acquire(tokens)
+        waited = time.monotonic() - start
+        if not wait:
+            llm_rate_limiter_wait_seconds.observe(waited)
+            return waited
+        if waited + wait > max_wait:
+            llm_rate_limiter_wait_seconds.observe(waited)
+            raise RateLimitBackoff(_jitter(wait))
+        time.sleep(_jitter(wait))
+
+
+async def aacquire(tokens):
+    """Async acquire: waits as long as needed without blocking the event loop."""
+    start = time.monotonic()
+    while True:
+        wait = await sync_to_async(try_acquire, thread_sensitive=False)(tokens)
+        if not wait:
+            waited = time.monotonic() - start
+            llm_rate_limiter_wait_seconds.observe(waited)
+            return waited
+        await asyncio.sleep(_jitter(wait))
+
+
+def observe_headers(headers):
+    """Adapt to the x-ratelimit-* headers of an OpenAI response."""
+    if headers is None:
+        return
+
+    limits = {}
+    for name, field in (('requests', 'rpm'), ('tokens', 'tpm')):
+        limit = _int_header(headers, f'x-ratelimit-limit-{name}')
+        if limit:
+            limits[field] = limit
+        if _int_header(headers, f'x-ratelimit-remaining-{name}') == 0:
+            pause(parse_duration(headers.get(f'x-ratelimit-reset-{name}')) or 1)
+
+    client = get_redis()
+    if limits and client is not None:
+        client.hset(LIMITS_KEY, mapping=limits)
+
+
+async def aobserve_headers(headers):
+    await sync_to_async(observe_headers, thread_sensitive=False)(headers)
+
+
+def retry_after(error):
+    """Seconds until OpenAI accepts requests again, from a 429's headers."""
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    return (
+        parse_duration(headers.get('retry-after-ms') and f"{headers['retry-after-ms']}ms")
+        or parse_duration(headers.get('retry-after') and f"{headers['retry-after']}s")
+        or max(parse_duration(headers.get('x-ratelimit-reset-requests')),
+               parse_duration(headers.get('x-ratelimit-reset-tokens')))
+        or 1
+    )
+
+
+def on_rate_limited(error):
+    """A 429 got through anyway: pause every worker until OpenAI says it's safe."""
+    wait = retry_after(error)
+    pause(wait)
+    return wait
+
+
+async def aon_rate_limited(error):
+    return await sync_to_async(on_rate_limited, thread_sensitive=False)(error)
+
+
+def pause(seconds):
+    global _local_pause_until
+    client = get_redis()
+    if client is None:
+        _local_pause_until = max(_local_pause_until, time.monotonic() + seconds)
+        return
+    # Only ever extend an existing pause
+    if int(seconds * 1000) > client.pttl(COOLDOWN_KEY):
+        client.set(COOLDOWN_KEY, 1, px=int(seconds * 1000))
+
+
+def is_rate_limit_error(error):
+    return type(error).__name__ == 'RateLimitError'
+
+
+def parse_duration(value):
+    """OpenAI reset headers: '1s', '6m0s', '20ms', '1h2m3.5s' -> seconds."""
+    if not value:
+        return 0
+    return sum(float(n) * _DURATION_UNITS[unit] for n, unit in _DURATION_RE.findall(value))
+
+
+def _int_header(headers, name):
+    try:
+        return int(headers.get(name))
+    except (TypeError, ValueError):
+        return None
+
+
+def _jitter(seconds):
+    return seconds * random.uniform(1.0, 1.1)
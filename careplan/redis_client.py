@@ -0,0 +1,25 @@
+"""
+Shared Redis client for pub/sub and coordination (not the Django cache).
+
+Returns None when settings.CAREPLAN_REDIS_URL is empty, so callers can fall
+back to Redis-free behaviour in local runs and tests.
+"""
+
+import threading
+
+from django.conf import settings
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_redis():
+    global _client
+    if not settings.CAREPLAN_REDIS_URL:
+        return None
+    if _client is None:
+        with _lock:
+            if _client is None:
+                import redis
+                _client = redis.Redis.from_url(settings.CAREPLAN_REDIS_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,130 @@
+"""
+Care plan search over patient name and medications.
+
+On Postgres, Patient.search is a generated tsvector column (names weighted A,
+medications B) behind a GIN index: every query word becomes a prefix term,
+all of them must match, and results are ranked with ts_rank. Other backends
+get an in-memory inverted index with the same tokenizing and weights.
+"""
+
+import re
+from bisect import bisect_left
+
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connection
+from django.db.models import Case, Count, F, FloatField, Max, Value, When
+from django.db.models.functions import Cast
+
+from .models import Patient
+
+SEARCH_CONFIG = 'simple'    # no stemming: names and drug names are not English words
+NAME_WEIGHT = 1.0           # ts_rank's default weight for A
+MEDICATION_WEIGHT = 0.4     # ... and for B
+
+_TOKEN_RE = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    return _TOKEN_RE.findall(text.lower())
+
+
+def search_careplans(plans, query):
+    """Narrow a CarePlan queryset to plans whose patient matches `query`, annotated with `rank`."""
+    terms = tokenize(query)
+    nothing = plans.none().annotate(rank=Value(0.0))
+    if not terms:
+        return nothing
+
+    if connection.vendor == 'postgresql':
+        tsquery = SearchQuery(
+            ' & '.join(f'{term}:*' for term in terms), search_type='raw', config=SEARCH_CONFIG,
+        )
+        # float8 so the rank round-trips exactly through the pagination cursor
+        return plans.filter(patient__search=tsquery).annotate(
+            rank=Cast(SearchRank(F('patient__search'), tsquery), FloatField()),
+        )
+
+    scores = get_index().search(terms)
+    if not scores:
+        return nothing
+    return plans.filter(patient_id__in=scores).annotate(
+        rank=Case(
+            *[When(patient_id=patient_id, then=Value(score)) for patient_id, score in scores.items()],
+            output_field=FloatField(),
+        ),
+    )
+
+
+# ── In-memory fallback ───────────────────────────────────
+
+class InvertedIndex:
+    """token -> {patient_id: weight}; prefix matches walk the sorted vocabulary."""
+
+    def __init__(self):
+        self.postings = {}
+        self.docs = {}
+        self._vocabulary = None
+
+    def add(self, patient_id, first_name, last_name, medications):
+        self.remove(patient_id)
+        tokens = dict.fromkeys(tokenize(medications), MEDICATION_WEIGHT)
+        tokens.update(dict.fromkeys(tokenize(f'{first_name} {last_name}'), NAME_WEIGHT))
+        self.docs[patient_id] = tokens
+        for token, weight in tokens.items():
+            self.postings.setdefault(token, {})[patient_id] = weight
+        self._vocabulary = None
+
+    def remove(self, patient_id):
+        for token in self.docs.pop(patient_id, ()):
+            del self.postings[token][patient_id]
+            if not self.postings[token]:
+                del self.postings[token]
+        self._vocabulary = None
+
+    def search(self, terms):
+        """{patient_id: score} of documents matching every term as a prefix."""
+        scores = None
+        for term in terms:
+            matches = {}
+            for token in self._prefixed(term):
+                for patient_id, weight in self.postings[token].items():
+                    matches[patient_id] = max(matches.get(patient_id, 0), weight)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {pid: score + matches[pid] for pid, score in scores.items() if pid in matches}
+            if not scores:
+                return {}
+        return scores
+
+    def _prefixed(self, term):
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.postings)
+        i = bisect_left(self._vocabulary, term)
+        while i < len(self._vocabulary) and self._vocabulary[i].startswith(term):
+            yield self._vocabulary[i]
+            i += 1
+
+
+_index = None
+_index_fingerprint = None
+
+
+def get_index():
+    """
+    The process-wide fallback index, built on first use.
+
+    Rebuilt whenever the patients' count, max id or max updated_at moves, so
+    inserts, deletes and updates are picked up from any process, including
+    the raw SQL and bulk upserts in services.py (which bump updated_at).
+    """
+    global _index, _index_fingerprint
+    fingerprint = tuple(
+        Patient.objects.aggregate(n=Count('id'), last=Max('id'), updated=Max('updated_at')).values()
+    )
+    if _index is None or fingerprint != _index_fingerprint:
+        index = InvertedIndex()
+        for row in Patient.objects.values_list('id', 'first_name', 'last_name', 'medications').iterator():
+            index.add(*row)
+        _index, _index_fingerprint = index, fingerprint
+    return _index
@@ -7,6 +7,44 @@ def serialize_careplan(p):
         'allergies': patient.allergies,
         'health_conditions': patient.health_conditions,
         'status': p.status,
-        'care_plan_text': p.care_plan_text if p.status == 'completed' else '',
+        'care_plan_text': p.care_plan_text if p.status in ('completed', 'partial') else '',
         'created_at': p.created_at.isoformat(),
     }
+
+
+# ── List view: projected rows from .values() ─────────────
+
+# Output field -> columns it needs. care_plan_text is the only large one.
+LIST_FIELDS = {
+    'id': ('id',),
+    'patient_name': ('patient__first_name', 'patient__last_name'),
+    'medications': ('patient__medications',),
+    'allergies': ('patient__allergies',),
+    'health_conditions': ('patient__health_conditions',),
+    'status': ('status',),
+    'care_plan_text': ('care_plan_text', 'status'),
+    'created_at': ('created_at',),
+}
+DEFAULT_LIST_FIELDS = tuple(f for f in LIST_FIELDS if f != 'care_plan_text')
+
+
+def list_columns(fields):
+    columns = {'id', 'created_at'}  # always needed for the cursor
+    for field in fields:
+        columns.update(LIST_FIELDS[field])
+    return sorted(columns)
+
+
+def serialize_careplan_row(row, fields):
+    """Like serialize_careplan, for a .values(*list_columns(fields)) row."""
+    out = {}
+    for field in fields:
+        if field == 'patient_name':
+            out[field] = f"{row['patient__first_name']} {row['patient__last_name']}"
+        elif field == 'care_plan_text':
+            out[field] = row['care_plan_text'] if row['status'] in ('completed', 'partial') else ''
+        elif field == 'created_at':
+            out[field] = row['created_at'].isoformat()
+        else:
+            out[field] = row[LIST_FIELDS[field][0]]
+    return out
@@ -1,84 +1,236 @@
+import base64
 import os
 import time
+from datetime import datetime
 
-from .exceptions import BlockError
-from .metrics import careplan_requests_total, llm_call_duration_seconds, llm_call_errors_total
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils.dateparse import parse_date
+
+from . import etags, ratelimit, search, status_cache, tracing
+from .exceptions import BlockError, ValidationError
+from .metrics import (
+    careplan_duplicate_blocks_total,
+    careplan_requests_total,
+    llm_call_duration_seconds,
+    llm_call_errors_total,
+    llm_time_to_first_token_seconds,
+)
+from .interactions import format_danger_section, screen
+from .llm_client import get_async_llm_client, get_llm_client
+from .medications import canonicalize_medications
 from .models import CarePlan, Patient
+from .prompts import LLM_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE, SYSTEM_PROMPT, build_prompt
+from .serializers import DEFAULT_LIST_FIELDS, list_columns, serialize_careplan_row
 
 
-# ── Patient ──────────────────────────────────────────────
+# ── Create CarePlan (main flow) ──────────────────────────
 
-def get_or_create_patient(first_name, last_name, date_of_birth, medications, allergies, health_conditions):
-    """Find existing patient by name+DOB, or create a new one. Always update meds/allergies/conditions."""
-    patient, created = Patient.objects.get_or_create(
-        first_name=first_name,
-        last_name=last_name,
-        date_of_birth=date_of_birth,
-        defaults={
-            'medications': medications,
-            'allergies': allergies,
-            'health_conditions': health_conditions,
-        },
-    )
+# Upsert the patient and insert the care plan in one statement. The insert is
+# guarded by the careplan_one_active_per_patient partial unique index: if the
+# patient already has an active plan (even one a concurrent request inserted a
+# moment ago), DO NOTHING returns a NULL id. The patient's earlier plans come
+# back too (the subquery doesn't see the new one): their cached status bodies
+# show the old medications. The patient's updated_at only moves
+# when the fields shown in its plans change (see CarePlan.last_modified); it is
+# clock_timestamp(), not the transaction start, so it sorts after the plans'
+# updated_at that Django sets.
+PATIENT_TABLE = Patient._meta.db_table
 
-    if not created:
-        # Update with latest info
-        patient.medications = medications
-        patient.allergies = allergies
-        patient.health_conditions = health_conditions
-        patient.save()
+CREATE_CAREPLAN_SQL = f"""
+WITH patient AS (
+    INSERT INTO {PATIENT_TABLE}
+        (first_name, last_name, date_of_birth, medications, medications_canonical, allergies, health_conditions,
+         updated_at)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, clock_timestamp())
+    ON CONFLICT (first_name, last_name, date_of_birth) DO UPDATE SET
+        medications = EXCLUDED.medications,
+        medications_canonical = EXCLUDED.medications_canonical,
+        allergies = EXCLUDED.allergies,
+        health_conditions = EXCLUDED.health_conditions,
+        updated_at = CASE
+            WHEN ({PATIENT_TABLE}.medications, {PATIENT_TABLE}.allergies, {PATIENT_TABLE}.health_conditions)
+                IS DISTINCT FROM (EXCLUDED.medications, EXCLUDED.allergies, EXCLUDED.health_conditions)
+            THEN clock_timestamp() ELSE {PATIENT_TABLE}.updated_at
+        END
+    RETURNING id
+), created AS (
+    INSERT INTO {CarePlan._meta.db_table} (patient_id, status, care_plan_text, created_at, updated_at)
+    SELECT id, 'pending', '', now(), now() FROM patient
+    ON CONFLICT (patient_id) WHERE status IN {CarePlan.ACTIVE_STATUSES} DO NOTHING
+    RETURNING id
+)
+SELECT created.id, ARRAY(SELECT id FROM {CarePlan._meta.db_table} WHERE patient_id = patient.id)
+FROM patient LEFT JOIN created ON true
+"""
 
-    return patient
 
+BULK_INSERT_CAREPLANS_SQL = f"""
+INSERT INTO {CarePlan._meta.db_table} (patient_id, status, care_plan_text, created_at, updated_at)
+SELECT patient_id, 'pending', '', now(), now() FROM unnest(%s::bigint[]) AS patient_id
+ON CONFLICT (patient_id) WHERE status IN {CarePlan.ACTIVE_STATUSES} DO NOTHING
+RETURNING id, patient_id
+"""
 
-# ── Duplicate check ──────────────────────────────────────
 
-def check_duplicate_careplan(patient):
-    """Block if the same patient already has a pending/processing care plan."""
-    active = CarePlan.objects.filter(
-        patient=patient,
-        status__in=['pending', 'processing'],
-    ).exists()
+def create_careplan(data):
+    # 1) Patient upsert + duplicate check + care plan insert, one round trip
+    with tracing.span('create.insert'), connection.cursor() as cursor:
+        cursor.execute(CREATE_CAREPLAN_SQL, [
+            data['patient_first_name'],
+            data['patient_last_name'],
+            data['date_of_birth'],
+            data['medications'],
+            canonicalize_medications(data['medications']),
+            data.get('allergies', ''),
+            data.get('health_conditions', ''),
+        ])
+        careplan_id, earlier_ids = cursor.fetchone()
+    status_cache.invalidate(*earlier_ids)
 
-    if active:
+    # 2) No id: the patient already has an active care plan
+    if careplan_id is None:
         raise BlockError(
             message="A medication guide is already being generated for this patient. Please wait for it to complete.",
             code='duplicate_active_careplan',
         )
 
+    # In async mode the run_async_worker loop claims pending plans from the DB
+    if settings.CAREPLAN_WORKER_MODE == 'celery':
+        from .tasks import generate_careplan_task
+        with tracing.span('create.enqueue'):
+            generate_careplan_task.delay(careplan_id, trace=tracing.inject(), enqueued_at=time.time())
 
-# ── Create CarePlan (main flow) ──────────────────────────
+    careplan_requests_total.labels(status='accepted').inc()
 
-def create_careplan(data):
-    # 1) Patient
-    patient = get_or_create_patient(
-        first_name=data['patient_first_name'],
-        last_name=data['patient_last_name'],
-        date_of_birth=data['date_of_birth'],
-        medications=data['medications'],
-        allergies=data.get('allergies', ''),
-        health_conditions=data.get('health_conditions', ''),
-    )
+    return {
+        'id': careplan_id,
+        'status': 'pending',
+        'message': 'Received, generating your medication guide.',
+    }
 
-    # 2) Duplicate check
-    check_duplicate_careplan(patient)
 
-    # 3) Create care plan
-    care_plan = CarePlan.objects.create(
-        patient=patient,
-        status='pending',
-    )
+# ── Bulk create ──────────────────────────────────────────
+
+BULK_REQUIRED_FIELDS = ('patient_first_name', 'patient_last_name', 'date_of_birth', 'medications')
+
+
+def create_careplans_bulk(items):
+    """
+    Create care plans for many patients with a fixed number of queries: one
+    patient upsert, one care plan insert that skips patients with an active
+    plan, one enqueue.
+
+    Returns one result per item, in order: {'index', 'id', 'status'} when
+    accepted, {'index', 'error': {...}} (BaseAppException.to_dict) otherwise.
+    """
+    if len(items) > settings.CAREPLAN_BULK_MAX_ITEMS:
+        raise ValidationError(
+            message=f"At most {settings.CAREPLAN_BULK_MAX_ITEMS} patients per request.",
+            code='bulk_too_large',
+        )
+
+    results = [None] * len(items)
+    rows = {}  # (first_name, last_name, date_of_birth) -> (index, item)
+    for index, item in enumerate(items):
+        error = _validate_bulk_item(item)
+        if error is None:
+            key = (item['patient_first_name'], item['patient_last_name'], parse_date(str(item['date_of_birth'])))
+            if key in rows:
+                error = BlockError(
+                    message="The same patient appears more than once in this request.",
+                    code='duplicate_in_request',
+                )
+            else:
+                rows[key] = (index, item)
+        if error is not None:
+            results[index] = {'index': index, 'error': error.to_dict()}
+
+    with transaction.atomic():
+        with tracing.span('bulk.patients'):
+            patients = _upsert_patients(rows)
+            # Their cached status bodies show the old medications (before the insert: not the new plans)
+            earlier_ids = list(CarePlan.objects.filter(
+                patient_id__in=[p.id for p in patients.values()],
+            ).values_list('id', flat=True))
+
+        # Duplicate check and insert in one statement, guarded like create_careplan
+        with tracing.span('bulk.insert'), connection.cursor() as cursor:
+            cursor.execute(BULK_INSERT_CAREPLANS_SQL, [[p.id for p in patients.values()]])
+            created = {patient_id: careplan_id for careplan_id, patient_id in cursor.fetchall()}
+    status_cache.invalidate(*earlier_ids)
+
+    accepted = []
+    for key, (index, _) in rows.items():
+        careplan_id = created.get(patients[key].id)
+        if careplan_id is None:
+            error = BlockError(
+                message="A medication guide is already being generated for this patient. Please wait for it to complete.",
+                code='duplicate_active_careplan',
+            )
+            results[index] = {'index': index, 'error': error.to_dict()}
+            careplan_duplicate_blocks_total.labels(reason=error.code).inc()
+        else:
+            results[index] = {'index': index, 'id': careplan_id, 'status': 'pending'}
+            accepted.append(careplan_id)
+
+    if accepted and settings.CAREPLAN_WORKER_MODE == 'celery':
+        enqueue_careplans(accepted)
+
+    careplan_requests_total.labels(status='accepted').inc(len(accepted))
+    rejected = len(items) - len(accepted)
+    if rejected:
+        careplan_requests_total.labels(status='blocked').inc(rejected)
+    return results
 
+
+def enqueue_careplans(careplan_ids):
+    """Send all generate tasks in one Celery group (one broker round trip per chunk)."""
+    from celery import group
     from .tasks import generate_careplan_task
-    generate_careplan_task.delay(care_plan.id)
+    with tracing.span('bulk.enqueue'):
+        kwargs = {'trace': tracing.inject(), 'enqueued_at': time.time()}
+        group(generate_careplan_task.s(careplan_id, **kwargs) for careplan_id in careplan_ids).apply_async()
 
-    careplan_requests_total.labels(status='accepted').inc()
 
-    return {
-        'id': care_plan.id,
-        'status': 'pending',
-        'message': 'Received, generating your medication guide.',
-    }
+def _validate_bulk_item(item):
+    if not isinstance(item, dict):
+        return ValidationError(message="Each item must be a JSON object.")
+    missing = [f for f in BULK_REQUIRED_FIELDS if not item.get(f)]
+    if missing:
+        return ValidationError(message=f"Missing fields: {', '.join(missing)}", code='missing_fields')
+    try:
+        valid_date = parse_date(str(item['date_of_birth'])) is not None
+    except ValueError:
+        valid_date = False
+    if not valid_date:
+        return ValidationError(message="date_of_birth must be YYYY-MM-DD.", code='invalid_date')
+    return None
+
+
+def _upsert_patients(rows):
+    """Find or create each patient by name + DOB and update their meds / allergies / conditions, in one upsert."""
+    patients = {}
+    for key, (_, item) in rows.items():
+        patients[key] = Patient(
+            first_name=key[0],
+            last_name=key[1],
+            date_of_birth=key[2],
+            medications=item['medications'],
+            medications_canonical=canonicalize_medications(item['medications']),  # bulk ops skip save()
+            allergies=item.get('allergies', ''),
+            health_conditions=item.get('health_conditions', ''),
+        )
+    Patient.objects.bulk_create(
+        list(patients.values()),
+        update_conflicts=True,
+        unique_fields=['first_name', 'last_name', 'date_of_birth'],
+        # updated_at: auto_now, so every upserted patient's plans get new validators
+        update_fields=['medications', 'medications_canonical', 'allergies', 'health_conditions', 'updated_at'],
+    )
+    return patients
 
 
 def get_careplan(pk):
@@ -86,12 +238,96 @@ def get_careplan(pk):
 
 
 def list_careplans(query=''):
-    plans = CarePlan.objects.all().select_related('patient').order_by('-created_at')
+    """Newest first; with a query, best match first (see careplan/search.py)."""
+    plans = CarePlan.objects.all().select_related('patient')
     if query:
-        plans = plans.filter(patient__first_name__icontains=query) | \
-                plans.filter(patient__last_name__icontains=query) | \
-                plans.filter(patient__medications__icontains=query)
-    return plans
+        return search.search_careplans(plans, query).order_by('-rank', '-created_at', '-id')
+    return plans.order_by('-created_at', '-id')
+
+
+def list_careplans_page(query='', cursor=None, limit=None, fields=DEFAULT_LIST_FIELDS, variant=''):
+    """
+    One page of list_careplans, as projected dicts.
+
+    Keyset pagination on (created_at, id), backed by careplan_created_id_idx —
+    or (rank, created_at, id) for a search: the next page starts right after
+    the last row of this one, so page N costs the same as page 1. Only the
+    columns `fields` need are selected; care_plan_text is left out unless
+    asked for.
+
+    Returns (rows, next_cursor, (etag, last_modified)); next_cursor is None on
+    the last page. The validators are the ones list_careplans_validators
+    gives, computed from the fetched rows instead of another query.
+    """
+    plans, limit = _page_queryset(query, cursor, limit)
+    columns = list_columns(fields) + (['rank'] if query else [])
+    rows = list(plans.annotate(last_modified=LAST_MODIFIED).values(*columns, 'last_modified')[:limit + 1])
+    last_modified = max((row['last_modified'] for row in rows), default=None)
+    validators = (
+        etags.list_etag(len(rows), last_modified, sum(row['id'] for row in rows) if rows else None, variant),
+        last_modified,
+    )
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1], ranked=bool(query))
+    return [serialize_careplan_row(row, fields) for row in rows], next_cursor, validators
+
+
+# CarePlan.last_modified in SQL: the bodies include the patient's medications etc.
+LAST_MODIFIED = Greatest('updated_at', 'patient__updated_at')
+
+
+def list_careplans_validators(query='', cursor=None, limit=None, variant=''):
+    """
+    (etag, last_modified) of the page list_careplans_page would return, from
+    count / max(last modified) / sum(id) over the same rows — no row is loaded.
+    `variant` is whatever else shapes the body (the query string). For
+    conditional requests only: otherwise the page brings its own validators.
+    """
+    plans, limit = _page_queryset(query, cursor, limit)
+    page = CarePlan.objects.filter(id__in=plans.values('id')[:limit + 1])
+    stats = page.aggregate(count=Count('id'), last=Max(LAST_MODIFIED), ids=Sum('id'))
+    return etags.list_etag(stats['count'], stats['last'], stats['ids'], variant), stats['last']
+
+
+def careplan_validators(pk):
+    """(etag, last_modified) of one plan, from its and its patient's updated_at."""
+    last_modified = CarePlan.objects.annotate(last_modified=LAST_MODIFIED).values_list(
+        'last_modified', flat=True,
+    ).get(id=pk)
+    return etags.careplan_etag(pk, last_modified), last_modified
+
+
+def _page_queryset(query, cursor, limit):
+    limit = min(limit or settings.CAREPLAN_LIST_PAGE_SIZE, settings.CAREPLAN_LIST_MAX_PAGE_SIZE)
+    plans = list_careplans(query)
+    if cursor:
+        *rank, created_at, last_id = decode_cursor(cursor, ranked=bool(query))
+        after = Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=last_id)
+        if rank:
+            after = Q(rank__lt=rank[0]) | (Q(rank=rank[0]) & after)
+        plans = plans.filter(after)
+    return plans, limit
+
+
+def encode_cursor(row, ranked=False):
+    values = [row['created_at'].isoformat(), str(row['id'])]
+    if ranked:
+        values.insert(0, repr(row['rank']))
+    return base64.urlsafe_b64encode('|'.join(values).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, ranked=False):
+    """[rank,] created_at, id — the inverse of encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        *rank, created_at, careplan_id = raw.split('|')
+        if len(rank) != int(ranked):
+            raise ValueError(raw)
+        return [float(r) for r in rank] + [datetime.fromisoformat(created_at), int(careplan_id)]
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError(message="Invalid cursor.", code='invalid_cursor')
 
 
 def format_careplan_download(plan):
@@ -111,104 +347,147 @@ def format_careplan_download(plan):
     )
 
 
-def call_llm(patient_name, medications, allergies, health_conditions):
+def get_openai_api_key():
+    """Return the configured OpenAI key, or '' when running without one (mock mode)."""
     api_key = os.environ.get('OPENAI_API_KEY', '')
-
     if not api_key or api_key == 'your-api-key-here':
-        return (
-            f"## Medication Overview\n"
-            f"Patient: {patient_name}\n"
-            f"Medications: {medications}\n\n"
-            f"## How to Take Your Medications\n"
-            f"1. Take {medications} as directed by your doctor\n"
-            f"2. Take with food unless told otherwise\n"
-            f"3. Take at the same time each day\n\n"
-            f"## Possible Drug Interactions\n"
-            f"- Based on your medications, no major interactions were found\n"
-            f"- Always tell your doctor about all medications you take\n\n"
-            f"## Allergy Warnings\n"
-            f"- Known allergies: {allergies or 'None reported'}\n"
-            f"- Watch for signs of allergic reaction: rash, swelling, trouble breathing\n\n"
-            f"## Health Condition Considerations\n"
-            f"- Current conditions: {health_conditions or 'None reported'}\n"
-            f"- Your medications have been reviewed against your health conditions\n\n"
-            f"## When to Call Your Doctor\n"
-            f"1. If you experience any unusual side effects\n"
-            f"2. If you miss multiple doses\n"
-            f"3. If your symptoms get worse\n"
+        return ''
+    return api_key
+
+
+def call_llm(patient_name, medications, allergies, health_conditions, known_dangers=None):
+    """known_dangers: pre-screened interactions.Conflict list; screened here if None."""
+    if known_dangers is None:
+        known_dangers = screen(medications, allergies, health_conditions)
+
+    api_key = get_openai_api_key()
+
+    if not api_key:
+        return _mock_careplan(patient_name, medications, allergies, health_conditions, known_dangers)
+
+    client = get_llm_client(api_key)
+
+    start = time.monotonic()
+    try:
+        raw = client.chat.completions.with_raw_response.create(
+            model=LLM_MODEL,
+            messages=_llm_messages(medications, allergies, health_conditions, known_dangers),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
         )
+        ratelimit.observe_headers(raw.headers)
+        response = raw.parse()
+        llm_call_duration_seconds.observe(time.monotonic() - start)
+        return response.choices[0].message.content
+    except Exception as e:
+        llm_call_duration_seconds.observe(time.monotonic() - start)
+        llm_call_errors_total.labels(error_type=type(e).__name__).inc()
+        if ratelimit.is_rate_limit_error(e):
+            ratelimit.on_rate_limited(e)
+        raise
 
-    import openai
-    client = openai.OpenAI(api_key=api_key)
 
-    prompt = (
-        f"Patient: {patient_name}\n"
-        f"Medications: {medications}\n"
-        f"Allergies: {allergies or 'None reported'}\n"
-        f"Health Conditions / Lifestyle: {health_conditions or 'None reported'}\n\n"
-        f"Generate the daily care plan using EXACTLY these sections and format:\n\n"
-        f"## ⚠️ DANGER — Must Read First\n"
-        f"Cross-check every medication against every other medication, every allergy, and every "
-        f"health condition or lifestyle habit. For EACH dangerous combination found:\n"
-        f"- Name the two things that conflict (e.g. '头孢 + 酒精')\n"
-        f"- State the exact medical danger (e.g. 'causes disulfiram-like reaction: vomiting, racing heart, "
-        f"difficulty breathing, potentially fatal')\n"
-        f"- State what the patient MUST do (e.g. 'Do NOT drink any alcohol for the entire course of "
-        f"头孢 and 7 days after the last dose')\n"
-        f"If no dangers exist, write 'No critical dangers found.'\n\n"
-        f"## 📋 Your Daily Medication Schedule\n"
-        f"Create a SPECIFIC hour-by-hour plan using this exact format. Assign each medication to a real "
-        f"clock time based on medical best practice (absorption, food interactions, sleep effects). "
-        f"Use this template:\n"
-        f"- **7:00 AM — Wake Up**: [what to do, e.g. drink a glass of water]\n"
-        f"- **8:00 AM — Breakfast**: [which medication to take, with food or not, how to take it]\n"
-        f"- **12:00 PM — Lunch**: [which medication if any]\n"
-        f"- **6:00 PM — Dinner**: [which medication if any]\n"
-        f"- **9:30 PM — Bedtime**: [which medication if any]\n"
-        f"Add or remove time slots as needed for this patient's specific medications. "
-        f"Every medication must appear in the schedule with an exact time.\n\n"
-        f"## 💊 About Each Medication\n"
-        f"For each medication, write 2-3 sentences: what it does, its most common side effect "
-        f"for THIS patient (considering their age, conditions, and other meds), and one specific "
-        f"thing to watch for.\n\n"
-        f"## 🚫 Things You Must NOT Do\n"
-        f"List specific forbidden actions based on THIS patient's exact medications and conditions. "
-        f"Format: '[Action] — because [specific medical reason]'. "
-        f"Examples of the level of specificity required:\n"
-        f"- 'Do NOT drink alcohol while taking 头孢 — it causes a disulfiram-like reaction (vomiting, "
-        f"rapid heartbeat, potentially fatal)'\n"
-        f"- 'Do NOT take ibuprofen — it increases bleeding risk with your current medications'\n"
-        f"Do NOT write generic advice like 'be careful' or 'talk to your doctor'.\n\n"
-        f"## 🚨 Call 911 (Emergency) Immediately If\n"
-        f"List 3-5 specific emergency symptoms tied to THIS patient's medications and conditions. "
-        f"Not generic symptoms — symptoms that would specifically indicate a dangerous reaction "
-        f"to these exact medications.\n"
-    )
+async def acall_llm(patient_name, medications, allergies, health_conditions, known_dangers=None):
+    """Async call_llm on the per-loop pooled client, so one process can keep many calls in flight."""
+    if known_dangers is None:
+        known_dangers = screen(medications, allergies, health_conditions)
+
+    api_key = get_openai_api_key()
+
+    if not api_key:
+        return _mock_careplan(patient_name, medications, allergies, health_conditions, known_dangers)
+
+    client = get_async_llm_client(api_key)
 
     start = time.monotonic()
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": (
-                    "You are ElderMedAssist, a strict personal medication butler for elderly patients. "
-                    "You speak directly to the patient as 'you'. "
-                    "You are NOT an advisor — you are a butler who gives ORDERS. "
-                    "Your output is a concrete daily plan the patient follows exactly, not suggestions. "
-                    "NEVER say 'consult your doctor', 'talk to your healthcare provider', or 'as prescribed'. "
-                    "NEVER give vague advice. Every sentence must be a specific instruction or a specific fact. "
-                    "If a medication + lifestyle combination is dangerous, say so BLUNTLY in the first section — "
-                    "do not bury it or soften it. "
-                    "Write in simple language a 70-year-old can understand. Keep sentences short."
-                )},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.3,
-            max_tokens=3000,
+        raw = await client.chat.completions.with_raw_response.create(
+            model=LLM_MODEL,
+            messages=_llm_messages(medications, allergies, health_conditions, known_dangers),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
         )
+        await ratelimit.aobserve_headers(raw.headers)
+        response = raw.parse()
         llm_call_duration_seconds.observe(time.monotonic() - start)
         return response.choices[0].message.content
     except Exception as e:
         llm_call_duration_seconds.observe(time.monotonic() - start)
         llm_call_errors_total.labels(error_type=type(e).__name__).inc()
+        if ratelimit.is_rate_limit_error(e):
+            await ratelimit.aon_rate_limited(e)
         raise
+
+
+def stream_llm(patient_name, medications, allergies, health_conditions, known_dangers=None):
+    """Same as call_llm, but yields the text in chunks as the model produces it."""
+    if known_dangers is None:
+        known_dangers = screen(medications, allergies, health_conditions)
+
+    api_key = get_openai_api_key()
+
+    if not api_key:
+        yield _mock_careplan(patient_name, medications, allergies, health_conditions, known_dangers)
+        return
+
+    client = get_llm_client(api_key)
+
+    start = time.monotonic()
+    first_token = True
+    try:
+        raw = client.chat.completions.with_raw_response.create(
+            model=LLM_MODEL,
+            messages=_llm_messages(medications, allergies, health_conditions, known_dangers),
+            temperature=LLM_TEMPERATURE,
+            max_tokens=LLM_MAX_TOKENS,
+            stream=True,
+        )
+        ratelimit.observe_headers(raw.headers)
+        stream = raw.parse()
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                if first_token:
+                    llm_time_to_first_token_seconds.observe(time.monotonic() - start)
+                    first_token = False
+                yield delta
+        llm_call_duration_seconds.observe(time.monotonic() - start)
+    except Exception as e:
+        llm_call_duration_seconds.observe(time.monotonic() - start)
+        llm_call_errors_total.labels(error_type=type(e).__name__).inc()
+        if ratelimit.is_rate_limit_error(e):
+            ratelimit.on_rate_limited(e)
+        raise
+
+
+def _llm_messages(medications, allergies, health_conditions, known_dangers):
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_prompt(medications, allergies, health_conditions, known_dangers)},
+    ]
+
+
+def _mock_careplan(patient_name, medications, allergies, health_conditions, known_dangers):
+    # No LLM: the DANGER section still comes from the local interaction index
+    return (
+        format_danger_section(known_dangers) + "\n"
+        f"## Medication Overview\n"
+        f"Patient: {patient_name}\n"
+        f"Medications: {medications}\n\n"
+        f"## How to Take Your Medications\n"
+        f"1. Take {medications} as directed by your doctor\n"
+        f"2. Take with food unless told otherwise\n"
+        f"3. Take at the same time each day\n\n"
+        f"## Allergy Warnings\n"
+        f"- Known allergies: {allergies or 'None reported'}\n"
+        f"- Watch for signs of allergic reaction: rash, swelling, trouble breathing\n\n"
+        f"## Health Condition Considerations\n"
+        f"- Current conditions: {health_conditions or 'None reported'}\n"
+        f"- Your medications have been reviewed against your health conditions\n\n"
+        f"## When to Call Your Doctor\n"
+        f"1. If you experience any unusual side effects\n"
+        f"2. If you miss multiple doses\n"
+        f"3. If your symptoms get worse\n"
+    )
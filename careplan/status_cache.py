@@ -0,0 +1,76 @@
+"""
+Read-through cache of the status endpoint's payload.
+
+Clients poll GET /api/careplans/<id>/status/ every few seconds, so the
+serialized JSON is kept in the Django cache (Redis under docker-compose)
+together with its ETag; a hit needs no DB query and a matching
+If-None-Match needs no body either.
+
+- Key:          careplan:status:<id> -> {'etag', 'last_modified', 'body'}
+- TTL:          CAREPLAN_STATUS_CACHE_TTL while the plan is still moving,
+                CAREPLAN_STATUS_CACHE_TERMINAL_TTL once completed / failed
+- Invalidation: generation.save_status stores the new payload on every
+                status change; bulk updates and streamed text delete it, and
+                so do the patient upserts in services.py for the patient's
+                earlier plans (their bodies include the medications)
+"""
+
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .etags import careplan_etag
+from .metrics import careplan_status_cache_requests_total
+from .models import CarePlan
+from .serializers import serialize_careplan
+
+KEY_PREFIX = 'careplan:status'
+TERMINAL_STATUSES = ('completed', 'failed')
+
+
+def make_key(careplan_id):
+    return f'{KEY_PREFIX}:{careplan_id}'
+
+
+def get_status(careplan_id):
+    """{'etag', 'last_modified', 'body'} for the plan; raises CarePlan.DoesNotExist."""
+    return get_cached(careplan_id) or load(careplan_id)
+
+
+def get_cached(careplan_id):
+    entry = cache.get(make_key(careplan_id))
+    careplan_status_cache_requests_total.labels(result='hit' if entry is not None else 'miss').inc()
+    return entry
+
+
+def load(careplan_id):
+    plan = CarePlan.objects.select_related('patient').get(id=careplan_id)
+    entry = make_entry(plan)
+    # add, not set: a status change stored while we were reading wins
+    cache.add(make_key(plan.id), entry, timeout=ttl(plan.status))
+    return entry
+
+
+def store(plan):
+    """Write-through after a status change; `plan` must have its patient loaded."""
+    cache.set(make_key(plan.id), make_entry(plan), timeout=ttl(plan.status))
+
+
+def invalidate(*careplan_ids):
+    if careplan_ids:  # the Redis backend sends DEL even for no keys, which Redis rejects
+        cache.delete_many([make_key(i) for i in careplan_ids])
+
+
+def make_entry(plan):
+    return {
+        'etag': careplan_etag(plan.id, plan.last_modified),
+        'last_modified': plan.last_modified,
+        'body': json.dumps(serialize_careplan(plan)),
+    }
+
+
+def ttl(status):
+    if status in TERMINAL_STATUSES:
+        return settings.CAREPLAN_STATUS_CACHE_TERMINAL_TTL
+    return settings.CAREPLAN_STATUS_CACHE_TTL
@@ -0,0 +1,46 @@
+"""
+Care plans per status, for the careplan_active_count gauge.
+
+CarePlanStatusCount is kept current by triggers (migration 0009), so a
+refresh reads a few dozen small rows instead of counting the careplan table.
+reconcile() recounts with one GROUP BY status over careplan_status_idx and
+rewrites the summary — a safety net for writes that skip triggers
+(TRUNCATE, restores with session_replication_role = replica).
+"""
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+
+from .models import CarePlan, CarePlanStatusCount
+
+
+def current():
+    """{status: count} from the summary table."""
+    return dict(
+        CarePlanStatusCount.objects.values('status').annotate(total=Sum('count')).values_list('status', 'total')
+    )
+
+
+def reconcile():
+    """Recount from careplan_careplan. Returns {status: (summary, actual)} for every drifted status."""
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            # Triggers of new writes wait on this lock, and writers that
+            # already touched the summary have committed once we hold it, so
+            # the recount and the summary see the same set of rows.
+            cursor.execute(f'LOCK TABLE {CarePlanStatusCount._meta.db_table} IN EXCLUSIVE MODE')
+        summary = current()
+        actual = dict(
+            CarePlan.objects.order_by().values('status').annotate(n=Count('id')).values_list('status', 'n')
+        )
+        drift = {
+            status: (summary.get(status, 0), actual.get(status, 0))
+            for status in summary.keys() | actual.keys()
+            if summary.get(status, 0) != actual.get(status, 0)
+        }
+        if drift:
+            CarePlanStatusCount.objects.all().delete()
+            CarePlanStatusCount.objects.bulk_create(
+                CarePlanStatusCount(status=status, slot=0, count=n) for status, n in actual.items()
+            )
+    return drift
@@ -0,0 +1,61 @@
+"""
+Incremental persistence of streamed LLM output.
+
+While a plan streams in, its text is written to CarePlan.care_plan_text with
+status 'partial' so pollers can show progress. Writes are throttled: one
+UPDATE every CAREPLAN_STREAM_FLUSH_TOKENS chunks or CAREPLAN_STREAM_FLUSH_MS
+milliseconds, whichever comes first. Each flush also publishes the new text
+as a 'delta' event for SSE listeners.
+"""
+
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import events, status_cache
+from .models import CarePlan
+
+
+class ThrottledTextWriter:
+
+    def __init__(self, careplan_id, flush_tokens=None, flush_ms=None, clock=time.monotonic):
+        self.careplan_id = careplan_id
+        self.flush_tokens = flush_tokens or settings.CAREPLAN_STREAM_FLUSH_TOKENS
+        self.flush_seconds = (flush_ms or settings.CAREPLAN_STREAM_FLUSH_MS) / 1000
+        self.clock = clock
+        self.parts = []
+        self.unflushed = 0
+        self.flushed_len = 0
+        self.last_flush = clock()
+
+    @property
+    def text(self):
+        return ''.join(self.parts)
+
+    def write(self, chunk):
+        self.parts.append(chunk)
+        self.unflushed += 1
+        if (self.unflushed >= self.flush_tokens
+                or self.clock() - self.last_flush >= self.flush_seconds):
+            self.flush()
+
+    def flush(self):
+        if not self.unflushed:
+            return
+        text = self.text
+        # .update() skips auto_now, so updated_at is set explicitly
+        CarePlan.objects.filter(id=self.careplan_id).update(
+            status='partial',
+            care_plan_text=text,
+            updated_at=timezone.now(),
+        )
+        status_cache.invalidate(self.careplan_id)
+        events.publish(self.careplan_id, 'delta', {
+            'status': 'partial',
+            'offset': self.flushed_len,
+            'text': text[self.flushed_len:],
+        })
+        self.flushed_len = len(text)
+        self.unflushed = 0
+        self.last_flush = self.clock()
@@ -1,13 +1,15 @@
 import time
 
 from celery import shared_task
+from celery.exceptions import Retry
+from django.conf import settings
 
+from . import coalesce, generation, ratelimit, status_counts, tracing
 from .models import CarePlan
-from .services import call_llm
+from .services import call_llm, stream_llm
+from .streaming import ThrottledTextWriter
 from .metrics import (
-    careplan_status_total,
     careplan_active_count,
-    careplan_generation_duration_seconds,
     celery_task_duration_seconds,
     celery_task_retries_total,
     celery_task_failures_total,
@@ -15,31 +17,105 @@ from .metrics import (
 
 
 @shared_task(bind=True, max_retries=3)
-def generate_careplan_task(self, careplan_id):
-    plan = CarePlan.objects.select_related('patient').get(id=careplan_id)
+def generate_careplan_task(self, careplan_id, trace=None, enqueued_at=None):
+    """
+    trace: tracing.inject() of the span that enqueued the task, to continue its trace.
+    enqueued_at: epoch seconds the task became due, for careplan_queue_wait_seconds.
+    """
+    if enqueued_at is not None:
+        generation.observe_queue_wait(enqueued_at)
+    start = time.monotonic()
+    with tracing.span('task.run', parent=trace, careplan_id=careplan_id):
+        try:
+            plan = _generate_careplan(self, careplan_id)
+        except Retry:
+            raise
+        except Exception as e:
+            # Loading, the LLM cache, coalescing or the rate limiter broke (Redis
+            # or DB down): retry like a failed LLM call rather than leaving the
+            # plan active, which would block every new submit for the patient
+            plan = _retry_or_fail(self, careplan_id, e)
+    if plan is not None:
+        generation.observe_finished(plan, time.monotonic() - start)
+
+
+def _requeue_kwargs(countdown):
+    """Task kwargs for sending the plan back to the queue, due in `countdown` seconds."""
+    return {'trace': tracing.inject(), 'enqueued_at': time.time() + countdown}
+
+
+def _retry_or_fail(self, careplan_id, error):
+    print(f"[Celery] CarePlan #{careplan_id} failed (attempt {self.request.retries + 1}/3): {error!r}")
+    try:
+        celery_task_retries_total.labels(task_name='generate_careplan_task').inc()
+        countdown = 2 ** self.request.retries
+        self.retry(countdown=countdown, kwargs=_requeue_kwargs(countdown))
+    except self.MaxRetriesExceededError:
+        celery_task_failures_total.labels(task_name='generate_careplan_task').inc()
+        print(f"[Celery] CarePlan #{careplan_id} permanently failed after 3 retries")
+        return generation.fail_careplan(careplan_id, error)
+
+
+def _generate_careplan(self, careplan_id):
+    with tracing.span('task.load'):
+        plan = generation.load_careplan(careplan_id)
     patient = plan.patient
 
     print(f"[Celery] Processing CarePlan #{plan.id} - {patient.first_name} {patient.last_name}")
 
-    plan.status = 'processing'
-    plan.save()
+    with tracing.span('task.cache'):
+        from_cache = generation.complete_from_cache(plan)
+    if from_cache:
+        print(f"[Celery] CarePlan #{plan.id} completed from cache")
+        return plan
 
-    start = time.monotonic()
+    with tracing.span('task.coalesce'):
+        flight, completed = generation.join_inflight(plan)
+    if completed:
+        print(f"[Celery] CarePlan #{plan.id} completed by an identical in-flight generation")
+        return plan
     try:
-        result = call_llm(
-            patient_name=f"{patient.first_name} {patient.last_name}",
-            medications=patient.medications,
-            allergies=patient.allergies,
-            health_conditions=patient.health_conditions,
+        return _generate(self, plan, flight)
+    except Exception:
+        # Retrying or broken: let followers generate on their own instead of waiting out the lease
+        coalesce.abandon(flight)
+        raise
+
+
+def _generate(self, plan, flight):
+    careplan_id = plan.id
+
+    # Wait in front of the shared limiter; if it stays saturated, go back to
+    # the queue without spending a retry
+    llm_kwargs = generation.llm_kwargs(plan)
+    try:
+        with tracing.span('task.rate_limit'):
+            ratelimit.acquire(ratelimit.estimate_request_tokens(**llm_kwargs))
+    except ratelimit.RateLimitBackoff as e:
+        print(f"[Celery] CarePlan #{plan.id} rate limited, re-queued in {e.wait:.1f}s")
+        if plan.status != 'pending':
+            generation.mark_requeued(plan)
+        self.apply_async(
+            args=[careplan_id], kwargs=_requeue_kwargs(e.wait), countdown=e.wait, retries=self.request.retries,
         )
-        duration = time.monotonic() - start
+        return plan
 
-        plan.status = 'completed'
-        plan.care_plan_text = result
-        plan.save()
+    generation.mark_processing(plan)
 
-        careplan_status_total.labels(status='completed').inc()
-        careplan_generation_duration_seconds.observe(duration)
+    start = time.monotonic()
+    try:
+        with tracing.span('llm.call'):
+            if settings.CAREPLAN_LLM_STREAMING:
+                writer = ThrottledTextWriter(plan.id)
+                for chunk in stream_llm(**llm_kwargs):
+                    writer.write(chunk)
+                result = writer.text
+            else:
+                result = call_llm(**llm_kwargs)
+        duration = time.monotonic() - start
+
+        with tracing.span('task.save'):
+            generation.mark_completed(plan, result, duration, flight)
         celery_task_duration_seconds.labels(task_name='generate_careplan_task').observe(duration)
         print(f"[Celery] CarePlan #{plan.id} completed")
 
@@ -47,22 +123,43 @@ def generate_careplan_task(self, careplan_id):
         duration = time.monotonic() - start
         celery_task_duration_seconds.labels(task_name='generate_careplan_task').observe(duration)
 
+        if ratelimit.is_rate_limit_error(e):
+            # A 429 is backpressure, not a failure: call_llm / stream_llm have
+            # paused the limiter, so queue up again behind it with the retry
+            # budget untouched
+            wait = ratelimit.retry_after(e)
+            print(f"[Celery] CarePlan #{plan.id} got 429, re-queued in {wait:.1f}s")
+            generation.mark_requeued(plan)
+            self.apply_async(
+                args=[careplan_id], kwargs=_requeue_kwargs(wait), countdown=wait, retries=self.request.retries,
+            )
+            return plan
+
         print(f"[Celery] CarePlan #{plan.id} failed (attempt {self.request.retries + 1}/3): {e}")
         try:
             celery_task_retries_total.labels(task_name='generate_careplan_task').inc()
-            self.retry(countdown=2 ** self.request.retries)
+            countdown = 2 ** self.request.retries
+            self.retry(countdown=countdown, kwargs=_requeue_kwargs(countdown))
         except self.MaxRetriesExceededError:
-            plan.status = 'failed'
-            plan.care_plan_text = str(e)
-            plan.save()
-            careplan_status_total.labels(status='failed').inc()
+            generation.mark_failed(plan, e, flight)
             celery_task_failures_total.labels(task_name='generate_careplan_task').inc()
             print(f"[Celery] CarePlan #{plan.id} permanently failed after 3 retries")
+    return plan
 
 
 @shared_task
 def update_careplan_gauge():
-    """Sync the Prometheus gauge with actual DB counts every 30s."""
-    for status in ['pending', 'processing', 'completed', 'failed']:
-        count = CarePlan.objects.filter(status=status).count()
-        careplan_active_count.labels(status=status).set(count)
+    """Sync the Prometheus gauge every 30s from the trigger-maintained counts (no table scan)."""
+    counts = status_counts.current()
+    for status, _ in CarePlan.STATUS_CHOICES:
+        careplan_active_count.labels(status=status).set(counts.get(status, 0))
+
+
+@shared_task
+def reconcile_careplan_status_counts():
+    """Recount care plans per status and repair the summary table if it drifted."""
+    drift = status_counts.reconcile()
+    for status, (counted, actual) in drift.items():
+        print(f"[Celery] Status count for '{status}' drifted: {counted} -> {actual}")
+    if drift:
+        update_careplan_gauge()
@@ -0,0 +1,126 @@
+"""
+Lightweight request tracing: where the time of one care plan goes, from the
+HTTP request through the broker to the LLM call.
+
+    with tracing.span('create.insert'):
+        ...
+
+- spans nest through a ContextVar, so threads and asyncio tasks each keep
+  their own current span
+- inject() returns {'trace_id', 'span_id'} of the current span; it travels in
+  the Celery task kwargs / SQS message body and the consumer passes it back
+  as span(..., parent=...) to continue the same trace
+- every finished span goes to the registered sinks: the Django app records
+  careplan_stage_duration_seconds per span name, log_to() appends one JSON
+  line per span (the exportable trace log)
+
+Span names become Prometheus labels: keep them to a fixed set of literals.
+Plain Python (no Django imports) so the Lambdas can share it.
+"""
+
+import json
+import random
+import sys
+import time
+from contextvars import ContextVar
+
+_current = ContextVar('careplan_tracing_span', default=None)
+_sinks = []
+
+
+class Span:
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'attrs', 'start', 'duration', 'error',
+                 '_started', '_token')
+
+    def __init__(self, name, parent=None, attrs=None):
+        if parent is None:
+            parent = _current.get()
+            if parent is not None:
+                parent = (parent.trace_id, parent.span_id)
+        elif isinstance(parent, dict):
+            parent = (parent.get('trace_id'), parent.get('span_id'))
+
+        self.name = name
+        if parent and parent[0]:
+            self.trace_id, self.parent_id = parent
+        else:
+            self.trace_id, self.parent_id = '%032x' % random.getrandbits(128), None
+        self.span_id = '%016x' % random.getrandbits(64)
+        self.attrs = attrs
+        self.start = None
+        self.duration = None
+        self.error = None
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        self.start = time.time()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = time.perf_counter() - self._started
+        _current.reset(self._token)
+        if exc_type is not None:
+            self.error = exc_type.__name__
+        for sink in _sinks:
+            sink(self)
+        return False
+
+    def context(self):
+        return {'trace_id': self.trace_id, 'span_id': self.span_id}
+
+    def to_dict(self):
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': self.start,
+            'duration_ms': round(self.duration * 1000, 3),
+            'error': self.error,
+            'attrs': self.attrs,
+        }
+
+
+def span(name, parent=None, **attrs):
+    """
+    A span to use as a context manager. `parent` is a carrier from inject();
+    without one the span is a child of the current span, or starts a trace.
+    """
+    return Span(name, parent, attrs or None)
+
+
+def current():
+    return _current.get()
+
+
+def inject():
+    """Carrier for the current span, to send along with a message; None outside a trace."""
+    active = _current.get()
+    return active.context() if active is not None else None
+
+
+def add_sink(sink):
+    """Call sink(span) for every finished span."""
+    _sinks.append(sink)
+
+
+def remove_sink(sink):
+    _sinks.remove(sink)
+
+
+class TraceLog:
+    """Sink writing one JSON line per span to `path` ('-' = stdout)."""
+
+    def __init__(self, path):
+        # Line buffered append: each span is a single write, so processes can share the file
+        self.file = sys.stdout if path == '-' else open(path, 'a', buffering=1, encoding='utf-8')
+
+    def __call__(self, span):
+        self.file.write(json.dumps(span.to_dict(), separators=(',', ':')) + '\n')
+
+
+def log_to(path):
+    """Add a TraceLog sink for `path`; '' leaves the trace log off."""
+    if path:
+        add_sink(TraceLog(path))
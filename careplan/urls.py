@@ -4,7 +4,11 @@ from . import views
 urlpatterns = [
     path('', views.index, name='index'),
     path('api/generate/', views.generate_careplan, name='generate_careplan'),
+    path('api/generate/bulk/', views.generate_careplans_bulk, name='generate_careplans_bulk'),
     path('api/careplans/', views.list_careplans, name='list_careplans'),
+    path('api/careplans/export/', views.export_careplans, name='export_careplans'),
+    path('api/careplans/download/', views.download_careplans, name='download_careplans'),
     path('api/careplans/<int:pk>/status/', views.careplan_status, name='careplan_status'),
+    path('api/careplans/<int:pk>/events/', views.careplan_events, name='careplan_events'),
     path('api/careplans/<int:pk>/download/', views.download_careplan, name='download_careplan'),
 ]
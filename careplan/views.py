@@ -1,12 +1,15 @@
 import json
 
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-from .serializers import serialize_careplan
-from . import services
+from .conditional import conditional, is_conditional, not_modified, with_validators
+from .events import stream_careplan_events
+from .exceptions import ValidationError
+from .serializers import DEFAULT_LIST_FIELDS, LIST_FIELDS
+from . import export, services, status_cache
 
 
 def index(request):
@@ -21,20 +24,168 @@ def generate_careplan(request):
     return JsonResponse(result, status=202)
 
 
+@csrf_exempt
+@require_http_methods(["POST"])
+def generate_careplans_bulk(request):
+    """Many patients at once: a JSON array, or NDJSON (one object per line)."""
+    content_type = request.content_type or ''
+    try:
+        if content_type in ('application/x-ndjson', 'application/jsonl'):
+            items = [json.loads(line) for line in request.body.splitlines() if line.strip()]
+        else:
+            items = json.loads(request.body)
+    except json.JSONDecodeError as e:
+        raise ValidationError(message=f"Invalid JSON: {e}", code='invalid_json')
+    if not isinstance(items, list):
+        raise ValidationError(message="Expected a JSON array of patients.", code='invalid_json')
+
+    results = services.create_careplans_bulk(items)
+    accepted = sum(1 for r in results if 'id' in r)
+    return JsonResponse({
+        'accepted': accepted,
+        'rejected': len(results) - accepted,
+        'results': results,
+    }, status=202)
+
+
+def _list_params(request):
+    try:
+        limit = int(request.GET['limit']) if request.GET.get('limit') else None
+    except ValueError:
+        raise ValidationError(message="limit must be an integer.", code='invalid_limit')
+    if limit is not None and limit < 1:
+        raise ValidationError(message="limit must be positive.", code='invalid_limit')
+    return {
+        'query': request.GET.get('q', '').strip(),
+        'cursor': request.GET.get('cursor'),
+        'limit': limit,
+    }
+
+
 @require_http_methods(["GET"])
 def list_careplans(request):
-    q = request.GET.get('q', '').strip()
-    plans = services.list_careplans(query=q)
-    return JsonResponse([serialize_careplan(p) for p in plans], safe=False)
+    """
+    Newest first, one page at a time. Query params:
+    - q:      search
+    - limit:  page size (capped by CAREPLAN_LIST_MAX_PAGE_SIZE)
+    - cursor: X-Next-Cursor of the previous page
+    - fields: comma-separated subset of LIST_FIELDS (default: all but care_plan_text)
+
+    A conditional request is checked against the validators first, so a 304
+    loads no row; any other request gets them from the page it loads.
+    """
+    params = _list_params(request)
+    fields = _parse_fields(request.GET.get('fields', ''))
+    variant = request.GET.urlencode()
+    if is_conditional(request):
+        etag, last_modified = services.list_careplans_validators(**params, variant=variant)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return with_validators(response, etag, last_modified)
+
+    rows, next_cursor, (etag, last_modified) = services.list_careplans_page(
+        **params, fields=fields, variant=variant,
+    )
+    response = JsonResponse(rows, safe=False)
+    if next_cursor:
+        params = request.GET.copy()
+        params['cursor'] = next_cursor
+        response['X-Next-Cursor'] = next_cursor
+        response['Link'] = f'<{request.path}?{params.urlencode()}>; rel="next"'
+    return with_validators(response, etag, last_modified)
+
+
+def _parse_fields(value):
+    if not value:
+        return DEFAULT_LIST_FIELDS
+    fields = tuple(f.strip() for f in value.split(',') if f.strip())
+    unknown = [f for f in fields if f not in LIST_FIELDS]
+    if unknown:
+        raise ValidationError(
+            message=f"Unknown fields: {', '.join(unknown)}", code='invalid_fields',
+            detail={'allowed': list(LIST_FIELDS)},
+        )
+    return fields
+
+
+@require_http_methods(["GET"])
+def export_careplans(request):
+    """
+    Every matching plan, streamed. Query params:
+    - format: ndjson (default) or csv
+    - status: comma-separated statuses
+    - from / to: ISO date or datetime bounds on created_at
+    """
+    fmt = request.GET.get('format', 'ndjson')
+    if fmt not in export.FORMATS:
+        raise ValidationError(
+            message=f"format must be one of: {', '.join(export.FORMATS)}", code='invalid_format',
+        )
+    plans = export.export_careplans(**export.parse_filters(request.GET))
+    stream = export.stream_csv(plans) if fmt == 'csv' else export.stream_ndjson(plans)
+
+    response = StreamingHttpResponse(stream, content_type=f'{export.FORMATS[fmt]}; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="careplans.{fmt}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@require_http_methods(["GET"])
+def download_careplans(request):
+    """
+    ZIP of the plans named by ids=1,2,3 and/or matching the export filters
+    (status, from, to), streamed entry by entry.
+    """
+    filters = export.parse_filters(request.GET)
+    ids = export.parse_ids(request.GET.get('ids', ''))
+    if not ids and not any(filters.values()):
+        raise ValidationError(message="Pass ids or at least one filter.", code='missing_selection')
+
+    plans = export.export_careplans(**filters)
+    if ids:
+        plans = plans.filter(id__in=ids)
+
+    response = StreamingHttpResponse(export.stream_zip(plans), content_type='application/zip')
+    response['Content-Disposition'] = 'attachment; filename="careplans.zip"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @require_http_methods(["GET"])
 def careplan_status(request, pk):
-    plan = services.get_careplan(pk)
-    return JsonResponse(serialize_careplan(plan))
+    """
+    Served from status_cache. A conditional request that misses the cache is
+    answered from updated_at alone, so an unchanged plan is never loaded.
+    """
+    entry = status_cache.get_cached(pk)
+    if entry is None and is_conditional(request):
+        etag, last_modified = services.careplan_validators(pk)
+        response = not_modified(request, etag, last_modified)
+        if response is not None:
+            return with_validators(response, etag, last_modified)
+    if entry is None:
+        entry = status_cache.load(pk)
+
+    response = not_modified(request, entry['etag'], entry['last_modified'])
+    if response is None:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    response['Cache-Control'] = 'no-cache'
+    return with_validators(response, entry['etag'], entry['last_modified'])
+
+
+@require_http_methods(["GET"])
+def careplan_events(request, pk):
+    """Server-Sent Events stream of status changes and text chunks (replaces polling)."""
+    services.get_careplan(pk)  # raise before the stream starts if the plan doesn't exist
+    response = StreamingHttpResponse(stream_careplan_events(pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    response['Access-Control-Allow-Origin'] = '*'  # the S3 frontend lives on another origin
+    return response
 
 
 @require_http_methods(["GET"])
+@conditional(lambda request, pk: services.careplan_validators(pk))
 def download_careplan(request, pk):
     plan = services.get_careplan(pk)
     content = services.format_careplan_download(plan)
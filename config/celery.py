@@ -1,8 +1,39 @@
 import os
+import sys
 from celery import Celery
+from celery.signals import worker_process_shutdown, worker_ready
+
+from careplan.multiprocess import clear_metrics_dir, mark_dead, start_metrics_server
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
 
+
+def _is_worker_parent():
+    # `celery -A config worker` / `python -m celery ... worker`; pool children
+    # are forked, so they never import this module again
+    return 'celery' in sys.argv[0] and 'worker' in sys.argv[1:]
+
+
+# Prometheus: pool children write to PROMETHEUS_MULTIPROC_DIR, the main
+# worker process serves the merged view (see careplan/multiprocess.py).
+# The directory has to exist (and be emptied of the last run) before the
+# worker imports the tasks, which import careplan.metrics and open their
+# files there; worker_init and celeryd_init both fire after that import.
+if _is_worker_parent():
+    clear_metrics_dir()
+
 app = Celery('config')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
+
+
+@worker_ready.connect
+def _serve_metrics(**kwargs):
+    from django.conf import settings
+    from careplan.queue_depth import QueueDepthCollector
+    start_metrics_server(settings.CAREPLAN_WORKER_METRICS_PORT, [QueueDepthCollector()])
+
+
+@worker_process_shutdown.connect
+def _forget_process(pid=None, **kwargs):
+    mark_dead(pid or os.getpid())
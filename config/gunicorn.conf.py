@@ -0,0 +1,25 @@
+"""
+gunicorn -c config/gunicorn.conf.py config.wsgi
+
+Several worker processes share Prometheus metrics through
+PROMETHEUS_MULTIPROC_DIR (see careplan/multiprocess.py).
+"""
+
+import os
+
+from careplan.multiprocess import clear_metrics_dir, mark_dead
+
+bind = '0.0.0.0:8000'
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+# Threads, because SSE streams (/api/careplans/<id>/events/) hold a connection open for minutes
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 16))
+reload = os.environ.get('GUNICORN_RELOAD') == '1'
+
+
+def on_starting(server):
+    clear_metrics_dir()
+
+
+def child_exit(server, worker):
+    mark_dead(worker.pid)
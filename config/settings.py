@@ -15,14 +15,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    'django_prometheus.middleware.PrometheusBeforeMiddleware',
+    # Outermost, so it times everything below; replaces django_prometheus's
+    # Before/After pair (the app stays installed for /metrics)
+    'careplan.metrics_middleware.PrometheusMetricsMiddleware',
     'django.middleware.common.CommonMiddleware',
     'careplan.middleware.ExceptionHandlerMiddleware',
-    'careplan.metrics_middleware.PrometheusMetricsMiddleware',
-    'django_prometheus.middleware.PrometheusAfterMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
+WSGI_APPLICATION = 'config.wsgi.application'
 
 TEMPLATES = [
     {
@@ -50,6 +51,81 @@ DATABASES = {
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache and pub/sub — Redis when running under docker-compose, in-process otherwise.
+# Without CAREPLAN_REDIS_URL, features that need Redis (SSE push) fall back to DB polling.
+if os.environ.get('REDIS_HOST'):
+    CAREPLAN_REDIS_URL = f"redis://{os.environ['REDIS_HOST']}:6379/2"
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': f"redis://{os.environ['REDIS_HOST']}:6379/1",
+        }
+    }
+else:
+    CAREPLAN_REDIS_URL = ''
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {'MAX_ENTRIES': 1000},
+        }
+    }
+
+# LLM care plan cache (see careplan/llm_cache.py)
+CAREPLAN_LLM_CACHE_TTL = int(os.environ.get('CAREPLAN_LLM_CACHE_TTL', 7 * 24 * 3600))
+
+# OpenAI client pool (see careplan/llm_client.py)
+CAREPLAN_LLM_TIMEOUT = float(os.environ.get('CAREPLAN_LLM_TIMEOUT', 90))
+CAREPLAN_LLM_MAX_CONNECTIONS = int(os.environ.get('CAREPLAN_LLM_MAX_CONNECTIONS', 100))
+CAREPLAN_LLM_MAX_KEEPALIVE = int(os.environ.get('CAREPLAN_LLM_MAX_KEEPALIVE', 20))
+CAREPLAN_LLM_KEEPALIVE_SECONDS = float(os.environ.get('CAREPLAN_LLM_KEEPALIVE_SECONDS', 60))
+
+# Streaming generation (see careplan/streaming.py)
+CAREPLAN_LLM_STREAMING = os.environ.get('CAREPLAN_LLM_STREAMING', '1') == '1'
+CAREPLAN_STREAM_FLUSH_TOKENS = int(os.environ.get('CAREPLAN_STREAM_FLUSH_TOKENS', 32))
+CAREPLAN_STREAM_FLUSH_MS = int(os.environ.get('CAREPLAN_STREAM_FLUSH_MS', 500))
+
+# Server-Sent Events (see careplan/events.py)
+CAREPLAN_SSE_MAX_SECONDS = int(os.environ.get('CAREPLAN_SSE_MAX_SECONDS', 300))
+CAREPLAN_SSE_KEEPALIVE_SECONDS = 15
+CAREPLAN_SSE_POLL_SECONDS = 2
+
+# How generate jobs run: 'celery' (generate_careplan_task) or 'async'
+# (manage.py run_async_worker claims pending plans, see careplan/async_worker.py)
+CAREPLAN_WORKER_MODE = os.environ.get('CAREPLAN_WORKER_MODE', 'celery')
+CAREPLAN_ASYNC_CONCURRENCY = int(os.environ.get('CAREPLAN_ASYNC_CONCURRENCY', 50))
+CAREPLAN_ASYNC_TASK_TIMEOUT = float(os.environ.get('CAREPLAN_ASYNC_TASK_TIMEOUT', 90))
+
+# Shared OpenAI rate limit across all workers (needs Redis). Defaults match the
+# gpt-4o-mini tier-1 limits; x-ratelimit-limit-* response headers override them.
+CAREPLAN_LLM_RPM = int(os.environ.get('CAREPLAN_LLM_RPM', 500))
+CAREPLAN_LLM_TPM = int(os.environ.get('CAREPLAN_LLM_TPM', 200000))
+# Longest a Celery task blocks on the limiter before re-queueing itself
+CAREPLAN_RATELIMIT_MAX_WAIT = float(os.environ.get('CAREPLAN_RATELIMIT_MAX_WAIT', 30))
+
+# Status endpoint cache (see careplan/status_cache.py): short while a plan is
+# moving — every status change refreshes it anyway — long once it is final
+CAREPLAN_STATUS_CACHE_TTL = int(os.environ.get('CAREPLAN_STATUS_CACHE_TTL', 5))
+CAREPLAN_STATUS_CACHE_TERMINAL_TTL = int(os.environ.get('CAREPLAN_STATUS_CACHE_TERMINAL_TTL', 24 * 3600))
+
+# GET /api/careplans/ page size (default and cap)
+CAREPLAN_LIST_PAGE_SIZE = 50
+CAREPLAN_LIST_MAX_PAGE_SIZE = 200
+
+# Rows fetched per server-side cursor round trip by GET /api/careplans/export/
+CAREPLAN_EXPORT_CHUNK_SIZE = int(os.environ.get('CAREPLAN_EXPORT_CHUNK_SIZE', 2000))
+
+# Largest batch accepted by POST /api/generate/bulk/
+CAREPLAN_BULK_MAX_ITEMS = int(os.environ.get('CAREPLAN_BULK_MAX_ITEMS', 1000))
+
+# Identical profiles in flight share one LLM call (see careplan/coalesce.py)
+CAREPLAN_COALESCE_LEASE_SECONDS = int(os.environ.get('CAREPLAN_COALESCE_LEASE_SECONDS', 120))
+
+# Trace log: one JSON line per span (see careplan/tracing.py); '-' = stdout, '' = off
+CAREPLAN_TRACE_LOG = os.environ.get('CAREPLAN_TRACE_LOG', '')
+
+# Celery workers and the async worker serve /metrics on this port (0 = off)
+CAREPLAN_WORKER_METRICS_PORT = int(os.environ.get('CAREPLAN_WORKER_METRICS_PORT', 9808))
+
 # Celery
 CELERY_BROKER_URL = f"redis://{os.environ.get('REDIS_HOST', 'localhost')}:6379/0"
 
@@ -58,6 +134,10 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'careplan.tasks.update_careplan_gauge',
         'schedule': 30.0,
     },
+    'reconcile-careplan-status-counts': {
+        'task': 'careplan.tasks.reconcile_careplan_status_counts',
+        'schedule': 3600.0,
+    },
 }
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'UTC'
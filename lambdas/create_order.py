@@ -1,78 +1,116 @@
 """
 Lambda 1 - Create Order: 验证输入 → 存数据库 → 发 SQS
-路由: POST /orders
+路由: POST /orders       一个病人
+      POST /orders/bulk  JSON 数组或 NDJSON，一次多个病人
+
+SQS 消息 body 里带 trace (tracing.inject()) 和 enqueued_at (epoch 秒)：
+generate Lambda 接着同一个 trace 记 span，并算排队时间
+
+upsert 病人会改药物/过敏/病史，这个病人以前订单的 get_order 缓存里是旧的，
+所以建单后删掉它们的 status_cache
 """
 
 import json
 import os
+import re
+import time
+from datetime import date
+
 import boto3
-from db import get_connection
+from psycopg2.extras import execute_values
+from careplan import tracing
+from careplan.medications import canonicalize_medications
+import status_cache
+from db import get_connection, release_connection
 
 
 sqs = boto3.client('sqs')
 
+REQUIRED_FIELDS = ['patient_first_name', 'patient_last_name', 'date_of_birth', 'medications']
+BULK_MAX_ITEMS = int(os.environ.get('BULK_MAX_ITEMS', 1000))
+SQS_BATCH_SIZE = 10  # send_message_batch 上限
+DATE_RE = re.compile(r'[0-9]{4}-[0-9]{2}-[0-9]{2}')  # fromisoformat 还收 19900115、1990-W03-1 这类写法
+
+UPSERT_PATIENT_SQL = (
+    "INSERT INTO patient (first_name, last_name, date_of_birth, medications, medications_canonical, "
+    "allergies, health_conditions) VALUES {values} "
+    "ON CONFLICT (first_name, last_name, date_of_birth) DO UPDATE SET "
+    "medications=EXCLUDED.medications, medications_canonical=EXCLUDED.medications_canonical, "
+    "allergies=EXCLUDED.allergies, health_conditions=EXCLUDED.health_conditions, "
+    # 药物/过敏/病史真的变了才更新 updated_at（订单的 ETag 看它）
+    "updated_at=CASE WHEN (patient.medications, patient.allergies, patient.health_conditions) "
+    "IS DISTINCT FROM (EXCLUDED.medications, EXCLUDED.allergies, EXCLUDED.health_conditions) "
+    "THEN NOW() ELSE patient.updated_at END "
+    "RETURNING id"
+)
+
+# 返回 (新订单 id 或 NULL, 这个病人以前的订单 id 数组)；子查询看不到这条语句新插的订单
+CREATE_ORDER_SQL = (
+    "WITH p AS (" + UPSERT_PATIENT_SQL.format(values='(%s, %s, %s, %s, %s, %s, %s)') + "), "
+    "c AS (INSERT INTO careplan (patient_id, status) SELECT id, 'pending' FROM p "
+    "ON CONFLICT (patient_id) WHERE status IN ('pending', 'processing', 'partial') DO NOTHING "
+    "RETURNING id) "
+    "SELECT c.id, ARRAY(SELECT id FROM careplan WHERE patient_id = p.id) FROM p LEFT JOIN c ON true"
+)
+
+BULK_INSERT_CAREPLANS_SQL = (
+    "INSERT INTO careplan (patient_id, status) "
+    "SELECT patient_id, 'pending' FROM unnest(%s::int[]) AS patient_id "
+    "ON CONFLICT (patient_id) WHERE status IN ('pending', 'processing', 'partial') DO NOTHING "
+    "RETURNING id, patient_id"
+)
+
+tracing.log_to(os.environ.get('TRACE_LOG', ''))
+
 
 def lambda_handler(event, context):
+    with tracing.span('http.request'):
+        return handle(event)
+
+
+def handle(event):
     # 1. 解析请求体
     try:
-        body = json.loads(event.get('body', '{}'))
+        body = parse_body(event)
     except json.JSONDecodeError:
         return response(400, {'error': 'Invalid JSON'})
 
+    if isinstance(body, list):
+        return bulk_handler(body)
+
     # 2. 验证必填字段
-    required = ['patient_first_name', 'patient_last_name', 'date_of_birth', 'medications']
-    missing = [f for f in required if not body.get(f)]
+    missing = [f for f in REQUIRED_FIELDS if not body.get(f)]
     if missing:
         return response(400, {'error': f'Missing fields: {", ".join(missing)}'})
 
     conn = None
+    error = None
     try:
         conn = get_connection()
         cur = conn.cursor()
 
-        # 3. 查找或创建 Patient
-        cur.execute(
-            "SELECT id FROM patient WHERE first_name=%s AND last_name=%s AND date_of_birth=%s",
-            (body['patient_first_name'], body['patient_last_name'], body['date_of_birth'])
-        )
-        row = cur.fetchone()
-
-        if row:
-            patient_id = row[0]
-            cur.execute(
-                "UPDATE patient SET medications=%s, allergies=%s, health_conditions=%s WHERE id=%s",
-                (body['medications'], body.get('allergies', ''), body.get('health_conditions', ''), patient_id)
-            )
-        else:
-            cur.execute(
-                "INSERT INTO patient (first_name, last_name, date_of_birth, medications, allergies, health_conditions) VALUES (%s,%s,%s,%s,%s,%s) RETURNING id",
-                (body['patient_first_name'], body['patient_last_name'], body['date_of_birth'],
-                 body['medications'], body.get('allergies', ''), body.get('health_conditions', ''))
-            )
-            patient_id = cur.fetchone()[0]
-
-        # 4. 检查是否有重复的 pending/processing 订单
-        cur.execute(
-            "SELECT id FROM careplan WHERE patient_id=%s AND status IN ('pending','processing')",
-            (patient_id,)
-        )
-        if cur.fetchone():
-            conn.rollback()
-            return response(409, {'error': 'A care plan is already being generated for this patient.'})
+        # 3. 一条 SQL：upsert 病人 + 有进行中的 careplan 就不插 (careplan_one_active_per_patient)
+        with tracing.span('create.insert'):
+            cur.execute(CREATE_ORDER_SQL, (
+                body['patient_first_name'], body['patient_last_name'], body['date_of_birth'],
+                *patient_fields(body),
+            ))
+            careplan_id, earlier_ids = cur.fetchone()
+            conn.commit()
+        status_cache.invalidate(earlier_ids)
 
-        # 5. 创建 CarePlan
-        cur.execute(
-            "INSERT INTO careplan (patient_id, status) VALUES (%s, 'pending') RETURNING id",
-            (patient_id,)
-        )
-        careplan_id = cur.fetchone()[0]
-        conn.commit()
+        # 4. 没有新 id = 这个病人已经有进行中的订单（并发提交也一样）
+        if careplan_id is None:
+            return response(409, {'error': 'A care plan is already being generated for this patient.'})
 
-        # 6. 发 SQS 消息，触发 Lambda 2
-        sqs.send_message(
-            QueueUrl=os.environ['SQS_QUEUE_URL'],
-            MessageBody=json.dumps({'careplan_id': careplan_id}),
-        )
+        # 5. 发 SQS 消息，触发 Lambda 2
+        with tracing.span('create.enqueue'):
+            sqs.send_message(
+                QueueUrl=os.environ['SQS_QUEUE_URL'],
+                MessageBody=json.dumps(
+                    {'careplan_id': careplan_id, 'trace': tracing.inject(), 'enqueued_at': time.time()}
+                ),
+            )
 
         return response(201, {
             'id': careplan_id,
@@ -81,12 +119,140 @@ def lambda_handler(event, context):
         })
 
     except Exception as e:
-        if conn:
-            conn.rollback()
+        error = e
         return response(500, {'error': str(e)})
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn, error)
+
+
+def parse_body(event):
+    raw = event.get('body') or '{}'
+    headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    if headers.get('content-type', '').startswith(('application/x-ndjson', 'application/jsonl')):
+        return [json.loads(line) for line in raw.splitlines() if line.strip()]
+    return json.loads(raw)
+
+
+def bulk_handler(items):
+    """
+    批量建单：不管多少个病人，数据库都是固定两条 SQL
+    (upsert 病人 → 跳过有进行中订单的病人批量插 careplan)，
+    SQS 每 10 条一个 send_message_batch。每个 item 单独返回结果。
+    """
+    if len(items) > BULK_MAX_ITEMS:
+        return response(400, {'error': f'At most {BULK_MAX_ITEMS} patients per request.'})
+
+    results = [None] * len(items)
+    rows = {}  # (first_name, last_name, date_of_birth) -> (index, item)
+    for index, item in enumerate(items):
+        date_of_birth, error = validate_item(item)
+        if error is None:
+            key = (item['patient_first_name'], item['patient_last_name'], date_of_birth)
+            if key in rows:
+                error = 'The same patient appears more than once in this request.'
+            else:
+                rows[key] = (index, item)
+        if error:
+            results[index] = {'index': index, 'error': error}
+
+    accepted = []  # (index, careplan_id)
+    conn = None
+    error = None
+    try:
+        if rows:
+            conn = get_connection()
+            cur = conn.cursor()
+
+            # 1. 一条 upsert 搞定所有病人 (unique_patient_identity)，RETURNING 顺序和 VALUES 一致
+            keys = list(rows)
+            with tracing.span('bulk.patients'):
+                upserted = execute_values(
+                    cur, UPSERT_PATIENT_SQL.format(values='%s'),
+                    [(*key, *patient_fields(rows[key][1])) for key in keys],
+                    page_size=len(keys), fetch=True,
+                )
+            patient_ids = dict(zip(keys, (r[0] for r in upserted)))
+            cur.execute("SELECT id FROM careplan WHERE patient_id = ANY(%s)", (list(patient_ids.values()),))
+            earlier_ids = [r[0] for r in cur.fetchall()]
+
+            # 2. 查重 + 批量插 careplan 一条 SQL，已有进行中订单的病人被 ON CONFLICT 跳过
+            with tracing.span('bulk.insert'):
+                cur.execute(BULK_INSERT_CAREPLANS_SQL, (list(patient_ids.values()),))
+                created = {patient_id: careplan_id for careplan_id, patient_id in cur.fetchall()}
+
+            for key, (index, _) in rows.items():
+                careplan_id = created.get(patient_ids[key])
+                if careplan_id is None:
+                    results[index] = {'index': index, 'error': 'A care plan is already being generated for this patient.'}
+                else:
+                    accepted.append((index, careplan_id))
+            conn.commit()
+            status_cache.invalidate(earlier_ids)
+
+    except Exception as e:
+        error = e
+        return response(500, {'error': str(e)})
+    finally:
+        release_connection(conn, error)
+
+    # 3. 发 SQS，每批 10 条
+    failed = set()
+    with tracing.span('bulk.enqueue'):
+        message = {'trace': tracing.inject(), 'enqueued_at': time.time()}
+        for start in range(0, len(accepted), SQS_BATCH_SIZE):
+            chunk = accepted[start:start + SQS_BATCH_SIZE]
+            try:
+                result = sqs.send_message_batch(
+                    QueueUrl=os.environ['SQS_QUEUE_URL'],
+                    Entries=[
+                        {'Id': str(careplan_id), 'MessageBody': json.dumps({'careplan_id': careplan_id, **message})}
+                        for _, careplan_id in chunk
+                    ],
+                )
+            except Exception as e:
+                # 订单已经提交了，整批算入队失败，不能让整个请求 500
+                print(f"[create] send_message_batch failed: {e!r}")
+                failed.update(careplan_id for _, careplan_id in chunk)
+                continue
+            failed.update(int(f['Id']) for f in result.get('Failed', []))
+
+    for index, careplan_id in accepted:
+        if careplan_id in failed:
+            results[index] = {'index': index, 'id': careplan_id, 'error': 'Saved but could not be queued.'}
+        else:
+            results[index] = {'index': index, 'id': careplan_id, 'status': 'pending'}
+
+    n_accepted = len(accepted) - len(failed)
+    return response(201, {
+        'accepted': n_accepted,
+        'rejected': len(items) - n_accepted,
+        'results': results,
+    })
+
+
+def validate_item(item):
+    """返回 (解析好的 date_of_birth, 错误信息)。"""
+    if not isinstance(item, dict):
+        return None, 'Each item must be a JSON object.'
+    missing = [f for f in REQUIRED_FIELDS if not item.get(f)]
+    if missing:
+        return None, f'Missing fields: {", ".join(missing)}'
+    value = item['date_of_birth']
+    if isinstance(value, str) and DATE_RE.fullmatch(value):
+        try:
+            return date.fromisoformat(value), None
+        except ValueError:
+            pass
+    return None, 'date_of_birth must be YYYY-MM-DD.'
+
+
+def patient_fields(item):
+    return (
+        item['medications'],
+        canonicalize_medications(item['medications']),
+        item.get('allergies', ''),
+        item.get('health_conditions', ''),
+    )
 
 
 def response(status_code, body):
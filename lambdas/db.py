@@ -1,16 +1,103 @@
 """
 共享的数据库连接工具 — 3 个 Lambda 都用这个文件
+
+连接放在模块级，warm invocation 直接复用，不用每次都 TCP + TLS + 认证：
+- get_connection():      拿到可用的连接；闲置超过 DB_PING_AFTER_SECONDS 先 SELECT 1 探活，
+                         断了就重连
+- release_connection():  handler 的 finally 里调用，回滚没提交的事务，连接留着下次用；
+                         传入连接类异常时直接丢掉，下次重连
+- DB_DSN:                可选，完整的 libpq DSN，指向 pgbouncer / RDS Proxy 时用它；
+                         没设就用 DB_HOST / DB_NAME / DB_USER / DB_PASSWORD / DB_PORT
 """
 
 import os
+import time
+
 import psycopg2
+from psycopg2 import extensions
+
+_conn = None
+_last_used = 0.0
+
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
 
 
 def get_connection():
+    global _conn, _last_used
+    if _conn is not None and not _is_healthy(_conn):
+        close_connection()
+    if _conn is None:
+        _conn = _connect()
+    _last_used = time.monotonic()
+    return _conn
+
+
+def release_connection(conn, error=None):
+    """事务收尾，连接留给下一次 invocation；连接坏了就扔掉。"""
+    if conn is None:
+        return
+    if isinstance(error, CONNECTION_ERRORS) or conn.closed:
+        close_connection()
+        return
+    try:
+        if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+            conn.rollback()
+    except CONNECTION_ERRORS:
+        close_connection()
+
+
+def close_connection():
+    global _conn
+    if _conn is not None:
+        try:
+            _conn.close()
+        except Exception:
+            pass
+    _conn = None
+
+
+def _connect():
+    options = dict(
+        connect_timeout=int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+        client_encoding='UTF8',  # care plan 文本里有 emoji / 中文
+        # Lambda 被冻结期间 NAT / RDS 可能断开空闲连接，TCP keepalive 让坏连接尽快暴露
+        keepalives=1,
+        keepalives_idle=30,
+        keepalives_interval=10,
+        keepalives_count=3,
+    )
+    dsn = os.environ.get('DB_DSN')
+    if dsn:
+        return psycopg2.connect(dsn, **options)
     return psycopg2.connect(
         host=os.environ['DB_HOST'],
         dbname=os.environ['DB_NAME'],
         user=os.environ['DB_USER'],
         password=os.environ['DB_PASSWORD'],
         port=os.environ.get('DB_PORT', '5432'),
+        **options,
     )
+
+
+def _is_healthy(conn):
+    if conn.closed:
+        return False
+    status = conn.get_transaction_status()
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        # 上一次 invocation 没收尾
+        try:
+            conn.rollback()
+        except CONNECTION_ERRORS:
+            return False
+    # 刚用过的连接不探活，省一个 round trip
+    if time.monotonic() - _last_used < float(os.environ.get('DB_PING_AFTER_SECONDS', 30)):
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute('SELECT 1')
+        conn.rollback()
+        return True
+    except CONNECTION_ERRORS:
+        return False
@@ -1,12 +1,238 @@
 """
 Lambda 2 - Generate CarePlan: 被 SQS 触发，调 LLM，更新数据库
+
+一次 invocation 处理一整批 SQS 消息 (terraform batch_size)：
+1. 一条 UPDATE ... RETURNING 把整批 careplan 标成 processing，顺便带出病人信息
+2. 线程池并发调 LLM (LLM_CONCURRENCY)，一批的耗时 ≈ 最慢的那一个
+3. 成功的一条 UPDATE ... FROM (VALUES ...) 批量写回
+4. 失败的放进 batchItemFailures，只有这些消息会被 SQS 重投；
+   最后一次 (ApproximateReceiveCount >= MAX_RECEIVE_COUNT) 还失败就标 failed，消息进 DLQ
+
+Tracing: 每条消息 body 里的 trace (create_order 的 span) 是这条 careplan 的 llm.call 的 parent；
+claim / 写回是整批的，挂在 lambda.batch 下。TRACE_LOG='-' 时 span 打到 CloudWatch
+
+延迟指标 (CloudWatch EMF，namespace METRICS_NAMESPACE)：
+- QueueWait: 第一次收到消息时 - enqueued_at (没有就用 SQS 的 SentTimestamp)
+- Processing / EndToEnd: 到 completed / failed 为止，这一批花的时间 / 从提交开始的总时间
+队列深度直接用 SQS 自带的 ApproximateNumberOfMessagesVisible
 """
 
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from psycopg2.extras import execute_values
+from careplan.interactions import format_danger_section, screen
+from careplan.prompts import LLM_MAX_TOKENS, LLM_MODEL, LLM_TEMPERATURE, SYSTEM_PROMPT, build_prompt
+from careplan import tracing
+import status_cache
+from db import get_connection, release_connection
+
+LLM_CONCURRENCY = int(os.environ.get('LLM_CONCURRENCY', 10))
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 45))
+MAX_RECEIVE_COUNT = int(os.environ.get('MAX_RECEIVE_COUNT', 3))  # 和 SQS redrive maxReceiveCount 一致
+METRICS_NAMESPACE = os.environ.get('METRICS_NAMESPACE', 'ElderMedAssist')
+
+# 跨 warm invocation 复用的 OpenAI client / 线程池
+_client = None
+_executor = None
+
+tracing.log_to(os.environ.get('TRACE_LOG', ''))
 
 
 def lambda_handler(event, context):
-    return {
-        'statusCode': 200,
-        'body': json.dumps({'message': 'generate_careplan placeholder'})
-    }
+    records = event.get('Records', [])
+    with tracing.span('lambda.batch', size=len(records)):
+        return handle_batch(records)
+
+
+def handle_batch(records):
+    started = time.time()
+    failures = set()
+
+    # 1. 解析消息: careplan_id -> record
+    by_id = {}
+    traces = {}
+    enqueued = {}
+    for record in records:
+        try:
+            body = json.loads(record['body'])
+            careplan_id = int(body['careplan_id'])
+            by_id[careplan_id] = record
+            traces[careplan_id] = body.get('trace')
+            enqueued[careplan_id] = enqueued_at(record, body)
+        except (KeyError, TypeError, ValueError):
+            print(f"[generate] Bad message {record.get('messageId')}: {record.get('body')!r}")
+            failures.add(record['messageId'])
+
+    conn = None
+    error = None
+    try:
+        conn = get_connection()
+        with tracing.span('lambda.claim'):
+            plans = claim(conn, list(by_id))
+        for plan in plans:
+            plan['trace'] = traces[plan['id']]
+
+        # 2. 并发调 LLM
+        results = list(_get_executor().map(generate, plans))
+
+        # 3. 批量写回
+        completed = [(plan['id'], text) for plan, (text, _) in zip(plans, results) if text is not None]
+        retry, failed = [], []
+        for plan, (text, exc) in zip(plans, results):
+            if text is not None:
+                continue
+            record = by_id[plan['id']]
+            print(f"[generate] CarePlan #{plan['id']} failed: {exc!r}")
+            if receive_count(record) >= MAX_RECEIVE_COUNT:
+                failed.append((plan['id'], str(exc)))
+            else:
+                retry.append(plan['id'])
+            failures.add(record['messageId'])
+
+        with tracing.span('lambda.save'):
+            save_results(conn, completed, retry, failed)
+        print(f"[generate] batch of {len(records)}: {len(completed)} completed, "
+              f"{len(retry)} retrying, {len(failed)} failed")
+
+        finished = time.time()
+        done = [i for i, _ in completed] + [i for i, _ in failed]
+        put_metrics(
+            # 重投的消息等的是可见性超时，不是排队，只看第一次收到的
+            QueueWait=[started - enqueued[i] for i in by_id if receive_count(by_id[i]) == 1],
+            Processing=[finished - started for _ in done],
+            EndToEnd=[finished - enqueued[i] for i in done],
+        )
+
+    except Exception as e:
+        # 数据库挂了之类：整批重投
+        error = e
+        print(f"[generate] batch failed: {e!r}")
+        failures = {record['messageId'] for record in records}
+    finally:
+        release_connection(conn, error)
+
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in sorted(failures)]}
+
+
+def claim(conn, careplan_ids):
+    """一条 SQL：整批标成 processing，返回病人信息。已完成/已失败的 (重复投递) 跳过。"""
+    if not careplan_ids:
+        return []
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE careplan c SET status = 'processing', care_plan_text = '', updated_at = NOW()
+            FROM patient p
+            WHERE c.patient_id = p.id AND c.id = ANY(%s)
+              AND c.status IN ('pending', 'processing', 'partial')
+            RETURNING c.id, p.first_name, p.last_name, p.medications, p.allergies, p.health_conditions
+        """, (careplan_ids,))
+        columns = [col.name for col in cur.description]
+        plans = [dict(zip(columns, row)) for row in cur.fetchall()]
+    conn.commit()
+    status_cache.invalidate([plan['id'] for plan in plans])
+    return plans
+
+
+def save_results(conn, completed, retry, failed):
+    with conn.cursor() as cur:
+        if completed or failed:
+            execute_values(cur, """
+                UPDATE careplan c SET status = v.status, care_plan_text = v.text, updated_at = NOW()
+                FROM (VALUES %s) AS v(id, status, text)
+                WHERE c.id = v.id
+            """, [(i, 'completed', text) for i, text in completed] + [(i, 'failed', text) for i, text in failed],
+                page_size=len(completed) + len(failed))
+        if retry:
+            # 等 SQS 重投，先回到 pending
+            cur.execute(
+                "UPDATE careplan SET status = 'pending', updated_at = NOW() WHERE id = ANY(%s)",
+                (retry,),
+            )
+    conn.commit()
+    status_cache.invalidate([i for i, _ in completed] + [i for i, _ in failed] + retry)
+
+
+def generate(plan):
+    """线程池里跑：返回 (text, None) 或 (None, exception)。"""
+    try:
+        with tracing.span('llm.call', parent=plan.get('trace'), careplan_id=plan['id']):
+            return call_llm(plan), None
+    except Exception as e:
+        return None, e
+
+
+def call_llm(plan):
+    known_dangers = screen(plan['medications'], plan['allergies'], plan['health_conditions'])
+    api_key = os.environ.get('OPENAI_API_KEY', '')
+    if not api_key or api_key == 'your-api-key-here':
+        # 没有 key: 只返回本地查出的危险组合
+        return (
+            format_danger_section(known_dangers) + "\n"
+            f"## Medication Overview\n"
+            f"Patient: {plan['first_name']} {plan['last_name']}\n"
+            f"Medications: {plan['medications']}\n"
+        )
+
+    response = _get_client(api_key).chat.completions.create(
+        model=LLM_MODEL,
+        messages=[
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(
+                plan['medications'], plan['allergies'], plan['health_conditions'], known_dangers,
+            )},
+        ],
+        temperature=LLM_TEMPERATURE,
+        max_tokens=LLM_MAX_TOKENS,
+    )
+    return response.choices[0].message.content
+
+
+def receive_count(record):
+    return int(record.get('attributes', {}).get('ApproximateReceiveCount', 1))
+
+
+def enqueued_at(record, body):
+    """create_order 写进 body 的 enqueued_at；老消息没有就用 SQS 的 SentTimestamp (毫秒)。"""
+    if body.get('enqueued_at') is not None:
+        return float(body['enqueued_at'])
+    return int(record.get('attributes', {}).get('SentTimestamp', time.time() * 1000)) / 1000
+
+
+def put_metrics(**values):
+    """
+    CloudWatch Embedded Metric Format：stdout 打一行 JSON，CloudWatch 自己生成指标，
+    不用调 PutMetricData。每个值是一个秒数列表 (一批最多 10 条)。
+    """
+    values = {name: samples for name, samples in values.items() if samples}
+    if not values:
+        return
+    print(json.dumps({
+        '_aws': {
+            'Timestamp': int(time.time() * 1000),
+            'CloudWatchMetrics': [{
+                'Namespace': METRICS_NAMESPACE,
+                'Dimensions': [[]],
+                'Metrics': [{'Name': name, 'Unit': 'Seconds'} for name in values],
+            }],
+        },
+        **values,
+    }))
+
+
+def _get_client(api_key):
+    global _client
+    if _client is None:
+        import openai
+        # 不在 Lambda 里重试，失败的消息交给 SQS 重投
+        _client = openai.OpenAI(api_key=api_key, timeout=LLM_TIMEOUT, max_retries=0)
+    return _client
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=LLM_CONCURRENCY)
+    return _executor
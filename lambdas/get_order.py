@@ -1,10 +1,26 @@
 """
 Lambda 3 - Get Order: 查询 CarePlan 状态和内容
 路由: GET /orders/{id}
+
+先查 status_cache (Redis)，没命中再查库。ETag / Last-Modified 从订单和病人的
+updated_at 取较晚的算 (careplan/etags.py，和 Django 一样)；带 If-None-Match /
+If-Modified-Since 时先只查这两个时间，没变直接 304，不读 care_plan_text
 """
 
 import json
-from db import get_connection
+from datetime import datetime
+
+import status_cache
+from careplan.etags import careplan_etag, http_date, not_modified
+from db import get_connection, release_connection
+
+
+LAST_MODIFIED_SQL = """
+    SELECT GREATEST(c.updated_at, p.updated_at)
+    FROM careplan c
+    JOIN patient p ON c.patient_id = p.id
+    WHERE c.id = %s
+"""
 
 
 def lambda_handler(event, context):
@@ -15,43 +31,74 @@ def lambda_handler(event, context):
     if not order_id:
         return response(400, {'error': 'Missing order id'})
 
+    # HTTP API 的 header 名都是小写
+    headers = event.get('headers') or {}
+    if_none_match = headers.get('if-none-match')
+    if_modified_since = headers.get('if-modified-since')
+
+    entry = status_cache.get(order_id)
+    if entry is not None:
+        return cached_response(entry, if_none_match, if_modified_since)
+
     conn = None
+    error = None
     try:
         conn = get_connection()
         cur = conn.cursor()
 
+        if if_none_match or if_modified_since:
+            cur.execute(LAST_MODIFIED_SQL, (order_id,))
+            row = cur.fetchone()
+            if not row:
+                return response(404, {'error': f'Order {order_id} not found'})
+            etag = careplan_etag(int(order_id), row[0])
+            if not_modified(if_none_match, if_modified_since, etag, row[0]):
+                return not_modified_response(etag, row[0])
+
         # 联表查询: careplan + patient
         cur.execute("""
             SELECT c.id, c.status, c.care_plan_text, c.created_at,
                    p.first_name, p.last_name, p.medications,
-                   p.allergies, p.health_conditions
+                   p.allergies, p.health_conditions, GREATEST(c.updated_at, p.updated_at)
             FROM careplan c
             JOIN patient p ON c.patient_id = p.id
             WHERE c.id = %s
         """, (order_id,))
 
         row = cur.fetchone()
-        cur.close()
 
         if not row:
             return response(404, {'error': f'Order {order_id} not found'})
 
-        return response(200, {
+        body = json.dumps({
             'id': row[0],
             'status': row[1],
-            'care_plan_text': row[2] if row[1] == 'completed' else '',
+            # partial = still streaming, return what has been generated so far
+            'care_plan_text': row[2] if row[1] in ('completed', 'partial') else '',
             'created_at': row[3].isoformat() if row[3] else '',
             'patient_name': f"{row[4]} {row[5]}",
             'medications': row[6],
             'allergies': row[7],
             'health_conditions': row[8],
         })
+        entry = status_cache.store(
+            row[0], row[1], body, careplan_etag(row[0], row[9]), row[9],
+            recheck=lambda: last_modified(cur, order_id),
+        )
+        cur.close()
+        return cached_response(entry, if_none_match, if_modified_since)
 
     except Exception as e:
+        error = e
         return response(500, {'error': str(e)})
     finally:
-        if conn:
-            conn.close()
+        release_connection(conn, error)
+
+
+def last_modified(cur, order_id):
+    cur.execute(LAST_MODIFIED_SQL, (order_id,))
+    row = cur.fetchone()
+    return row[0] if row else None
 
 
 def response(status_code, body):
@@ -60,3 +107,22 @@ def response(status_code, body):
         'headers': {'Content-Type': 'application/json'},
         'body': json.dumps(body),
     }
+
+
+def cached_response(entry, if_none_match, if_modified_since):
+    last_modified = datetime.fromisoformat(entry['last_modified'])
+    if not_modified(if_none_match, if_modified_since, entry['etag'], last_modified):
+        return not_modified_response(entry['etag'], last_modified)
+    return {
+        'statusCode': 200,
+        'headers': {'Content-Type': 'application/json', **validator_headers(entry['etag'], last_modified)},
+        'body': entry['body'],
+    }
+
+
+def not_modified_response(etag, last_modified):
+    return {'statusCode': 304, 'headers': validator_headers(etag, last_modified), 'body': ''}
+
+
+def validator_headers(etag, last_modified):
+    return {'ETag': etag, 'Last-Modified': http_date(last_modified), 'Cache-Control': 'no-cache'}
@@ -4,10 +4,17 @@ CREATE TABLE IF NOT EXISTS patient (
     last_name VARCHAR(100) NOT NULL,
     date_of_birth DATE NOT NULL,
     medications TEXT NOT NULL,
+    medications_canonical TEXT DEFAULT '',
     allergies TEXT DEFAULT '',
-    health_conditions TEXT DEFAULT ''
+    health_conditions TEXT DEFAULT '',
+    updated_at TIMESTAMP DEFAULT NOW()
 );
 
+-- 已有的库补列（见 careplan/medications.py）
+ALTER TABLE patient ADD COLUMN IF NOT EXISTS medications_canonical TEXT DEFAULT '';
+-- 订单的 ETag 也要看病人的 updated_at（返回内容里有药物/过敏/病史，见 careplan/etags.py）
+ALTER TABLE patient ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT NOW();
+
 CREATE TABLE IF NOT EXISTS careplan (
     id SERIAL PRIMARY KEY,
     patient_id INTEGER NOT NULL REFERENCES patient(id) ON DELETE CASCADE,
@@ -16,3 +23,30 @@ CREATE TABLE IF NOT EXISTS careplan (
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW()
 );
+
+-- 合并重复病人（先于唯一索引，和 Django 迁移 0004 一样保留 id 最小的）
+UPDATE careplan c SET patient_id = d.keep_id
+FROM (SELECT id, MIN(id) OVER (PARTITION BY first_name, last_name, date_of_birth) AS keep_id FROM patient) d
+WHERE c.patient_id = d.id AND d.id <> d.keep_id;
+
+DELETE FROM patient p
+USING (SELECT id, MIN(id) OVER (PARTITION BY first_name, last_name, date_of_birth) AS keep_id FROM patient) d
+WHERE p.id = d.id AND d.id <> d.keep_id;
+
+-- 病人身份唯一：查找走这个索引，并发建单不会建出重复病人 (ON CONFLICT 用)
+CREATE UNIQUE INDEX IF NOT EXISTS unique_patient_identity
+    ON patient (first_name, last_name, date_of_birth);
+
+-- 并发提交留下的多个进行中订单：保留最新的（和 Django 迁移 0006 一样）
+UPDATE careplan c SET status = 'failed', care_plan_text = 'Superseded by a newer request for the same patient.'
+FROM (
+    SELECT id, ROW_NUMBER() OVER (PARTITION BY patient_id ORDER BY created_at DESC, id DESC) AS rn
+    FROM careplan WHERE status IN ('pending', 'processing', 'partial')
+) d
+WHERE c.id = d.id AND d.rn > 1;
+
+-- 每个病人最多一个进行中的 careplan：建单的 ON CONFLICT DO NOTHING 靠它防并发重复，
+-- 已完成的不进索引
+DROP INDEX IF EXISTS careplan_active_patient_idx;
+CREATE UNIQUE INDEX IF NOT EXISTS careplan_one_active_per_patient
+    ON careplan (patient_id) WHERE status IN ('pending', 'processing', 'partial');
@@ -0,0 +1,82 @@
+"""
+get_order 的 Redis 读穿缓存 — get_order 和 generate_careplan 共用
+
+客户端一直在轮询 GET /orders/{id}，缓存序列化好的 body + ETag / Last-Modified：
+- 命中:         不查数据库；If-None-Match 对上了直接 304
+- TTL:          pending / processing / partial 用 STATUS_CACHE_TTL (短)，
+                completed / failed 用 STATUS_CACHE_TERMINAL_TTL (长)
+- 失效:         generate_careplan / create_order 改状态提交后删 key；get_order 写入后
+                再查一次 updated_at，读的过程中被改过就把刚写的删掉
+- REDIS_URL:    没设就不缓存，Redis 出错也只打日志，不影响请求
+"""
+
+import json
+import os
+
+KEY_PREFIX = 'careplan:order-status'
+TERMINAL_STATUSES = ('completed', 'failed')
+
+_client = None
+
+
+def get(order_id):
+    """返回 {'etag', 'last_modified', 'body'}，没命中返回 None。"""
+    client = _get_client()
+    if client is None:
+        return None
+    try:
+        cached = client.get(make_key(order_id))
+    except Exception as e:
+        print(f"[status_cache] get #{order_id} failed: {e!r}")
+        return None
+    return json.loads(cached) if cached else None
+
+
+def store(order_id, status, body, etag, updated_at, recheck=None):
+    """
+    body 是已经 json.dumps 好的字符串；返回 entry (没 Redis 也返回)。
+    recheck() 返回数据库里现在的 updated_at，写入之后调用。
+    """
+    entry = {'etag': etag, 'last_modified': updated_at.isoformat(), 'body': body}
+    client = _get_client()
+    if client is not None:
+        ttl = int(os.environ.get(
+            'STATUS_CACHE_TERMINAL_TTL' if status in TERMINAL_STATUSES else 'STATUS_CACHE_TTL',
+            24 * 3600 if status in TERMINAL_STATUSES else 5,
+        ))
+        key = make_key(order_id)
+        try:
+            # nx: 别的 get_order 可能已经存了更新的 body，不覆盖
+            if client.set(key, json.dumps(entry), ex=ttl, nx=True) and recheck is not None:
+                # 改状态的一方是先提交再删 key：我们读完之后它才提交的话，删 key 可能
+                # 早于我们的 set，这里一定能看到新的 updated_at，把旧 body 删掉
+                if recheck() != updated_at:
+                    client.delete(key)
+        except Exception as e:
+            print(f"[status_cache] store #{order_id} failed: {e!r}")
+    return entry
+
+
+def invalidate(order_ids):
+    client = _get_client()
+    if client is None or not order_ids:
+        return
+    try:
+        client.delete(*[make_key(i) for i in order_ids])
+    except Exception as e:
+        print(f"[status_cache] invalidate {list(order_ids)} failed: {e!r}")
+
+
+def make_key(order_id):
+    return f'{KEY_PREFIX}:{order_id}'
+
+
+def _get_client():
+    global _client
+    url = os.environ.get('REDIS_URL')
+    if not url:
+        return None
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=0.5)
+    return _client
@@ -16,6 +16,19 @@ variable "openai_api_key" {
   sensitive   = true
 }
 
+variable "db_dsn" {
+  description = "Optional libpq DSN for a pgbouncer / RDS Proxy endpoint; overrides DB_HOST etc. when set"
+  type        = string
+  default     = ""
+  sensitive   = true
+}
+
+variable "redis_url" {
+  description = "Optional Redis (ElastiCache) URL for the get_order status cache; empty disables it"
+  type        = string
+  default     = ""
+}
+
 # Dead Letter Queue — 失败 3 次的消息会被移到这里
 resource "aws_sqs_queue" "careplan_dlq" {
   name = "eldermed-careplan-dlq"
@@ -24,7 +37,7 @@ resource "aws_sqs_queue" "careplan_dlq" {
 # 主队列 — 关联 DLQ，最多重试 3 次
 resource "aws_sqs_queue" "careplan_queue" {
   name                       = "eldermed-careplan-queue"
-  visibility_timeout_seconds = 90
+  visibility_timeout_seconds = 360 # AWS 建议 >= 6 × Lambda timeout
 
   redrive_policy = jsonencode({
     deadLetterTargetArn = aws_sqs_queue.careplan_dlq.arn
@@ -129,6 +142,7 @@ locals {
     DB_USER     = "careplan_user"
     DB_PASSWORD = var.db_password
     DB_PORT     = "5432"
+    DB_DSN      = var.db_dsn
   }
 }
 
@@ -146,6 +160,8 @@ resource "aws_lambda_function" "create_order" {
   environment {
     variables = merge(local.db_env, {
       SQS_QUEUE_URL = aws_sqs_queue.careplan_queue.url
+      REDIS_URL     = var.redis_url # 病人资料变了让 get_order 的缓存失效
+      TRACE_LOG     = "-" # span 写 stdout，进 CloudWatch
     })
   }
 }
@@ -163,12 +179,17 @@ resource "aws_lambda_function" "generate_careplan" {
 
   environment {
     variables = merge(local.db_env, {
-      OPENAI_API_KEY = var.openai_api_key
+      OPENAI_API_KEY    = var.openai_api_key
+      LLM_CONCURRENCY   = "10"
+      LLM_TIMEOUT       = "45"
+      MAX_RECEIVE_COUNT = "3"
+      REDIS_URL         = var.redis_url # 改状态时让 get_order 的缓存失效
+      TRACE_LOG         = "-"
     })
   }
 }
 
-# Lambda 3: 查询订单 — 只需要连数据库
+# Lambda 3: 查询订单 — 连数据库，前面有一层 Redis 缓存 (可选)
 resource "aws_lambda_function" "get_order" {
   function_name = "eldermed-get-order"
   runtime       = "python3.12"
@@ -180,7 +201,11 @@ resource "aws_lambda_function" "get_order" {
   source_code_hash = filebase64sha256("${path.module}/../lambdas/zips/get_order.zip")
 
   environment {
-    variables = local.db_env
+    variables = merge(local.db_env, {
+      REDIS_URL                 = var.redis_url
+      STATUS_CACHE_TTL          = "5"
+      STATUS_CACHE_TERMINAL_TTL = "86400"
+    })
   }
 }
 
@@ -189,7 +214,13 @@ resource "aws_lambda_function" "get_order" {
 resource "aws_lambda_event_source_mapping" "sqs_trigger" {
   event_source_arn = aws_sqs_queue.careplan_queue.arn
   function_name    = aws_lambda_function.generate_careplan.arn
-  batch_size       = 1
+
+  # 一次最多 10 条，Lambda 里线程池并发调 LLM；最多攒 2 秒凑一批
+  batch_size                         = 10
+  maximum_batching_window_in_seconds = 2
+
+  # 只重投 batchItemFailures 里的消息，不是整批
+  function_response_types = ["ReportBatchItemFailures"]
 }
 
 # ── API Gateway (HTTP API) ────────────────────────────────
@@ -229,6 +260,12 @@ resource "aws_apigatewayv2_route" "post_orders" {
   target    = "integrations/${aws_apigatewayv2_integration.create_order.id}"
 }
 
+resource "aws_apigatewayv2_route" "post_orders_bulk" {
+  api_id    = aws_apigatewayv2_api.careplan_api.id
+  route_key = "POST /orders/bulk"
+  target    = "integrations/${aws_apigatewayv2_integration.create_order.id}"
+}
+
 resource "aws_lambda_permission" "apigw_create_order" {
   action        = "lambda:InvokeFunction"
   function_name = aws_lambda_function.create_order.function_name
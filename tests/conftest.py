@@ -0,0 +1,80 @@
+"""
+Shared fixtures for the Lambda tests: the raw-SQL schema (lambdas/init_tables.sql)
+in the test database, and helpers to seed plans and build SQS events.
+"""
+
+import json
+import os
+import sys
+
+import psycopg2
+import pytest
+from django.db import connection
+
+LAMBDAS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambdas')
+sys.path.insert(0, LAMBDAS)
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def lambda_db(django_db_setup, django_db_blocker, monkeypatch):
+    settings_dict = connection.settings_dict
+    monkeypatch.setenv('DB_HOST', settings_dict['HOST'])
+    monkeypatch.setenv('DB_NAME', settings_dict['NAME'])
+    monkeypatch.setenv('DB_USER', settings_dict['USER'])
+    monkeypatch.setenv('DB_PASSWORD', settings_dict['PASSWORD'])
+    monkeypatch.setenv('DB_PORT', str(settings_dict['PORT']))
+
+    conn = psycopg2.connect(
+        host=settings_dict['HOST'], dbname=settings_dict['NAME'], port=settings_dict['PORT'],
+        user=settings_dict['USER'], password=settings_dict['PASSWORD'],
+    )
+    conn.autocommit = True
+    conn.set_client_encoding('UTF8')  # the schema file has Chinese comments
+    with open(os.path.join(LAMBDAS, 'init_tables.sql'), encoding='utf-8') as f, conn.cursor() as cur:
+        cur.execute(f.read())
+    yield conn
+    db.close_connection()
+    with conn.cursor() as cur:
+        cur.execute('DROP TABLE careplan, patient')
+    conn.close()
+
+
+@pytest.fixture
+def add_plans(lambda_db):
+    """add_plans(n) -> ids of n new pending plans, one patient each."""
+    def add(n):
+        return _add_plans(lambda_db, n)
+    return add
+
+
+def _add_plans(conn, n):
+    with conn.cursor() as cur:
+        ids = []
+        for i in range(n):
+            cur.execute(
+                "INSERT INTO patient (first_name, last_name, date_of_birth, medications) "
+                "VALUES (%s, 'Smith', '1940-01-15', 'Warfarin 5mg, Ibuprofen 200mg') RETURNING id",
+                (f'Resident{i}',),
+            )
+            cur.execute("INSERT INTO careplan (patient_id) VALUES (%s) RETURNING id", (cur.fetchone()[0],))
+            ids.append(cur.fetchone()[0])
+    return ids
+
+
+@pytest.fixture
+def sqs_event():
+    return _sqs_event
+
+
+def _sqs_event(careplan_ids, receive_count=1):
+    """What SQS hands the Lambda for one batch."""
+    return {'Records': [
+        {
+            'messageId': f'msg-{careplan_id}',
+            'body': json.dumps({'careplan_id': careplan_id}),
+            'attributes': {'ApproximateReceiveCount': str(receive_count)},
+        }
+        for careplan_id in careplan_ids
+    ]}
@@ -0,0 +1,173 @@
+"""
+Tests for the asyncio execution mode (careplan/async_worker.py).
+
+Uses transactional DB tests because the worker writes from sync_to_async threads.
+"""
+
+import asyncio
+import time
+
+import pytest
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from unittest.mock import patch
+
+from careplan.async_worker import AsyncCarePlanWorker, claim_pending
+from careplan.models import CarePlan, Patient
+from tests.test_coalesce import FakePubSub, FakeRedis
+
+
+def make_plans(n):
+    ids = []
+    for i in range(n):
+        patient = Patient.objects.create(
+            first_name=f'Patient{i}', last_name='Doe', date_of_birth='1950-01-01',
+            medications='Aspirin 81mg',
+        )
+        ids.append(CarePlan.objects.create(patient=patient).id)
+    return ids
+
+
+def run_until_done(worker):
+    async def main():
+        stop = asyncio.Event()
+        runner = asyncio.create_task(worker.run(stop))
+        deadline = time.monotonic() + 10  # a plan stuck 'processing' fails the test instead of hanging it
+        while await sync_to_async(
+            CarePlan.objects.filter(status__in=CarePlan.ACTIVE_STATUSES).exists
+        )():
+            assert time.monotonic() < deadline, 'plans still active'
+            await asyncio.sleep(0.02)
+        stop.set()
+        await runner
+
+    asyncio.run(main())
+
+
+@pytest.mark.django_db(transaction=True)
+def test_claim_pending_takes_oldest_and_marks_processing():
+    ids = make_plans(3)
+
+    claimed = claim_pending(2)
+
+    assert claimed == ids[:2]
+    assert list(CarePlan.objects.order_by('id').values_list('status', flat=True)) == [
+        'processing', 'processing', 'pending',
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_runs_generations_concurrently_up_to_the_cap():
+    make_plans(6)
+    in_flight = peak = 0
+
+    async def fake_llm(**kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.1)
+        in_flight -= 1
+        return 'plan text'
+
+    with patch('careplan.async_worker.acall_llm', side_effect=fake_llm):
+        run_until_done(AsyncCarePlanWorker(concurrency=4, poll_interval=0.01))
+
+    assert peak == 4
+    assert set(CarePlan.objects.values_list('status', flat=True)) == {'completed'}
+
+
+@pytest.mark.django_db(transaction=True)
+def test_retries_then_fails_on_timeout():
+    make_plans(1)
+    calls = 0
+
+    async def slow_llm(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(10)
+
+    worker = AsyncCarePlanWorker(task_timeout=0.05, max_retries=2, poll_interval=0.01)
+    with patch('careplan.async_worker.acall_llm', side_effect=slow_llm), \
+            patch.object(worker, 'backoff', return_value=0):
+        run_until_done(worker)
+
+    assert calls == 3
+    assert CarePlan.objects.get().status == 'failed'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_error_outside_the_llm_call_fails_the_plan():
+    make_plans(1)
+
+    worker = AsyncCarePlanWorker(poll_interval=0.01)
+    with patch('careplan.generation.complete_from_cache', side_effect=RuntimeError('cache down')):
+        run_until_done(worker)
+
+    plan = CarePlan.objects.get()
+    assert plan.status == 'failed'
+    assert 'cache down' in plan.care_plan_text
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_save_does_not_call_the_llm_again():
+    make_plans(1)
+    calls = 0
+
+    async def fake_llm(**kwargs):
+        nonlocal calls
+        calls += 1
+        return 'the plan'
+
+    worker = AsyncCarePlanWorker(poll_interval=0.01)
+    with patch('careplan.async_worker.acall_llm', side_effect=fake_llm), \
+            patch('careplan.generation.mark_completed', side_effect=RuntimeError('save failed')):
+        run_until_done(worker)
+
+    assert calls == 1
+    assert CarePlan.objects.get().status == 'failed'
+
+
+class PollingPubSub(FakePubSub):
+    def get_message(self, timeout):
+        deadline = time.monotonic() + timeout
+        while True:
+            message = super().get_message(timeout)
+            if message is not None or time.monotonic() >= deadline:
+                return message
+            time.sleep(0.01)
+
+
+class DeliveringRedis(FakeRedis):
+    """Published messages reach subscribers, which wait for them like real pub/sub."""
+
+    def publish(self, channel, message):
+        self.channels.setdefault(channel, []).append(message)
+        return super().publish(channel, message)
+
+    def pubsub(self, ignore_subscribe_messages):
+        return PollingPubSub(self)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identical_plans_share_one_llm_call_without_waiting_out_the_lease(settings):
+    settings.CAREPLAN_COALESCE_LEASE_SECONDS = 3
+    make_plans(2)
+    calls = 0
+
+    async def fake_llm(**kwargs):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return 'shared plan'
+
+    cache.clear()
+    start = time.monotonic()
+    with patch('careplan.coalesce.get_redis', return_value=DeliveringRedis()), \
+            patch('careplan.generation.get_openai_api_key', return_value='sk-test'), \
+            patch('careplan.async_worker.acall_llm', side_effect=fake_llm):
+        run_until_done(AsyncCarePlanWorker(concurrency=2, poll_interval=0.01))
+    cache.clear()
+
+    assert time.monotonic() - start < 2
+    assert calls == 1
+    assert set(CarePlan.objects.values_list('care_plan_text', flat=True)) == {'shared plan'}
@@ -0,0 +1,109 @@
+"""
+Tests for bulk care plan submission (POST /api/generate/bulk/).
+"""
+
+import json
+
+import pytest
+from unittest.mock import patch
+
+from careplan.models import CarePlan, Patient
+
+
+def resident(i, **overrides):
+    return {
+        'patient_first_name': f'Resident{i}',
+        'patient_last_name': 'Smith',
+        'date_of_birth': '1940-01-15',
+        'medications': 'Metformin 500mg',
+        **overrides,
+    }
+
+
+def post_bulk(client, body, content_type='application/json'):
+    with patch('careplan.services.enqueue_careplans') as mock_enqueue:
+        response = client.post('/api/generate/bulk/', data=body, content_type=content_type)
+    return response, mock_enqueue
+
+
+@pytest.mark.django_db
+def test_bulk_json_array_creates_patients_and_plans(client):
+    response, mock_enqueue = post_bulk(client, json.dumps([resident(i) for i in range(5)]))
+
+    assert response.status_code == 202
+    data = response.json()
+    assert data['accepted'] == 5
+    assert [r['index'] for r in data['results']] == list(range(5))
+    assert CarePlan.objects.filter(status='pending').count() == 5
+    assert Patient.objects.get(first_name='Resident0').medications_canonical == 'metformin 500mg'
+    mock_enqueue.assert_called_once_with([r['id'] for r in data['results']])
+
+
+@pytest.mark.django_db
+def test_bulk_ndjson(client):
+    body = '\n'.join(json.dumps(resident(i)) for i in range(3)) + '\n'
+
+    response, _ = post_bulk(client, body, content_type='application/x-ndjson')
+
+    assert response.json()['accepted'] == 3
+
+
+@pytest.mark.django_db
+def test_bulk_updates_existing_patient(client):
+    Patient.objects.create(
+        first_name='Resident0', last_name='Smith', date_of_birth='1940-01-15', medications='Aspirin',
+    )
+
+    post_bulk(client, json.dumps([resident(0, medications='Lisinopril 10mg')]))
+
+    patient = Patient.objects.get(first_name='Resident0')
+    assert patient.medications == 'Lisinopril 10mg'
+    assert patient.medications_canonical == 'lisinopril 10mg'
+    assert Patient.objects.count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_reports_per_item_errors(client):
+    post_bulk(client, json.dumps([resident(0)]))  # Resident0 now has an active plan
+
+    items = [
+        resident(0),
+        resident(1),
+        resident(1),
+        {'patient_first_name': 'NoMeds'},
+        resident(2, date_of_birth='15/01/1940'),
+    ]
+    response, mock_enqueue = post_bulk(client, json.dumps(items))
+
+    results = response.json()['results']
+    assert results[0]['error']['code'] == 'duplicate_active_careplan'
+    assert results[1]['status'] == 'pending'
+    assert results[2]['error']['code'] == 'duplicate_in_request'
+    assert results[3]['error']['code'] == 'missing_fields'
+    assert results[4]['error']['code'] == 'invalid_date'
+    mock_enqueue.assert_called_once_with([results[1]['id']])
+
+
+@pytest.mark.django_db
+def test_bulk_query_count_does_not_grow_with_batch(client, django_assert_max_num_queries):
+    with django_assert_max_num_queries(5):
+        response, _ = post_bulk(client, json.dumps([resident(i) for i in range(50)]))
+
+    assert response.json()['accepted'] == 50
+
+
+@pytest.mark.django_db
+def test_bulk_rejects_oversized_batch(client, settings):
+    settings.CAREPLAN_BULK_MAX_ITEMS = 2
+
+    response, _ = post_bulk(client, json.dumps([resident(i) for i in range(3)]))
+
+    assert response.status_code == 400
+    assert response.json()['code'] == 'bulk_too_large'
+
+
+@pytest.mark.django_db
+def test_bulk_rejects_non_array(client):
+    response, _ = post_bulk(client, json.dumps(resident(0)))
+
+    assert response.status_code == 400
@@ -0,0 +1,171 @@
+"""
+Tests for single-flight coalescing of identical generations (careplan/coalesce.py).
+
+A small in-memory Redis stands in for leases and the done channel.
+"""
+
+import json
+
+import pytest
+from django.core.cache import cache
+from unittest.mock import patch
+
+from careplan import coalesce, llm_cache
+from careplan.models import CarePlan, Patient
+from careplan.tasks import generate_careplan_task
+
+
+class FakePubSub:
+    def __init__(self, redis):
+        self.redis = redis
+        self.channel = None
+
+    def subscribe(self, channel):
+        self.channel = channel
+
+    def get_message(self, timeout):
+        queue = self.redis.channels.get(self.channel, [])
+        if queue:
+            return {'type': 'message', 'data': queue.pop(0)}
+        return None
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.channels = {}
+        self.published = []
+
+    def set(self, key, value, nx=False, px=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def pexpire(self, key, ms):
+        return key in self.values
+
+    def exists(self, key):
+        return int(key in self.values)
+
+    def delete(self, key):
+        return int(self.values.pop(key, None) is not None)
+
+    def publish(self, channel, message):
+        self.published.append((channel, json.loads(message)))
+        return 0
+
+    def eval(self, script, numkeys, key, owner):
+        return self.delete(key) if self.values.get(key) == owner else 0
+
+    def pubsub(self, ignore_subscribe_messages):
+        return FakePubSub(self)
+
+
+@pytest.fixture
+def redis():
+    fake = FakeRedis()
+    cache.clear()
+    with patch('careplan.coalesce.get_redis', return_value=fake):
+        yield fake
+    cache.clear()
+
+
+def make_plan(first_name):
+    patient = Patient.objects.create(
+        first_name=first_name, last_name='Resident', date_of_birth='1940-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='Diabetes',
+    )
+    return CarePlan.objects.create(patient=patient)
+
+
+@pytest.mark.django_db
+def test_first_task_leads_and_others_follow(redis):
+    leader = coalesce.join(make_plan('Ann'))
+    follower = coalesce.join(make_plan('Bob'))
+
+    assert leader.leader
+    assert not follower.leader
+    assert leader.lease_key == follower.lease_key
+
+
+@pytest.mark.django_db
+def test_leader_rejoining_after_retry_keeps_the_lease(redis):
+    plan = make_plan('Ann')
+    coalesce.join(plan)
+
+    assert coalesce.join(plan).leader
+
+
+@pytest.mark.django_db
+def test_follower_adopts_leader_text(redis):
+    leader = coalesce.join(make_plan('Ann'))
+    follower_plan = make_plan('Bob')
+    follower = coalesce.join(follower_plan)
+
+    redis.channels[follower.channel] = [json.dumps({'status': 'completed', 'text': 'shared plan'})]
+
+    assert coalesce.wait_for_leader(follower, follower_plan, timeout=5) == 'shared plan'
+    coalesce.finish(leader, 'shared plan')
+    assert leader.lease_key not in redis.values
+
+
+@pytest.mark.django_db
+def test_follower_of_failed_leader_generates_alone(redis):
+    follower_plan = make_plan('Bob')
+    coalesce.join(make_plan('Ann'))
+    follower = coalesce.join(follower_plan)
+
+    redis.channels[follower.channel] = [json.dumps({'status': 'failed'})]
+
+    assert coalesce.wait_for_leader(follower, follower_plan, timeout=5) is None
+
+
+@pytest.mark.django_db
+def test_follower_reads_cache_when_leader_finished_before_subscribe(redis):
+    leader = coalesce.join(make_plan('Ann'))
+    follower_plan = make_plan('Bob')
+    follower = coalesce.join(follower_plan)
+
+    llm_cache.store_careplan('Metformin 500mg', '', 'Diabetes', 'shared plan')
+    coalesce.finish(leader, 'shared plan')
+
+    assert coalesce.wait_for_leader(follower, follower_plan, timeout=5) == 'shared plan'
+
+
+@pytest.mark.django_db
+def test_follower_task_completes_its_own_plan_without_llm_call(redis):
+    coalesce.join(make_plan('Ann'))
+    plan = make_plan('Bob')
+    channel = f'{coalesce.LEASE_PREFIX}:done:' + llm_cache.profile_hash('Metformin 500mg', '', 'Diabetes')
+    redis.channels[channel] = [json.dumps({'status': 'completed', 'text': 'shared plan'})]
+
+    with patch('careplan.generation.get_openai_api_key', return_value='sk-test'), \
+            patch('careplan.tasks.call_llm') as mock_llm, \
+            patch('careplan.tasks.stream_llm') as mock_stream:
+        generate_careplan_task.apply(args=[plan.id])
+
+    plan.refresh_from_db()
+    assert plan.status == 'completed'
+    assert plan.care_plan_text == 'shared plan'
+    mock_llm.assert_not_called()
+    mock_stream.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_leader_task_publishes_result(redis, settings):
+    settings.CAREPLAN_LLM_STREAMING = False
+    plan = make_plan('Ann')
+
+    with patch('careplan.generation.get_openai_api_key', return_value='sk-test'), \
+            patch('careplan.tasks.call_llm', return_value='fresh plan'):
+        generate_careplan_task.apply(args=[plan.id])
+
+    assert redis.published[-1][1] == {'status': 'completed', 'text': 'fresh plan'}
+    assert not redis.values
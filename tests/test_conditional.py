@@ -0,0 +1,200 @@
+"""
+Tests for ETag / Last-Modified conditional GETs on the read endpoints
+(careplan/etags.py, careplan/conditional.py).
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+
+from careplan import etags, generation, services
+from careplan.models import CarePlan, Patient
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def plan(db):
+    patient = Patient.objects.create(
+        first_name='Ann', last_name='Resident', date_of_birth='1940-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    return CarePlan.objects.create(patient=patient, status='completed', care_plan_text='## Plan')
+
+
+def no_text_loaded(ctx):
+    return not any('care_plan_text' in q['sql'] for q in ctx.captured_queries)
+
+
+# ── etags ─────────────────────────────────────────────────
+
+def test_careplan_etag_changes_with_updated_at():
+    moment = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+
+    assert etags.careplan_etag(7, moment) == etags.careplan_etag(7, moment.replace(tzinfo=None))
+    assert etags.careplan_etag(7, moment) != etags.careplan_etag(7, moment + timedelta(microseconds=1))
+    assert etags.careplan_etag(7, moment) != etags.careplan_etag(8, moment)
+
+
+def test_not_modified_rules():
+    moment = datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc)
+    etag = etags.careplan_etag(7, moment)
+    header_date = etags.http_date(moment)
+
+    assert header_date == 'Fri, 02 Jan 2026 03:04:05 GMT'
+    assert etags.not_modified(f'"x", {etag}', None, etag, moment)
+    assert etags.not_modified(f'W/{etag}', None, etag, moment)
+    assert etags.not_modified('*', None, etag, moment)
+    assert etags.not_modified(None, header_date, etag, moment)
+    assert not etags.not_modified(None, header_date, etag, moment + timedelta(seconds=1))
+    # If-None-Match wins over If-Modified-Since
+    assert not etags.not_modified('"other"', header_date, etag, moment)
+    assert not etags.not_modified(None, 'garbage', etag, moment)
+
+
+# ── download ──────────────────────────────────────────────
+
+def test_download_sends_validators_and_honours_them(client, plan):
+    url = f'/api/careplans/{plan.id}/download/'
+    first = client.get(url)
+    assert first['ETag'] == etags.careplan_etag(plan.id, plan.updated_at)
+    assert first['Last-Modified'] == etags.http_date(plan.updated_at)
+
+    with CaptureQueriesContext(connection) as ctx:
+        by_etag = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert len(ctx.captured_queries) == 1
+    assert no_text_loaded(ctx)
+
+    by_date = client.get(url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified'])
+    assert by_etag.status_code == by_date.status_code == 304
+    assert by_etag.content == b''
+
+
+def test_download_changes_after_an_update(client, plan):
+    url = f'/api/careplans/{plan.id}/download/'
+    etag = client.get(url)['ETag']
+
+    plan.care_plan_text = '## Revised'
+    plan.save()
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert b'## Revised' in response.content
+
+
+def resubmit(plan, medications):
+    """Submit the plan's patient again with new medications (plan is finished, so allowed)."""
+    patient = plan.patient
+    with patch('careplan.tasks.generate_careplan_task'):
+        services.create_careplan({
+            'patient_first_name': patient.first_name,
+            'patient_last_name': patient.last_name,
+            'date_of_birth': patient.date_of_birth,
+            'medications': medications,
+        })
+
+
+def test_download_changes_when_the_patient_is_updated(client, plan):
+    url = f'/api/careplans/{plan.id}/download/'
+    etag = client.get(url)['ETag']
+
+    resubmit(plan, 'Metformin 1000mg')
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert b'Metformin 1000mg' in response.content
+
+
+def test_unchanged_resubmit_keeps_the_etag(client, plan):
+    url = f'/api/careplans/{plan.id}/download/'
+    etag = client.get(url)['ETag']
+
+    resubmit(plan, plan.patient.medications)
+
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+
+
+# ── status ────────────────────────────────────────────────
+
+def test_status_cache_miss_answers_304_from_updated_at(client, plan):
+    url = f'/api/careplans/{plan.id}/status/'
+    first = client.get(url)
+    assert first['ETag'] == etags.careplan_etag(plan.id, plan.updated_at)
+    assert first['Last-Modified']
+    cache.clear()
+
+    with CaptureQueriesContext(connection) as ctx:
+        response = client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+
+    assert response.status_code == 304
+    assert response['ETag'] == first['ETag']
+    assert no_text_loaded(ctx)
+
+
+def test_status_etag_follows_generation(client, plan):
+    url = f'/api/careplans/{plan.id}/status/'
+    etag = client.get(url)['ETag']
+
+    generation.mark_failed(generation.load_careplan(plan.id), 'boom')
+
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == 200
+    assert response.json()['status'] == 'failed'
+
+
+# ── list ──────────────────────────────────────────────────
+
+def test_list_is_not_modified_until_a_plan_on_the_page_changes(client, plan):
+    etag = client.get('/api/careplans/')['ETag']
+
+    with CaptureQueriesContext(connection) as ctx:
+        unchanged = client.get('/api/careplans/', HTTP_IF_NONE_MATCH=etag)
+    assert unchanged.status_code == 304
+    assert len(ctx.captured_queries) == 1
+
+    plan.status = 'failed'
+    plan.save()
+    assert client.get('/api/careplans/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+def test_list_etag_depends_on_params_and_new_plans(client, plan):
+    etag = client.get('/api/careplans/')['ETag']
+
+    assert client.get('/api/careplans/', {'fields': 'id'})['ETag'] != etag
+
+    other = Patient.objects.create(
+        first_name='Bob', last_name='Resident', date_of_birth='1941-01-15',
+        medications='Aspirin', allergies='', health_conditions='',
+    )
+    CarePlan.objects.create(patient=other)
+    assert client.get('/api/careplans/', HTTP_IF_NONE_MATCH=etag).status_code == 200
+
+
+@pytest.mark.parametrize('params', [{}, {'limit': 1}, {'query': 'metformin'}, {'query': 'nobody'}])
+def test_page_validators_match_the_validator_query(plan, params):
+    other = Patient.objects.create(
+        first_name='Bob', last_name='Resident', date_of_birth='1941-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    CarePlan.objects.create(patient=other)
+
+    _, _, validators = services.list_careplans_page(**params, variant='v')
+
+    assert validators == services.list_careplans_validators(**params, variant='v')
+
+
+@pytest.mark.django_db
+def test_empty_list_has_etag_but_no_last_modified(client):
+    response = client.get('/api/careplans/')
+
+    assert response['ETag']
+    assert 'Last-Modified' not in response
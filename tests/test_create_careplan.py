@@ -0,0 +1,71 @@
+"""
+Tests for the single-statement create_careplan (patient upsert + guarded insert).
+
+1. One query per submit, patient upserted
+2. Concurrent submits for the same patient: exactly one care plan is created
+"""
+
+import threading
+
+import pytest
+from django.db import connections
+from unittest.mock import patch
+
+from careplan.exceptions import BlockError
+from careplan.models import CarePlan, Patient
+from careplan.services import create_careplan
+
+PAYLOAD = {
+    'patient_first_name': 'John',
+    'patient_last_name': 'Doe',
+    'date_of_birth': '1990-01-15',
+    'medications': 'Metformin 500mg',
+}
+
+
+@pytest.mark.django_db
+def test_create_is_one_round_trip(django_assert_num_queries):
+    with patch('careplan.tasks.generate_careplan_task'), django_assert_num_queries(1):
+        result = create_careplan(PAYLOAD)
+
+    plan = CarePlan.objects.select_related('patient').get(id=result['id'])
+    assert plan.status == 'pending'
+    assert plan.patient.medications_canonical == 'metformin 500mg'
+
+
+@pytest.mark.django_db
+def test_resubmit_updates_patient_after_plan_finished():
+    with patch('careplan.tasks.generate_careplan_task'):
+        first = create_careplan(PAYLOAD)
+        CarePlan.objects.filter(id=first['id']).update(status='completed')
+        second = create_careplan({**PAYLOAD, 'medications': 'Lisinopril 10mg'})
+
+    assert second['id'] != first['id']
+    assert Patient.objects.get().medications == 'Lisinopril 10mg'
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_submits_create_one_plan():
+    barrier = threading.Barrier(8)
+    outcomes = []
+
+    def submit():
+        barrier.wait()
+        try:
+            create_careplan(PAYLOAD)
+            outcomes.append('created')
+        except BlockError:
+            outcomes.append('blocked')
+        finally:
+            connections.close_all()
+
+    with patch('careplan.tasks.generate_careplan_task'):
+        threads = [threading.Thread(target=submit) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+    assert sorted(outcomes) == ['blocked'] * 7 + ['created']
+    assert Patient.objects.count() == 1
+    assert CarePlan.objects.count() == 1
@@ -0,0 +1,133 @@
+"""
+Tests for the Server-Sent Events endpoint (careplan/events.py).
+
+1. Without Redis, the stream falls back to DB checks and ends at a final status
+2. With Redis, published deltas and status changes are relayed as SSE frames,
+   minus text the first snapshot already had
+"""
+
+import json
+
+import pytest
+from django.db import connection
+from unittest.mock import patch
+
+from careplan import events
+from careplan.models import CarePlan, Patient
+from careplan.streaming import ThrottledTextWriter
+
+
+@pytest.fixture
+def plan(db):
+    patient = Patient.objects.create(
+        first_name='John', last_name='Doe', date_of_birth='1990-01-15',
+        medications='Metformin 500mg',
+    )
+    return CarePlan.objects.create(patient=patient, status='processing')
+
+
+def read_frames(response):
+    body = b''.join(response.streaming_content).decode()
+    frames = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n') if not line.startswith(':'))
+        if lines:
+            frames.append((lines['event'], json.loads(lines['data'])))
+    return frames
+
+
+class FakePubSub:
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    def subscribe(self, channel):
+        self.channel = channel
+
+    def get_message(self, timeout):
+        return {'data': json.dumps(self.messages.pop(0))} if self.messages else None
+
+    def close(self):
+        pass
+
+
+class FakeRedis:
+    def __init__(self, messages):
+        self.messages = messages
+
+    def pubsub(self, ignore_subscribe_messages):
+        return FakePubSub(self.messages)
+
+
+def test_finished_plan_sends_one_snapshot(client, plan):
+    CarePlan.objects.filter(id=plan.id).update(status='completed', care_plan_text='done')
+
+    response = client.get(f'/api/careplans/{plan.id}/events/')
+
+    assert response['Content-Type'] == 'text/event-stream'
+    assert read_frames(response) == [
+        ('status', {'id': plan.id, 'status': 'completed', 'care_plan_text': 'done'}),
+    ]
+
+
+def test_relays_published_events_until_final_status(client, plan):
+    published = [
+        {'event': 'delta', 'data': {'id': plan.id, 'status': 'partial', 'offset': 0, 'text': '## DANGER'}},
+        {'event': 'status', 'data': {'id': plan.id, 'status': 'completed', 'care_plan_text': '## DANGER'}},
+    ]
+
+    with patch('careplan.events.get_redis', return_value=FakeRedis(published)):
+        response = client.get(f'/api/careplans/{plan.id}/events/')
+        frames = read_frames(response)
+
+    assert [event for event, _ in frames] == ['status', 'delta', 'status']
+    assert frames[0][1]['status'] == 'processing'
+    assert frames[1][1]['text'] == '## DANGER'
+    assert frames[2][1]['status'] == 'completed'
+
+
+def test_drops_deltas_the_snapshot_already_has(client, plan):
+    # Published after the subscribe but before the snapshot was read
+    CarePlan.objects.filter(id=plan.id).update(status='partial', care_plan_text='## DANGER\nNo')
+    published = [
+        {'event': 'delta', 'data': {'id': plan.id, 'status': 'partial', 'offset': 0, 'text': '## DANGER'}},
+        {'event': 'delta', 'data': {'id': plan.id, 'status': 'partial', 'offset': 9, 'text': '\nNo alcohol'}},
+        {'event': 'delta', 'data': {'id': plan.id, 'status': 'partial', 'offset': 20, 'text': '.'}},
+        {'event': 'status', 'data': {'id': plan.id, 'status': 'completed', 'care_plan_text': '## DANGER\nNo alcohol.'}},
+    ]
+
+    with patch('careplan.events.get_redis', return_value=FakeRedis(published)):
+        frames = read_frames(client.get(f'/api/careplans/{plan.id}/events/'))
+
+    assert [(event, data.get('offset'), data.get('text')) for event, data in frames[1:3]] == [
+        ('delta', 12, ' alcohol'),
+        ('delta', 20, '.'),
+    ]
+    snapshot, (_, trimmed), (_, last) = frames[0][1], frames[1], frames[2]
+    assert snapshot['care_plan_text'] + trimmed['text'] + last['text'] == frames[3][1]['care_plan_text']
+
+
+def test_writer_publishes_delta_offsets(plan):
+    writer = ThrottledTextWriter(plan.id, flush_tokens=1)
+    with patch('careplan.streaming.events.publish') as publish:
+        writer.write('## DANGER')
+        writer.write('\nNo alcohol')
+
+    assert [c.args[2] for c in publish.call_args_list] == [
+        {'status': 'partial', 'offset': 0, 'text': '## DANGER'},
+        {'status': 'partial', 'offset': 9, 'text': '\nNo alcohol'},
+    ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_snapshot_releases_the_db_connection():
+    patient = Patient.objects.create(
+        first_name='John', last_name='Doe', date_of_birth='1990-01-15', medications='Metformin 500mg',
+    )
+    plan = CarePlan.objects.create(patient=patient, status='processing')
+
+    assert events._snapshot(plan.id)['status'] == 'processing'
+    assert connection.connection is None
+
+
+def test_publish_without_redis_is_a_noop():
+    events.publish(1, 'status', {'status': 'processing'})  # must not raise
@@ -0,0 +1,145 @@
+"""
+Tests for the streaming care plan export (GET /api/careplans/export/) and
+ZIP download (GET /api/careplans/download/).
+"""
+
+import csv
+import io
+import json
+import zipfile
+from datetime import timedelta
+
+import pytest
+from django.db.models.query import QuerySet
+from django.utils import timezone
+from unittest.mock import patch
+
+from careplan.models import CarePlan, Patient
+from careplan.serializers import serialize_careplan
+
+
+def make_plan(first_name, status='completed', text='', days_ago=0):
+    patient = Patient.objects.create(
+        first_name=first_name, last_name='Resident', date_of_birth='1940-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    plan = CarePlan.objects.create(patient=patient, status=status, care_plan_text=text)
+    if days_ago:
+        CarePlan.objects.filter(pk=plan.pk).update(created_at=timezone.now() - timedelta(days=days_ago))
+        plan.refresh_from_db()
+    return plan
+
+
+def read(response):
+    assert response.streaming
+    return b''.join(response.streaming_content).decode()
+
+
+@pytest.mark.django_db
+def test_ndjson_rows_match_serialize_careplan(client):
+    plans = [make_plan('Ann', text='## Plan\n- rest, fluids', days_ago=2), make_plan('Bob', status='failed')]
+
+    response = client.get('/api/careplans/export/')
+
+    assert response.status_code == 200
+    assert response['Content-Type'] == 'application/x-ndjson; charset=utf-8'
+    rows = [json.loads(line) for line in read(response).splitlines()]
+    assert rows == [serialize_careplan(p) for p in plans]
+
+
+@pytest.mark.django_db
+def test_csv_has_header_and_quotes_multiline_text(client):
+    plan = make_plan('Ann', text='## Plan\n- rest, "fluids"')
+
+    response = client.get('/api/careplans/export/', {'format': 'csv'})
+
+    assert response['Content-Disposition'] == 'attachment; filename="careplans.csv"'
+    rows = list(csv.DictReader(io.StringIO(read(response))))
+    assert rows == [{k: str(v) for k, v in serialize_careplan(plan).items()}]
+
+
+@pytest.mark.django_db
+def test_filters_by_status_and_date(client):
+    make_plan('Old', days_ago=10)
+    recent = make_plan('Recent', days_ago=3)
+    make_plan('Failed', status='failed', days_ago=3)
+    make_plan('Today')
+
+    since = (timezone.now() - timedelta(days=5)).date().isoformat()
+    until = (timezone.now() - timedelta(days=1)).date().isoformat()
+    response = client.get('/api/careplans/export/', {'status': 'completed,partial', 'from': since, 'to': until})
+
+    assert [json.loads(line)['id'] for line in read(response).splitlines()] == [recent.id]
+
+
+@pytest.mark.django_db
+def test_reads_through_a_chunked_iterator(client, settings):
+    settings.CAREPLAN_EXPORT_CHUNK_SIZE = 2
+    for name in ('Ann', 'Bob', 'Cat'):
+        make_plan(name)
+
+    with patch.object(QuerySet, 'iterator', autospec=True, side_effect=QuerySet.iterator) as spy:
+        lines = read(client.get('/api/careplans/export/')).splitlines()
+
+    assert len(lines) == 3
+    assert spy.call_args.kwargs == {'chunk_size': 2}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, code', [
+    ({'format': 'xml'}, 'invalid_format'),
+    ({'status': 'done'}, 'invalid_status'),
+    ({'from': 'yesterday'}, 'invalid_date'),
+])
+def test_bad_params_are_rejected_before_streaming(client, params, code):
+    response = client.get('/api/careplans/export/', params)
+
+    assert response.status_code == 400
+    assert response.json()['code'] == code
+
+
+# ── ZIP download ──────────────────────────────────────────
+
+def read_zip(response):
+    assert response.streaming
+    chunks = list(response.streaming_content)
+    return zipfile.ZipFile(io.BytesIO(b''.join(chunks))), chunks
+
+
+@pytest.mark.django_db
+def test_zip_of_ids_uses_single_download_format(client):
+    from careplan.services import format_careplan_download
+    plans = [make_plan(name, text=f'plan for {name}') for name in ('Ann', 'Bob', 'Cat')]
+
+    response = client.get('/api/careplans/download/', {'ids': f'{plans[2].id},{plans[0].id}'})
+
+    assert response['Content-Type'] == 'application/zip'
+    archive, _ = read_zip(response)
+    assert archive.namelist() == [f'careplan_{plans[0].id}.txt', f'careplan_{plans[2].id}.txt']
+    assert archive.read(f'careplan_{plans[0].id}.txt').decode() == format_careplan_download(plans[0])
+    assert archive.testzip() is None
+
+
+@pytest.mark.django_db
+def test_zip_by_filter_is_written_entry_by_entry(client):
+    for name in ('Ann', 'Bob', 'Cat'):
+        make_plan(name)
+    make_plan('Dan', status='failed')
+
+    archive, chunks = read_zip(client.get('/api/careplans/download/', {'status': 'completed'}))
+
+    assert len(archive.namelist()) == 3
+    assert len(chunks) == 4  # one per entry, then the central directory
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, code', [
+    ({}, 'missing_selection'),
+    ({'ids': '1,x'}, 'invalid_ids'),
+    ({'ids': '999999'}, 'unknown_ids'),
+])
+def test_zip_rejects_bad_selection(client, params, code):
+    response = client.get('/api/careplans/download/', params)
+
+    assert response.status_code == 400
+    assert response.json()['code'] == code
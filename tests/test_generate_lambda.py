@@ -0,0 +1,156 @@
+"""
+Tests for the SQS batch generate_careplan Lambda, against the raw-SQL schema
+(lambdas/init_tables.sql) in the test database, with a stand-in LLM.
+"""
+
+import json
+import threading
+import time
+
+import pytest
+
+import generate_careplan
+
+
+def statuses(conn):
+    with conn.cursor() as cur:
+        cur.execute("SELECT id, status, care_plan_text FROM careplan ORDER BY id")
+        return {row[0]: (row[1], row[2]) for row in cur.fetchall()}
+
+
+def test_batch_completes_every_plan(lambda_db, add_plans, sqs_event, monkeypatch):
+    ids = add_plans(5)
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: f"plan for {plan['first_name']}")
+
+    result = generate_careplan.lambda_handler(sqs_event(ids), None)
+
+    assert result == {'batchItemFailures': []}
+    assert statuses(lambda_db) == {
+        careplan_id: ('completed', f'plan for Resident{i}') for i, careplan_id in enumerate(ids)
+    }
+
+
+def test_mock_mode_includes_local_danger_screen(lambda_db, add_plans, sqs_event, monkeypatch):
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+    [careplan_id] = add_plans(1)
+
+    generate_careplan.lambda_handler(sqs_event([careplan_id]), None)
+
+    status, text = statuses(lambda_db)[careplan_id]
+    assert status == 'completed'
+    assert '**ibuprofen + warfarin**' in text
+
+
+def test_only_failed_messages_are_retried(lambda_db, add_plans, sqs_event, monkeypatch):
+    ids = add_plans(3)
+
+    def flaky_llm(plan):
+        if plan['first_name'] == 'Resident1':
+            raise TimeoutError('LLM timed out')
+        return 'ok'
+
+    monkeypatch.setattr(generate_careplan, 'call_llm', flaky_llm)
+
+    result = generate_careplan.lambda_handler(sqs_event(ids), None)
+
+    assert result == {'batchItemFailures': [{'itemIdentifier': f'msg-{ids[1]}'}]}
+    current = statuses(lambda_db)
+    assert current[ids[0]][0] == 'completed'
+    assert current[ids[1]][0] == 'pending'
+    assert current[ids[2]][0] == 'completed'
+
+
+def test_last_receive_marks_plan_failed(lambda_db, add_plans, sqs_event, monkeypatch):
+    [careplan_id] = add_plans(1)
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: (_ for _ in ()).throw(TimeoutError('down')))
+
+    result = generate_careplan.lambda_handler(sqs_event([careplan_id], receive_count=3), None)
+
+    # Still reported, so SQS moves the message to the DLQ
+    assert result == {'batchItemFailures': [{'itemIdentifier': f'msg-{careplan_id}'}]}
+    assert statuses(lambda_db)[careplan_id] == ('failed', 'down')
+
+
+def test_redelivered_completed_plan_is_skipped(lambda_db, add_plans, sqs_event, monkeypatch):
+    [careplan_id] = add_plans(1)
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: 'first')
+    generate_careplan.lambda_handler(sqs_event([careplan_id]), None)
+
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: 'second')
+    result = generate_careplan.lambda_handler(sqs_event([careplan_id]), None)
+
+    assert result == {'batchItemFailures': []}
+    assert statuses(lambda_db)[careplan_id] == ('completed', 'first')
+
+
+def test_bad_message_is_reported_without_failing_the_batch(lambda_db, add_plans, sqs_event, monkeypatch):
+    [careplan_id] = add_plans(1)
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: 'ok')
+    event = sqs_event([careplan_id])
+    event['Records'].append({'messageId': 'garbage', 'body': 'not json', 'attributes': {}})
+
+    result = generate_careplan.lambda_handler(event, None)
+
+    assert result == {'batchItemFailures': [{'itemIdentifier': 'garbage'}]}
+    assert statuses(lambda_db)[careplan_id][0] == 'completed'
+
+
+def test_llm_calls_run_concurrently(add_plans, sqs_event, monkeypatch):
+    ids = add_plans(10)
+    in_flight = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def slow_llm(plan):
+        with lock:
+            in_flight.append(plan['id'])
+            peak[0] = max(peak[0], len(in_flight))
+        time.sleep(0.2)
+        with lock:
+            in_flight.remove(plan['id'])
+        return 'ok'
+
+    monkeypatch.setattr(generate_careplan, 'call_llm', slow_llm)
+
+    start = time.monotonic()
+    generate_careplan.lambda_handler(sqs_event(ids), None)
+    elapsed = time.monotonic() - start
+
+    assert peak[0] == 10
+    assert elapsed < 1.0  # 10 sequential calls would take 2s
+
+
+def test_message_trace_is_parent_of_llm_span(add_plans, sqs_event, monkeypatch):
+    from careplan import tracing
+
+    [careplan_id] = add_plans(1)
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: 'plan')
+    event = sqs_event([careplan_id])
+    event['Records'][0]['body'] = json.dumps({
+        'careplan_id': careplan_id, 'trace': {'trace_id': 'c' * 32, 'span_id': 'd' * 16},
+    })
+    spans = []
+    tracing.add_sink(spans.append)
+    try:
+        generate_careplan.lambda_handler(event, None)
+    finally:
+        tracing.remove_sink(spans.append)
+
+    llm = next(span for span in spans if span.name == 'llm.call')
+    assert (llm.trace_id, llm.parent_id) == ('c' * 32, 'd' * 16)
+    assert llm.attrs == {'careplan_id': careplan_id}
+
+
+def test_latency_metrics_are_printed_as_emf(add_plans, sqs_event, monkeypatch, capsys):
+    [careplan_id] = add_plans(1)
+    monkeypatch.setattr(generate_careplan, 'call_llm', lambda plan: 'plan')
+    event = sqs_event([careplan_id])
+    event['Records'][0]['body'] = json.dumps({'careplan_id': careplan_id, 'enqueued_at': time.time() - 30})
+
+    generate_careplan.lambda_handler(event, None)
+
+    emf = next(json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"'))
+    names = [metric['Name'] for metric in emf['_aws']['CloudWatchMetrics'][0]['Metrics']]
+    assert names == ['QueueWait', 'Processing', 'EndToEnd']
+    assert 30 <= emf['QueueWait'][0] < 35
+    assert emf['EndToEnd'][0] == pytest.approx(emf['QueueWait'][0] + emf['Processing'][0])
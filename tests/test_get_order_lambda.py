@@ -0,0 +1,127 @@
+"""
+Tests for the get_order Lambda's status cache (lambdas/status_cache.py),
+against the raw-SQL schema with a small in-memory Redis.
+"""
+
+import json
+
+import pytest
+
+import generate_careplan
+import get_order
+import status_cache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.values = {}
+        self.ttls = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        self.ttls[key] = ex
+        return True
+
+    def delete(self, *keys):
+        return sum(self.values.pop(key, None) is not None for key in keys)
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    fake = FakeRedis()
+    monkeypatch.setattr(status_cache, '_get_client', lambda: fake)
+    return fake
+
+
+def get(order_id, etag=None):
+    headers = {'if-none-match': etag} if etag else {}
+    return get_order.lambda_handler({'pathParameters': {'id': str(order_id)}, 'headers': headers}, None)
+
+
+def test_second_get_skips_the_database(add_plans, redis, monkeypatch):
+    [order_id] = add_plans(1)
+    first = get(order_id)
+
+    monkeypatch.setattr(get_order, 'get_connection', lambda: pytest.fail('hit the database'))
+    second = get(order_id)
+
+    assert second['body'] == first['body']
+    assert json.loads(second['body'])['status'] == 'pending'
+    assert redis.ttls[status_cache.make_key(order_id)] == 5
+
+
+def test_matching_etag_gets_304(add_plans, redis):
+    [order_id] = add_plans(1)
+    etag = get(order_id)['headers']['ETag']
+
+    response = get(order_id, etag=etag)
+
+    assert response['statusCode'] == 304
+    assert response['body'] == ''
+    assert response['headers']['ETag'] == etag
+
+
+def test_generation_invalidates_and_terminal_status_is_cached_long(add_plans, sqs_event, redis, monkeypatch):
+    [order_id] = add_plans(1)
+    etag = get(order_id)['headers']['ETag']
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+
+    generate_careplan.lambda_handler(sqs_event([order_id]), None)
+
+    response = get(order_id, etag=etag)
+    assert response['statusCode'] == 200
+    assert json.loads(response['body'])['status'] == 'completed'
+    assert redis.ttls[status_cache.make_key(order_id)] == 24 * 3600
+
+
+def test_works_without_redis(add_plans, monkeypatch):
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    [order_id] = add_plans(1)
+
+    response = get(order_id)
+
+    assert response['statusCode'] == 200
+    assert get(order_id, etag=response['headers']['ETag'])['statusCode'] == 304
+
+
+def test_if_modified_since_on_a_miss_reads_only_updated_at(add_plans, monkeypatch):
+    monkeypatch.delenv('REDIS_URL', raising=False)
+    [order_id] = add_plans(1)
+    first = get(order_id)
+    assert first['headers']['Last-Modified']
+
+    response = get_order.lambda_handler({
+        'pathParameters': {'id': str(order_id)},
+        'headers': {'if-modified-since': first['headers']['Last-Modified']},
+    }, None)
+
+    assert response['statusCode'] == 304
+    assert response['headers']['ETag'] == first['headers']['ETag']
+
+
+def test_status_change_during_a_miss_does_not_leave_a_stale_body(lambda_db, add_plans, redis, monkeypatch):
+    [order_id] = add_plans(1)
+    key = status_cache.make_key(order_id)
+    store = redis.set
+
+    def generate_commits_then_invalidates(*args, **kwargs):
+        # get_order has already read the row; generation commits and drops the key before our set
+        with lambda_db.cursor() as cur:
+            cur.execute(
+                "UPDATE careplan SET status = 'processing', updated_at = clock_timestamp() WHERE id = %s",
+                (order_id,),
+            )
+        redis.delete(key)
+        monkeypatch.setattr(redis, 'set', store)
+        return store(*args, **kwargs)
+
+    monkeypatch.setattr(redis, 'set', generate_commits_then_invalidates)
+    assert json.loads(get(order_id)['body'])['status'] == 'pending'
+
+    assert key not in redis.values
+    assert json.loads(get(order_id)['body'])['status'] == 'processing'
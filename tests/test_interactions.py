@@ -0,0 +1,62 @@
+"""
+Unit tests for the local drug-interaction index (careplan/interactions.py).
+"""
+
+from careplan.interactions import format_danger_section, screen
+from careplan.prompts import build_prompt
+from careplan.services import call_llm
+
+
+def test_finds_medication_lifestyle_conflict():
+    """头孢 + alcohol is flagged, with the patient's own wording."""
+    conflicts = screen('头孢 250mg', '', 'Drinks alcohol every night')
+
+    assert [(c.first, c.second) for c in conflicts] == [('头孢', 'alcohol')]
+    assert 'disulfiram' in conflicts[0].danger
+
+
+def test_negated_lifestyle_is_not_a_conflict():
+    for habits in ('Does not drink alcohol', "Doesn't drink wine", 'Non-drinker', 'Denies alcohol use',
+                   'No alcohol', '不喝酒', '戒酒多年'):
+        assert screen('头孢 250mg', '', habits) == [], habits
+
+
+def test_negation_ends_at_the_clause():
+    conflicts = screen('头孢 250mg', '', 'Does not smoke, but drinks beer on weekends')
+
+    assert [(c.first, c.second) for c in conflicts] == [('头孢', 'beer')]
+    assert len(screen('头孢 250mg', '', '不抽烟，每天喝酒')) == 1
+
+
+def test_prompt_only_asks_for_a_full_cross_check_without_screened_dangers():
+    conflicts = screen('头孢 250mg', '', 'Drinks alcohol every night')
+
+    assert 'Cross-check every medication' in build_prompt('头孢 250mg', '', '', [])
+    assert 'Cross-check every medication' not in build_prompt('头孢 250mg', '', 'Drinks alcohol', conflicts)
+
+
+def test_finds_medication_pair_by_brand_and_generic_name():
+    conflicts = screen('Coumadin 5mg, Advil 200mg')
+
+    assert len(conflicts) == 1
+    assert 'bleeding' in conflicts[0].danger
+
+
+def test_allergy_to_same_drug_family():
+    conflicts = screen('Oxycodone 5mg', 'Codeine')
+
+    assert [(c.first, c.second) for c in conflicts] == [('oxycodone', 'codeine allergy')]
+
+
+def test_no_conflicts():
+    assert screen('Amlodipine 5mg', 'Ibuprofen', 'High Blood Pressure') == []
+    assert 'No critical dangers found.' in format_danger_section([])
+
+
+def test_mock_llm_output_has_deterministic_danger_section(monkeypatch):
+    """Without an API key the DANGER section still comes from the index."""
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+
+    text = call_llm('John Doe', 'Warfarin 5mg, Ibuprofen 200mg', '', '')
+
+    assert text.startswith('## ⚠️ DANGER — Must Read First\n- **ibuprofen + warfarin**')
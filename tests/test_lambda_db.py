@@ -0,0 +1,88 @@
+"""
+Tests for the reusable Lambda DB connection (lambdas/db.py), against the
+local Postgres from settings.
+"""
+
+import os
+import sys
+
+import psycopg2
+import pytest
+from django.conf import settings
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'lambdas'))
+
+import db  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def lambda_env(monkeypatch):
+    database = settings.DATABASES['default']
+    monkeypatch.setenv('DB_HOST', database['HOST'])
+    monkeypatch.setenv('DB_NAME', database['NAME'])
+    monkeypatch.setenv('DB_USER', database['USER'])
+    monkeypatch.setenv('DB_PASSWORD', database['PASSWORD'])
+    monkeypatch.setenv('DB_PORT', str(database['PORT']))
+    db.close_connection()
+    yield monkeypatch
+    db.close_connection()
+
+
+def backend_pid(conn):
+    with conn.cursor() as cur:
+        cur.execute('SELECT pg_backend_pid()')
+        return cur.fetchone()[0]
+
+
+def test_warm_invocations_reuse_the_connection():
+    first = db.get_connection()
+    db.release_connection(first)
+
+    assert db.get_connection() is first
+
+
+def test_release_rolls_back_open_transaction():
+    conn = db.get_connection()
+    backend_pid(conn)
+
+    db.release_connection(conn)
+
+    assert conn.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+
+def test_connection_error_drops_the_connection():
+    conn = db.get_connection()
+
+    db.release_connection(conn, psycopg2.OperationalError('server closed the connection'))
+
+    assert conn.closed
+    assert db.get_connection() is not conn
+
+
+def test_idle_connection_killed_by_server_is_replaced(lambda_env):
+    lambda_env.setenv('DB_PING_AFTER_SECONDS', '0')
+    conn = db.get_connection()
+    pid = backend_pid(conn)
+    db.release_connection(conn)
+
+    killer = db._connect()
+    with killer.cursor() as cur:
+        cur.execute('SELECT pg_terminate_backend(%s)', (pid,))
+    killer.close()
+
+    fresh = db.get_connection()
+    assert fresh is not conn
+    assert backend_pid(fresh) != pid
+    db.release_connection(fresh)
+
+
+def test_dsn_takes_precedence(lambda_env):
+    database = settings.DATABASES['default']
+    lambda_env.setenv('DB_HOST', 'unreachable.invalid')
+    lambda_env.setenv(
+        'DB_DSN',
+        f"host={database['HOST']} port={database['PORT']} dbname={database['NAME']} "
+        f"user={database['USER']} password={database['PASSWORD']}",
+    )
+
+    assert backend_pid(db.get_connection())
@@ -0,0 +1,131 @@
+"""
+Tests for the keyset-paginated, column-projected GET /api/careplans/.
+"""
+
+from datetime import timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from careplan.models import CarePlan, Patient
+
+
+def make_plans(n, status='completed', same_timestamp=False, last_name='Resident'):
+    now = timezone.now()
+    plans = []
+    for i in range(n):
+        patient = Patient.objects.create(
+            first_name=f'Pat{i}', last_name=last_name, date_of_birth='1940-01-15',
+            medications='Metformin 500mg', allergies='', health_conditions='',
+        )
+        plan = CarePlan.objects.create(patient=patient, status=status, care_plan_text=f'plan {i}')
+        created_at = now if same_timestamp else now - timedelta(minutes=n - i)
+        CarePlan.objects.filter(pk=plan.pk).update(created_at=created_at)
+        plans.append(plan)
+    return plans
+
+
+def fetch_all(client, **params):
+    ids, pages = [], 0
+    while True:
+        response = client.get('/api/careplans/', params)
+        assert response.status_code == 200
+        ids += [row['id'] for row in response.json()]
+        pages += 1
+        cursor = response.headers.get('X-Next-Cursor')
+        if not cursor:
+            return ids, pages
+        params['cursor'] = cursor
+
+
+@pytest.mark.django_db
+def test_pages_cover_every_plan_once_newest_first(client):
+    plans = make_plans(7)
+
+    ids, pages = fetch_all(client, limit=3)
+
+    assert ids == [p.id for p in reversed(plans)]
+    assert pages == 3
+
+
+@pytest.mark.django_db
+def test_ties_on_created_at_are_broken_by_id(client):
+    plans = make_plans(5, same_timestamp=True)
+
+    ids, _ = fetch_all(client, limit=2)
+
+    assert ids == sorted((p.id for p in plans), reverse=True)
+
+
+@pytest.mark.django_db
+def test_link_header_keeps_query_params(client):
+    make_plans(3)
+
+    response = client.get('/api/careplans/', {'limit': 2, 'q': 'Pat'})
+
+    assert 'q=Pat' in response.headers['Link']
+    assert f"cursor={response.headers['X-Next-Cursor']}" in response.headers['Link']
+    assert 'rel="next"' in response.headers['Link']
+
+
+@pytest.mark.django_db
+def test_last_page_has_no_cursor(client):
+    make_plans(2)
+
+    response = client.get('/api/careplans/', {'limit': 2})
+
+    assert 'X-Next-Cursor' not in response.headers
+    assert len(response.json()) == 2
+
+
+@pytest.mark.django_db
+def test_care_plan_text_is_not_loaded_by_default(client):
+    make_plans(2)
+
+    with CaptureQueriesContext(connection) as ctx:
+        rows = client.get('/api/careplans/').json()
+
+    assert 'care_plan_text' not in rows[0]
+    assert set(rows[0]) == {'id', 'patient_name', 'medications', 'allergies',
+                            'health_conditions', 'status', 'created_at'}
+    assert len(ctx.captured_queries) == 1  # validators come from the page's rows
+    assert not any('care_plan_text' in q['sql'] for q in ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_fields_projection(client):
+    make_plans(1)
+    make_plans(1, status='failed', last_name='Other')
+
+    rows = client.get('/api/careplans/', {'fields': 'id,status,care_plan_text'}).json()
+
+    assert [set(r) for r in rows] == [{'id', 'status', 'care_plan_text'}] * 2
+    assert rows[0]['care_plan_text'] == ''   # failed: text hidden like serialize_careplan
+    assert rows[1]['care_plan_text'] == 'plan 0'
+
+
+@pytest.mark.django_db
+def test_page_size_is_capped(client, settings):
+    settings.CAREPLAN_LIST_MAX_PAGE_SIZE = 3
+    make_plans(5)
+
+    response = client.get('/api/careplans/', {'limit': 1000})
+
+    assert len(response.json()) == 3
+    assert response.headers['X-Next-Cursor']
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('params, code', [
+    ({'cursor': 'not-a-cursor'}, 'invalid_cursor'),
+    ({'limit': 'ten'}, 'invalid_limit'),
+    ({'limit': '0'}, 'invalid_limit'),
+    ({'fields': 'id,ssn'}, 'invalid_fields'),
+])
+def test_bad_params_are_rejected(client, params, code):
+    response = client.get('/api/careplans/', params)
+
+    assert response.status_code == 400
+    assert response.json()['code'] == code
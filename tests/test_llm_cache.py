@@ -0,0 +1,75 @@
+"""
+Tests for the content-addressed LLM care plan cache.
+
+1. Keys are stable across formatting differences, and change with the prompt version
+2. Lookups count hits/misses, invalidate() drops everything
+3. generate_careplan_task completes a plan straight from a cache hit
+"""
+
+import pytest
+from django.core.cache import cache
+from unittest.mock import patch
+
+from careplan import llm_cache
+from careplan.models import CarePlan, Patient
+from careplan.tasks import generate_careplan_task
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+def test_key_ignores_order_case_and_whitespace():
+    a = llm_cache.make_key('Metformin 500mg, Lisinopril 10mg', 'Penicillin', '')
+    b = llm_cache.make_key('lisinopril 10mg,  METFORMIN 500mg', ' penicillin ', '')
+
+    assert a == b
+
+
+@pytest.mark.parametrize('a, b', [
+    ('Metformin 500mg once daily', 'Metformin 500mg twice a day'),
+    ('Metformin 500mg tid', 'Metformin 500mg at night'),
+    ('Aspirin 81mg tablets', 'Aspirin 81mg capsules'),
+])
+def test_key_keeps_dosing_frequency_and_form(a, b):
+    assert llm_cache.profile_hash(a, '', '') != llm_cache.profile_hash(b, '', '')
+
+
+def test_key_changes_with_prompt_version():
+    before = llm_cache.make_key('Aspirin', '', '')
+    with patch('careplan.llm_cache.PROMPT_VERSION', 'next'):
+        after = llm_cache.make_key('Aspirin', '', '')
+
+    assert before != after
+
+
+def test_store_then_hit_and_invalidate():
+    assert llm_cache.get_cached_careplan('Aspirin', '', '') is None
+
+    llm_cache.store_careplan('Aspirin', '', '', 'cached plan')
+    assert llm_cache.get_cached_careplan('aspirin', '', '') == 'cached plan'
+
+    llm_cache.invalidate()
+    assert llm_cache.get_cached_careplan('Aspirin', '', '') is None
+
+
+@pytest.mark.django_db
+def test_task_completes_from_cache_without_calling_llm():
+    patient = Patient.objects.create(
+        first_name='John', last_name='Doe', date_of_birth='1990-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    plan = CarePlan.objects.create(patient=patient)
+    llm_cache.store_careplan('Metformin 500mg', '', '', 'cached plan')
+
+    with patch('careplan.generation.get_openai_api_key', return_value='sk-test'), \
+            patch('careplan.tasks.call_llm') as mock_llm:
+        generate_careplan_task.apply(args=[plan.id])
+
+    plan.refresh_from_db()
+    assert plan.status == 'completed'
+    assert plan.care_plan_text == 'cached plan'
+    mock_llm.assert_not_called()
@@ -0,0 +1,58 @@
+"""
+Tests for the shared OpenAI client pool (careplan/llm_client.py) and acall_llm.
+"""
+
+import asyncio
+
+import pytest
+from unittest.mock import patch
+
+from careplan import llm_client
+from careplan.services import acall_llm
+
+
+@pytest.fixture(autouse=True)
+def fresh_clients():
+    llm_client._reset_after_fork()
+    yield
+    llm_client._reset_after_fork()
+
+
+def test_sync_client_is_created_once_per_process():
+    with patch('openai.OpenAI') as mock_openai, patch('openai.DefaultHttpxClient'):
+        first = llm_client.get_llm_client('sk-test')
+        second = llm_client.get_llm_client('sk-test')
+
+    assert first is second
+    mock_openai.assert_called_once()
+    # 429s must go through the shared rate limiter, not the SDK's own retries
+    assert mock_openai.call_args.kwargs['max_retries'] == 0
+
+
+def test_sync_client_is_rebuilt_when_key_changes():
+    with patch('openai.OpenAI') as mock_openai, patch('openai.DefaultHttpxClient'):
+        llm_client.get_llm_client('sk-old')
+        llm_client.get_llm_client('sk-new')
+
+    assert mock_openai.call_count == 2
+
+
+def test_async_client_is_shared_within_one_event_loop():
+    async def two_lookups():
+        return llm_client.get_async_llm_client('sk-test'), llm_client.get_async_llm_client('sk-test')
+
+    with patch('openai.AsyncOpenAI') as mock_openai, patch('openai.DefaultAsyncHttpxClient'):
+        first, second = asyncio.run(two_lookups())
+        asyncio.run(two_lookups())  # a new loop gets its own client
+
+    assert first is second
+    assert mock_openai.call_count == 2
+    assert mock_openai.call_args.kwargs['max_retries'] == 0
+
+
+def test_acall_llm_mock_mode(monkeypatch):
+    monkeypatch.delenv('OPENAI_API_KEY', raising=False)
+
+    text = asyncio.run(acall_llm('John Doe', 'Aspirin 81mg', '', ''))
+
+    assert 'Patient: John Doe' in text
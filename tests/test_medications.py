@@ -0,0 +1,61 @@
+"""
+Unit tests for the medication-list normalizer (careplan/medications.py).
+"""
+
+import pytest
+
+from careplan.medications import Medication, canonicalize_medications, canonicalize_regimen, parse_medications
+from careplan.models import Patient
+
+
+def test_parse_structured_records():
+    """Free text -> sorted (drug, strength, unit) records."""
+    meds = parse_medications('Metformin 500mg, Lisinopril 10 MG')
+
+    assert meds == (
+        Medication('lisinopril', '10', 'mg'),
+        Medication('metformin', '500', 'mg'),
+    )
+
+
+def test_canonical_form_ignores_order_case_spacing_and_unit_spelling():
+    a = canonicalize_medications('Metformin 500mg, Lisinopril 10mg')
+    b = canonicalize_medications('lisinopril 10 milligrams; METFORMIN 500 mg')
+
+    assert a == b == 'lisinopril 10mg, metformin 500mg'
+
+
+def test_thousands_separator_and_noise_words():
+    assert canonicalize_medications('Metformin 1,000mg twice daily') == 'metformin 1000mg'
+
+
+def test_per_volume_strength_is_one_token():
+    assert canonicalize_medications('Amoxicillin 250mg/5ml') == 'amoxicillin 250mg/5ml'
+    assert canonicalize_medications('Lactulose 10 g / 15 mL, Morphine 10mg/ml') == 'lactulose 10g/15ml, morphine 10mg/ml'
+
+
+def test_regimen_keeps_frequency_and_form():
+    assert canonicalize_regimen('Metformin 500mg once daily') == 'metformin 500mg once daily'
+    assert canonicalize_regimen('Metformin 500mg twice a day') != canonicalize_regimen('Metformin 500mg once daily')
+    assert canonicalize_regimen('Aspirin 81mg tablets') != canonicalize_regimen('Aspirin 81mg capsules')
+    assert canonicalize_regimen('Lisinopril 10 MG, metformin 500mg') == 'lisinopril 10mg, metformin 500mg'
+
+
+def test_microgram_aliases_and_cjk_separators():
+    assert canonicalize_medications('Levothyroxine 50µg、头孢') == 'levothyroxine 50mcg, 头孢'
+
+
+def test_empty_input():
+    assert parse_medications('') == ()
+    assert canonicalize_medications(' , ;') == ''
+
+
+@pytest.mark.django_db
+def test_patient_save_stores_canonical_form():
+    patient = Patient.objects.create(
+        first_name='John', last_name='Doe', date_of_birth='1990-01-15',
+        medications='Metformin 500mg, Lisinopril 10mg',
+    )
+
+    patient.refresh_from_db()
+    assert patient.medications_canonical == 'lisinopril 10mg, metformin 500mg'
@@ -0,0 +1,72 @@
+"""
+Tests for PrometheusMetricsMiddleware: endpoint labels from the matched
+route, cached bound metrics, and one root span per request.
+"""
+
+import pytest
+from prometheus_client import REGISTRY
+from unittest.mock import patch
+
+from careplan import metrics_middleware
+from careplan.metrics_middleware import endpoint_label
+from careplan.models import CarePlan, Patient
+
+
+def requests_seen(method, endpoint, status_code):
+    return REGISTRY.get_sample_value('http_request_duration_seconds_count', {
+        'method': method, 'endpoint': endpoint, 'status_code': status_code,
+    }) or 0
+
+
+def errors_seen(method, endpoint, status_code):
+    return REGISTRY.get_sample_value('http_request_errors_total', {
+        'method': method, 'endpoint': endpoint, 'status_code': status_code,
+    }) or 0
+
+
+@pytest.fixture
+def plans():
+    return [
+        CarePlan.objects.create(patient=Patient.objects.create(
+            first_name=first_name, last_name='Labelled', date_of_birth='1940-01-15', medications='Aspirin',
+        ))
+        for first_name in ('Ann', 'Bob')
+    ]
+
+
+def test_endpoint_label_from_route():
+    assert endpoint_label('api/careplans/<int:pk>/status/') == '/api/careplans/{pk}/status/'
+    assert endpoint_label('api/careplans/') == '/api/careplans/'
+    assert endpoint_label('') == '/'
+    assert endpoint_label(None) == '<unmatched>'
+
+
+@pytest.mark.django_db
+def test_ids_share_the_route_label(client, plans):
+    endpoint = '/api/careplans/{pk}/status/'
+    before = requests_seen('GET', endpoint, '200')
+
+    for plan in plans:
+        response = client.get(f'/api/careplans/{plan.id}/status/')
+
+    assert requests_seen('GET', endpoint, '200') == before + 2
+    assert len(response['X-Trace-Id']) == 32
+
+
+def test_unknown_paths_and_methods_are_collapsed(client):
+    before = errors_seen('other', '<unmatched>', '404')
+
+    client.generic('BREW', '/no/such/page/1')
+    client.generic('PROPFIND', '/another/missing/page')
+
+    assert errors_seen('other', '<unmatched>', '404') == before + 2
+
+
+@pytest.mark.django_db
+def test_bound_metrics_are_reused(client, plans):
+    client.get(f'/api/careplans/{plans[0].id}/status/')
+
+    with patch.object(metrics_middleware.http_request_duration_seconds, 'labels') as labels:
+        client.get(f'/api/careplans/{plans[1].id}/status/')
+
+    labels.assert_not_called()
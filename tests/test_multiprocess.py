@@ -0,0 +1,117 @@
+"""
+Tests for multiprocess Prometheus metrics (careplan/multiprocess.py).
+
+prometheus_client picks its storage when it is imported, so each "worker"
+is a separate Python process with PROMETHEUS_MULTIPROC_DIR set.
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from careplan import multiprocess
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+WORKER = """
+from careplan import metrics
+metrics.careplan_requests_total.labels(status='success').inc()
+metrics.careplan_active_count.labels(status='pending').set({pending})
+"""
+
+SCRAPE = """
+from prometheus_client import generate_latest
+from careplan import multiprocess
+for pid in {dead}:
+    multiprocess.mark_dead(pid)
+print(generate_latest(multiprocess.get_registry()).decode())
+"""
+
+
+def run(code, metrics_dir):
+    env = dict(os.environ, PROMETHEUS_MULTIPROC_DIR=str(metrics_dir))
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    )
+    return result.stdout
+
+
+def worker(metrics_dir, pending):
+    """Run one worker process and return its pid."""
+    return int(run(WORKER.format(pending=pending) + 'import os; print(os.getpid())', metrics_dir))
+
+
+def sample(output, line_prefix):
+    return [line for line in output.splitlines() if line.startswith(line_prefix)]
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    path = tmp_path / 'prometheus'
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(path))
+    multiprocess.clear_metrics_dir()
+    return path
+
+
+def test_counters_sum_across_processes(metrics_dir):
+    worker(metrics_dir, pending=3)
+    worker(metrics_dir, pending=5)
+
+    output = run(SCRAPE.format(dead=[]), metrics_dir)
+
+    assert sample(output, 'careplan_requests_total{status="success"}') == [
+        'careplan_requests_total{status="success"} 2.0',
+    ]
+
+
+def test_active_count_reports_most_recent_live_value(metrics_dir):
+    worker(metrics_dir, pending=3)
+    last = worker(metrics_dir, pending=5)
+
+    output = run(SCRAPE.format(dead=[]), metrics_dir)
+    assert sample(output, 'careplan_active_count{') == ['careplan_active_count{status="pending"} 5.0']
+
+    # Once its worker is gone the gauge no longer reports that process's value
+    output = run(SCRAPE.format(dead=[last]), metrics_dir)
+    assert sample(output, 'careplan_active_count{') == ['careplan_active_count{status="pending"} 3.0']
+    assert sample(output, 'careplan_requests_total{status="success"}') == [
+        'careplan_requests_total{status="success"} 2.0',
+    ]
+
+
+def test_clear_metrics_dir_removes_previous_run(metrics_dir):
+    worker(metrics_dir, pending=1)
+    assert list(metrics_dir.glob('*.db'))
+
+    multiprocess.clear_metrics_dir()
+
+    assert metrics_dir.is_dir()
+    assert not list(metrics_dir.glob('*.db'))
+
+
+CELERY_WORKER_START = """
+import sys
+sys.argv = ['/usr/local/bin/celery', '-A', 'config', 'worker']
+from config.celery import app
+app.loader.import_default_modules()  # what the worker does before worker_init
+"""
+
+
+def test_celery_worker_creates_and_clears_the_dir_before_importing_tasks(tmp_path):
+    metrics_dir = tmp_path / 'missing' / 'prometheus'
+
+    run(CELERY_WORKER_START, metrics_dir)
+    (metrics_dir / 'counter_1.db').write_bytes(b'stale')
+    run(CELERY_WORKER_START, metrics_dir)
+
+    assert not (metrics_dir / 'counter_1.db').exists()
+
+
+def test_single_process_uses_default_registry(monkeypatch):
+    from prometheus_client import REGISTRY
+
+    monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+
+    assert multiprocess.get_registry() is REGISTRY
@@ -1,14 +1,28 @@
 """
-Unit tests for Patient get_or_create logic.
+Unit tests for patient detection in services.create_careplan().
 
-Tests the 2 branches in services.get_or_create_patient():
+The patient upsert in CREATE_CAREPLAN_SQL has 2 branches:
 1. Patient with same name+DOB exists -> reuse and update meds/allergies/conditions
 2. New patient -> create new
 """
 
 import pytest
+from unittest.mock import patch
+
 from careplan.models import Patient
-from careplan.services import get_or_create_patient
+from careplan.services import create_careplan
+
+
+def submit(first_name, last_name, date_of_birth, medications, allergies='', health_conditions=''):
+    with patch('careplan.tasks.generate_careplan_task'):
+        return create_careplan({
+            'patient_first_name': first_name,
+            'patient_last_name': last_name,
+            'date_of_birth': date_of_birth,
+            'medications': medications,
+            'allergies': allergies,
+            'health_conditions': health_conditions,
+        })
 
 
 @pytest.mark.django_db
@@ -19,29 +33,25 @@ def test_existing_patient_is_reused_and_updated():
         medications='Metformin', allergies='None', health_conditions='Diabetes',
     )
 
-    patient = get_or_create_patient(
+    submit(
         'John', 'Doe', '1990-01-15',
         medications='Metformin, Lisinopril',
         allergies='Penicillin',
         health_conditions='Diabetes, Hypertension',
     )
 
+    patient = Patient.objects.get()
     assert patient.id == existing.id
     assert patient.medications == 'Metformin, Lisinopril'
     assert patient.allergies == 'Penicillin'
-    assert Patient.objects.count() == 1
+    assert patient.health_conditions == 'Diabetes, Hypertension'
 
 
 @pytest.mark.django_db
 def test_new_patient_is_created():
     """Completely new patient = create new."""
-    patient = get_or_create_patient(
-        'Alice', 'Wong', '1985-03-20',
-        medications='Aspirin',
-        allergies='',
-        health_conditions='',
-    )
+    submit('Alice', 'Wong', '1985-03-20', medications='Aspirin')
 
+    patient = Patient.objects.get()
     assert patient.first_name == 'Alice'
     assert patient.medications == 'Aspirin'
-    assert Patient.objects.count() == 1
@@ -0,0 +1,112 @@
+"""
+Tests for queue-wait / end-to-end latency and the queue depth gauge.
+
+1. The task records queue wait from the enqueued_at in its message, and
+   processing / submit-to-finish latency once the plan is final
+2. Re-queued tasks carry a fresh enqueued_at
+3. careplan_queue_depth reads the broker (celery mode) or the pending count (async mode)
+"""
+
+import time
+from datetime import timedelta
+
+import pytest
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest
+from unittest.mock import MagicMock, patch
+
+from careplan import queue_depth, ratelimit
+from careplan.models import CarePlan, Patient
+from careplan.queue_depth import QueueDepthCollector
+from careplan.services import create_careplan
+from careplan.tasks import generate_careplan_task
+
+
+def sample(name, labels=None):
+    return REGISTRY.get_sample_value(name, labels or {}) or 0
+
+
+@pytest.fixture
+def plan():
+    patient = Patient.objects.create(
+        first_name='Ann', last_name='Queued', date_of_birth='1940-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    return CarePlan.objects.create(patient=patient)
+
+
+@pytest.mark.django_db
+def test_task_records_queue_wait_processing_and_total(plan, settings):
+    settings.CAREPLAN_LLM_STREAMING = False
+    wait_sum = sample('careplan_queue_wait_seconds_sum')
+    processing = sample('careplan_processing_seconds_count', {'status': 'completed'})
+    total_sum = sample('careplan_end_to_end_seconds_sum', {'status': 'completed'})
+    # Submitted an hour ago: end-to-end counts from created_at, not from the message
+    CarePlan.objects.filter(id=plan.id).update(created_at=plan.created_at - timedelta(hours=1))
+
+    with patch('careplan.tasks.call_llm', return_value='plan text'):
+        generate_careplan_task.apply(args=[plan.id], kwargs={'enqueued_at': time.time() - 5})
+
+    assert 5 <= sample('careplan_queue_wait_seconds_sum') - wait_sum < 10
+    assert sample('careplan_processing_seconds_count', {'status': 'completed'}) == processing + 1
+    assert sample('careplan_end_to_end_seconds_sum', {'status': 'completed'}) - total_sum > 3600
+
+
+@pytest.mark.django_db
+def test_requeued_plan_is_not_final(plan):
+    processing = sample('careplan_processing_seconds_count', {'status': 'completed'})
+
+    with patch('careplan.tasks.ratelimit.acquire', side_effect=ratelimit.RateLimitBackoff(7)), \
+            patch.object(generate_careplan_task, 'apply_async') as mock_requeue:
+        generate_careplan_task.apply(args=[plan.id])
+
+    enqueued_at = mock_requeue.call_args.kwargs['kwargs']['enqueued_at']
+    assert time.time() + 6 < enqueued_at <= time.time() + 7
+    assert sample('careplan_processing_seconds_count', {'status': 'completed'}) == processing
+
+
+@pytest.mark.django_db
+def test_submit_sends_enqueue_time():
+    with patch('careplan.tasks.generate_careplan_task') as mock_task:
+        create_careplan({
+            'patient_first_name': 'John',
+            'patient_last_name': 'Doe',
+            'date_of_birth': '1990-01-15',
+            'medications': 'Metformin 500mg',
+        })
+
+    assert abs(mock_task.delay.call_args.kwargs['enqueued_at'] - time.time()) < 5
+
+
+def scrape(collector):
+    registry = CollectorRegistry()
+    registry.register(collector)
+    return generate_latest(registry).decode()
+
+
+def test_queue_depth_is_broker_queue_length(settings):
+    settings.CAREPLAN_WORKER_MODE = 'celery'
+    broker = MagicMock()
+    broker.llen.return_value = 42
+
+    with patch('careplan.queue_depth._get_broker', return_value=broker):
+        output = scrape(QueueDepthCollector())
+
+    broker.llen.assert_called_once_with('celery')
+    assert 'careplan_queue_depth 42.0' in output
+
+
+def test_queue_depth_is_skipped_when_broker_is_down(settings):
+    settings.CAREPLAN_WORKER_MODE = 'celery'
+
+    with patch('careplan.queue_depth._get_broker', side_effect=ConnectionError):
+        output = scrape(QueueDepthCollector())
+
+    assert 'careplan_queue_depth ' not in output
+
+
+@pytest.mark.django_db
+def test_queue_depth_in_async_mode_counts_pending_plans(settings, plan):
+    settings.CAREPLAN_WORKER_MODE = 'async'
+
+    with patch('careplan.queue_depth.connection'):
+        assert queue_depth.read_depth() == CarePlan.objects.filter(status='pending').count() == 1
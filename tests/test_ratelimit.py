@@ -0,0 +1,152 @@
+"""
+Tests for the shared LLM rate limiter (careplan/ratelimit.py).
+
+The Redis token bucket itself is a Lua script; these tests cover the Python
+side: token estimates, header parsing, waiting vs. re-queueing, and 429s not
+spending the task's retry budget.
+"""
+
+import asyncio
+import threading
+
+import pytest
+from unittest.mock import ANY, MagicMock, patch
+
+from careplan import ratelimit
+from careplan.models import CarePlan, Patient
+from careplan.prompts import LLM_MAX_TOKENS
+from careplan.tasks import generate_careplan_task
+
+
+class RateLimitError(Exception):
+    """Stand-in for openai.RateLimitError (matched by class name)."""
+
+    def __init__(self, headers):
+        super().__init__('429 Too Many Requests')
+        self.response = MagicMock(headers=headers)
+
+
+@pytest.fixture(autouse=True)
+def no_pause():
+    ratelimit._local_pause_until = 0.0
+    yield
+    ratelimit._local_pause_until = 0.0
+
+
+@pytest.fixture
+def plan(db):
+    patient = Patient.objects.create(
+        first_name='John', last_name='Doe', date_of_birth='1990-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    return CarePlan.objects.create(patient=patient)
+
+
+@pytest.mark.parametrize('value, seconds', [
+    ('1s', 1), ('20ms', 0.02), ('6m0s', 360), ('1h2m3.5s', 3723.5), ('', 0), (None, 0),
+])
+def test_parse_duration(value, seconds):
+    assert ratelimit.parse_duration(value) == pytest.approx(seconds)
+
+
+def test_request_estimate_includes_max_tokens():
+    tokens = ratelimit.estimate_request_tokens('Metformin 500mg', '', '')
+
+    assert tokens > LLM_MAX_TOKENS
+
+
+def test_acquire_sleeps_until_capacity():
+    with patch('careplan.ratelimit.try_acquire', side_effect=[0.5, 0.2, 0]), \
+            patch('careplan.ratelimit.time.sleep') as mock_sleep:
+        ratelimit.acquire(100, max_wait=10)
+
+    assert mock_sleep.call_count == 2
+
+
+def test_acquire_gives_up_after_max_wait():
+    with patch('careplan.ratelimit.try_acquire', return_value=20):
+        with pytest.raises(ratelimit.RateLimitBackoff) as exc:
+            ratelimit.acquire(100, max_wait=5)
+
+    assert exc.value.wait >= 20
+
+
+def test_429_pauses_this_process_without_redis():
+    wait = ratelimit.on_rate_limited(RateLimitError({'retry-after': '3'}))
+
+    assert wait == 3
+    assert 2.5 < ratelimit.try_acquire(100) <= 3
+
+
+def test_exhausted_remaining_header_pauses_until_reset():
+    ratelimit.observe_headers({
+        'x-ratelimit-remaining-requests': '12',
+        'x-ratelimit-remaining-tokens': '0',
+        'x-ratelimit-reset-tokens': '2s',
+    })
+
+    assert 1.5 < ratelimit.try_acquire(100) <= 2
+
+
+def test_saturated_limiter_requeues_task_without_using_a_retry(plan):
+    with patch('careplan.tasks.ratelimit.acquire', side_effect=ratelimit.RateLimitBackoff(7)), \
+            patch.object(generate_careplan_task, 'apply_async') as mock_requeue, \
+            patch('careplan.tasks.call_llm') as mock_llm:
+        generate_careplan_task.apply(args=[plan.id])
+
+    mock_llm.assert_not_called()
+    mock_requeue.assert_called_once_with(args=[plan.id], kwargs=ANY, countdown=7, retries=0)
+    plan.refresh_from_db()
+    assert plan.status == 'pending'
+
+
+def test_429_requeues_plan_instead_of_failing(plan, settings):
+    settings.CAREPLAN_LLM_STREAMING = False
+    with patch('careplan.tasks.call_llm', side_effect=RateLimitError({'retry-after': '4'})), \
+            patch.object(generate_careplan_task, 'apply_async') as mock_requeue:
+        generate_careplan_task.apply(args=[plan.id])
+
+    mock_requeue.assert_called_once_with(args=[plan.id], kwargs=ANY, countdown=4, retries=0)
+    plan.refresh_from_db()
+    assert plan.status == 'pending'
+
+
+def test_429_from_the_llm_call_pauses_the_limiter_once(plan, settings):
+    settings.CAREPLAN_LLM_STREAMING = False
+    client = MagicMock()
+    client.chat.completions.with_raw_response.create.side_effect = RateLimitError({'retry-after': '4'})
+    with patch('careplan.services.get_openai_api_key', return_value='sk-test'), \
+            patch('careplan.services.get_llm_client', return_value=client), \
+            patch('careplan.ratelimit.pause') as mock_pause, \
+            patch.object(generate_careplan_task, 'apply_async') as mock_requeue:
+        generate_careplan_task.apply(args=[plan.id])
+
+    mock_pause.assert_called_once_with(4)
+    mock_requeue.assert_called_once_with(args=[plan.id], kwargs=ANY, countdown=4, retries=0)
+
+
+def test_redis_outage_in_the_limiter_retries_then_fails_the_plan(plan, settings):
+    """A broken limiter must not leave the plan active and block resubmits."""
+    settings.CAREPLAN_LLM_STREAMING = False
+    with patch('careplan.ratelimit.try_acquire', side_effect=ConnectionError('redis down')) as mock_acquire, \
+            patch('careplan.tasks.call_llm') as mock_llm:
+        generate_careplan_task.apply(args=[plan.id])
+
+    mock_llm.assert_not_called()
+    assert mock_acquire.call_count == 4
+    plan.refresh_from_db()
+    assert plan.status == 'failed'
+    assert 'redis down' in plan.care_plan_text
+
+
+def test_aacquire_calls_redis_off_the_event_loop():
+    threads = []
+
+    def try_acquire(tokens):
+        threads.append(threading.get_ident())
+        return 0
+
+    with patch('careplan.ratelimit.try_acquire', side_effect=try_acquire):
+        asyncio.run(ratelimit.aacquire(100))
+
+    assert threads and threads[0] != threading.get_ident()
@@ -0,0 +1,137 @@
+"""
+Tests for care plan search (careplan/search.py): the Postgres tsvector path
+through the list endpoint, and the in-memory inverted index fallback.
+"""
+
+import pytest
+from unittest.mock import patch
+
+from careplan import search
+from careplan.models import CarePlan, Patient
+from careplan.services import create_careplans_bulk, list_careplans, list_careplans_page
+
+
+def make_plan(first_name, last_name, medications, status='completed'):
+    patient = Patient.objects.create(
+        first_name=first_name, last_name=last_name, date_of_birth='1940-01-15',
+        medications=medications, allergies='', health_conditions='',
+    )
+    return CarePlan.objects.create(patient=patient, status=status)
+
+
+@pytest.fixture
+def plans(db):
+    return {
+        'metformin_name': make_plan('Metford', 'Smith', 'Lisinopril 10mg'),
+        'metformin_med': make_plan('Ann', 'Jones', 'Metformin 500mg, Aspirin 81mg'),
+        'other': make_plan('Bob', 'Brown', 'Warfarin 5mg'),
+    }
+
+
+@pytest.fixture(params=['postgresql', 'fallback'])
+def backend(request):
+    search._index = None
+    if request.param == 'postgresql':
+        yield request.param
+    else:
+        with patch.object(search, 'connection') as conn:
+            conn.vendor = 'sqlite'
+            yield request.param
+    search._index = None
+
+
+def ids(query):
+    return [p.id for p in list_careplans(query)]
+
+
+def test_tokenize():
+    assert search.tokenize("O'Brien, Metformin-500mg") == ['o', 'brien', 'metformin', '500mg']
+
+
+@pytest.mark.django_db
+def test_matches_name_and_medication_prefixes(plans, backend):
+    assert set(ids('met')) == {plans['metformin_name'].id, plans['metformin_med'].id}
+    assert ids('warf') == [plans['other'].id]
+    assert ids('bob') == [plans['other'].id]
+    assert ids('zzz') == []
+    assert ids('!!!') == []
+
+
+@pytest.mark.django_db
+def test_every_word_must_match(plans, backend):
+    assert ids('ann metformin') == [plans['metformin_med'].id]
+    assert ids('ann warfarin') == []
+
+
+@pytest.mark.django_db
+def test_name_matches_rank_above_medication_matches(plans, backend):
+    assert ids('met') == [plans['metformin_name'].id, plans['metformin_med'].id]
+
+
+@pytest.mark.django_db
+def test_search_sees_updated_patients(plans, backend):
+    ids('met')  # builds the fallback index
+    patient = plans['other'].patient
+    patient.medications = 'Metoprolol 25mg'
+    patient.save()
+
+    assert plans['other'].id in ids('metop')
+
+
+@pytest.mark.django_db
+def test_search_sees_patients_updated_by_a_bulk_upsert(plans, backend):
+    ids('met')  # builds the fallback index
+    patient = plans['other'].patient
+    with patch('careplan.services.enqueue_careplans'):
+        create_careplans_bulk([{
+            'patient_first_name': patient.first_name,
+            'patient_last_name': patient.last_name,
+            'date_of_birth': str(patient.date_of_birth),
+            'medications': 'Metoprolol 25mg',
+        }])
+
+    assert plans['other'].id in ids('metop')
+
+
+@pytest.mark.django_db
+def test_search_pages_through_ranked_results(backend):
+    expected = []
+    for i in range(3):
+        expected.append(make_plan(f'Met{i}', 'Smith', 'Aspirin'))
+    for i in range(4):
+        expected.append(make_plan(f'Pat{i}', 'Jones', 'Metformin'))
+    make_plan('Bob', 'Brown', 'Warfarin')
+
+    seen, cursor = [], None
+    while True:
+        rows, cursor, _ = list_careplans_page(query='met', cursor=cursor, limit=2, fields=('id',))
+        seen += [row['id'] for row in rows]
+        if not cursor:
+            break
+
+    # names first, each group newest first
+    assert seen == [p.id for p in reversed(expected[:3])] + [p.id for p in reversed(expected[3:])]
+
+
+@pytest.mark.django_db
+def test_search_rejects_unranked_cursor(client, plans):
+    cursor = client.get('/api/careplans/', {'limit': 1}).headers['X-Next-Cursor']
+
+    response = client.get('/api/careplans/', {'q': 'met', 'cursor': cursor})
+
+    assert response.status_code == 400
+    assert response.json()['code'] == 'invalid_cursor'
+
+
+def test_inverted_index_add_remove():
+    index = search.InvertedIndex()
+    index.add(1, 'Ann', 'Jones', 'Metformin')
+    index.add(2, 'Met', 'Smith', 'Aspirin')
+
+    assert index.search(['met']) == {1: search.MEDICATION_WEIGHT, 2: search.NAME_WEIGHT}
+
+    index.add(1, 'Ann', 'Jones', 'Aspirin')
+    index.remove(2)
+    assert index.search(['met']) == {}
+    assert index.search(['asp']) == {1: search.MEDICATION_WEIGHT}
+    assert 'metformin' not in index.postings
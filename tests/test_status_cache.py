@@ -0,0 +1,124 @@
+"""
+Tests for the status endpoint's read-through cache and ETag handling
+(careplan/status_cache.py).
+"""
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+
+from careplan import generation, services, status_cache
+from careplan.exceptions import BlockError
+from careplan.models import CarePlan, Patient
+from careplan.serializers import serialize_careplan
+from careplan.streaming import ThrottledTextWriter
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def plan(db):
+    patient = Patient.objects.create(
+        first_name='Ann', last_name='Resident', date_of_birth='1940-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    return CarePlan.objects.create(patient=patient)
+
+
+def get_status(client, plan, etag=None):
+    headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+    return client.get(f'/api/careplans/{plan.id}/status/', **headers)
+
+
+def test_second_request_is_served_from_cache(client, plan):
+    first = get_status(client, plan)
+
+    with CaptureQueriesContext(connection) as ctx:
+        second = get_status(client, plan)
+
+    assert len(ctx.captured_queries) == 0
+    assert second.json() == first.json() == serialize_careplan(plan)
+    assert second['ETag'] == first['ETag']
+
+
+def test_matching_etag_gets_304_without_body(client, plan):
+    etag = get_status(client, plan)['ETag']
+
+    response = get_status(client, plan, etag=etag)
+
+    assert response.status_code == 304
+    assert response.content == b''
+    assert response['ETag'] == etag
+
+
+def test_status_change_refreshes_entry_and_etag(client, plan):
+    etag = get_status(client, plan)['ETag']
+    plan = generation.load_careplan(plan.id)
+
+    generation.mark_completed(plan, 'the plan', duration=1.0)
+
+    response = get_status(client, plan, etag=etag)
+    assert response.status_code == 200
+    assert response.json()['status'] == 'completed'
+    assert response.json()['care_plan_text'] == 'the plan'
+    assert response['ETag'] != etag
+
+
+def test_streamed_text_invalidates_entry(client, plan):
+    get_status(client, plan)
+
+    writer = ThrottledTextWriter(plan.id)
+    writer.write('## Plan')
+    writer.flush()
+
+    assert get_status(client, plan).json()['care_plan_text'] == '## Plan'
+
+
+def submit(plan, medications):
+    return {
+        'patient_first_name': plan.patient.first_name,
+        'patient_last_name': plan.patient.last_name,
+        'date_of_birth': str(plan.patient.date_of_birth),
+        'medications': medications,
+    }
+
+
+def test_patient_update_invalidates_entry_even_when_blocked(client, plan):
+    etag = get_status(client, plan)['ETag']
+
+    # The plan is still pending: the submit is refused, but the patient is updated
+    with pytest.raises(BlockError):
+        services.create_careplan(submit(plan, 'Metformin 1000mg'))
+
+    response = get_status(client, plan, etag=etag)
+    assert response.status_code == 200
+    assert response.json()['medications'] == 'Metformin 1000mg'
+
+
+def test_bulk_patient_update_invalidates_entry(client, plan):
+    plan.status = 'completed'
+    plan.save()
+    get_status(client, plan)
+
+    with patch('careplan.services.enqueue_careplans'):
+        services.create_careplans_bulk([submit(plan, 'Metformin 1000mg')])
+
+    assert get_status(client, plan).json()['medications'] == 'Metformin 1000mg'
+
+
+def test_ttl_depends_on_status(settings):
+    settings.CAREPLAN_STATUS_CACHE_TTL = 5
+    settings.CAREPLAN_STATUS_CACHE_TERMINAL_TTL = 3600
+
+    assert status_cache.ttl('processing') == 5
+    assert status_cache.ttl('partial') == 5
+    assert status_cache.ttl('completed') == 3600
+    assert status_cache.ttl('failed') == 3600
+
@@ -0,0 +1,101 @@
+"""
+Tests for the trigger-maintained per-status counts behind the
+careplan_active_count gauge (careplan/status_counts.py, migration 0009).
+"""
+
+import pytest
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+
+from careplan import services, status_counts
+from careplan.metrics import careplan_active_count
+from careplan.models import CarePlan, CarePlanStatusCount, Patient
+from careplan.tasks import reconcile_careplan_status_counts, update_careplan_gauge
+
+
+def actual_counts():
+    return dict(CarePlan.objects.order_by().values('status').annotate(n=Count('id')).values_list('status', 'n'))
+
+
+def make_plans(n, status='pending'):
+    plans = []
+    for i in range(n):
+        patient = Patient.objects.create(
+            first_name=f'Pat{i}', last_name=status, date_of_birth='1940-01-15',
+            medications='Metformin 500mg', allergies='', health_conditions='',
+        )
+        plans.append(CarePlan.objects.create(patient=patient, status=status))
+    return plans
+
+
+@pytest.mark.django_db
+def test_counts_follow_inserts_transitions_and_deletes():
+    plans = make_plans(20)
+    make_plans(3, status='completed')
+    assert status_counts.current() == {'pending': 20, 'completed': 3}
+
+    plans[0].status = 'processing'
+    plans[0].save()
+    CarePlan.objects.filter(id__in=[p.id for p in plans[1:6]]).update(status='failed')
+    CarePlan.objects.filter(id=plans[7].id).update(care_plan_text='no status change')
+    plans[8].delete()
+
+    assert status_counts.current() == actual_counts() == {
+        'pending': 13, 'processing': 1, 'failed': 5, 'completed': 3,
+    }
+
+
+@pytest.mark.django_db
+def test_raw_sql_creates_are_counted():
+    with patch('careplan.tasks.generate_careplan_task'), patch('careplan.services.enqueue_careplans'):
+        services.create_careplan({
+            'patient_first_name': 'Ann', 'patient_last_name': 'Lee', 'date_of_birth': '1940-01-15',
+            'medications': 'Aspirin', 'allergies': '', 'health_conditions': '',
+        })
+        services.create_careplans_bulk([
+            {'patient_first_name': f'Bob{i}', 'patient_last_name': 'Lee', 'date_of_birth': '1940-01-15',
+             'medications': 'Aspirin'}
+            for i in range(4)
+        ])
+
+    assert status_counts.current() == {'pending': 5}
+
+
+@pytest.mark.django_db
+def test_gauge_refresh_is_one_small_query():
+    make_plans(5)
+    make_plans(2, status='failed')
+
+    with CaptureQueriesContext(connection) as ctx:
+        update_careplan_gauge()
+
+    assert len(ctx.captured_queries) == 1
+    assert 'careplan_careplanstatuscount' in ctx.captured_queries[0]['sql']
+    assert careplan_active_count.labels(status='pending')._value.get() == 5
+    assert careplan_active_count.labels(status='failed')._value.get() == 2
+    assert careplan_active_count.labels(status='partial')._value.get() == 0
+
+
+@pytest.mark.django_db
+def test_reconcile_repairs_drift():
+    make_plans(4)
+    make_plans(2, status='completed')
+    CarePlanStatusCount.objects.filter(status='pending').delete()
+    CarePlanStatusCount.objects.create(status='pending', slot=0, count=100)
+    CarePlanStatusCount.objects.create(status='partial', slot=3, count=7)
+
+    assert status_counts.reconcile() == {'pending': (100, 4), 'partial': (7, 0)}
+    assert status_counts.current() == {'pending': 4, 'completed': 2}
+    assert status_counts.reconcile() == {}
+
+
+@pytest.mark.django_db
+def test_reconcile_task_refreshes_gauge():
+    make_plans(3)
+    CarePlanStatusCount.objects.all().delete()
+
+    reconcile_careplan_status_counts()
+
+    assert careplan_active_count.labels(status='pending')._value.get() == 3
@@ -0,0 +1,94 @@
+"""
+Tests for streaming generation and the 'partial' status.
+
+1. ThrottledTextWriter flushes every N chunks or M ms, marking the plan 'partial'
+2. generate_careplan_task consumes the stream and ends 'completed'
+3. Partial text is visible through the status endpoint and blocks duplicates
+"""
+
+import json
+
+import pytest
+from unittest.mock import patch
+
+from careplan.models import CarePlan, Patient
+from careplan.streaming import ThrottledTextWriter
+from careplan.tasks import generate_careplan_task
+
+
+@pytest.fixture
+def plan(db):
+    patient = Patient.objects.create(
+        first_name='John', last_name='Doe', date_of_birth='1990-01-15',
+        medications='Metformin 500mg',
+    )
+    return CarePlan.objects.create(patient=patient)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_writer_flushes_every_n_chunks(plan):
+    writer = ThrottledTextWriter(plan.id, flush_tokens=3, flush_ms=10_000, clock=FakeClock())
+
+    writer.write('a')
+    writer.write('b')
+    plan.refresh_from_db()
+    assert plan.status == 'pending'
+
+    writer.write('c')
+    plan.refresh_from_db()
+    assert plan.status == 'partial'
+    assert plan.care_plan_text == 'abc'
+
+
+def test_writer_flushes_after_interval(plan):
+    clock = FakeClock()
+    writer = ThrottledTextWriter(plan.id, flush_tokens=100, flush_ms=500, clock=clock)
+
+    writer.write('first')
+    clock.now = 0.6
+    writer.write(' second')
+
+    plan.refresh_from_db()
+    assert plan.care_plan_text == 'first second'
+
+
+def test_task_streams_then_completes(plan, settings):
+    settings.CAREPLAN_LLM_STREAMING = True
+    settings.CAREPLAN_STREAM_FLUSH_TOKENS = 1
+    seen = []
+
+    def fake_stream(**kwargs):
+        for chunk in ['## ⚠️ DANGER', '\nNone']:
+            yield chunk
+            seen.append(CarePlan.objects.get(id=plan.id).status)
+
+    with patch('careplan.tasks.stream_llm', side_effect=fake_stream):
+        generate_careplan_task.apply(args=[plan.id])
+
+    plan.refresh_from_db()
+    assert seen == ['partial', 'partial']
+    assert plan.status == 'completed'
+    assert plan.care_plan_text == '## ⚠️ DANGER\nNone'
+
+
+def test_partial_text_is_returned_and_blocks_duplicates(client, plan):
+    CarePlan.objects.filter(id=plan.id).update(status='partial', care_plan_text='## ⚠️ DANGER')
+
+    status = client.get(f'/api/careplans/{plan.id}/status/').json()
+    assert status['status'] == 'partial'
+    assert status['care_plan_text'] == '## ⚠️ DANGER'
+
+    response = client.post('/api/generate/', data=json.dumps({
+        'patient_first_name': 'John',
+        'patient_last_name': 'Doe',
+        'date_of_birth': '1990-01-15',
+        'medications': 'Metformin 500mg',
+    }), content_type='application/json')
+    assert response.status_code == 409
@@ -0,0 +1,125 @@
+"""
+Tests for request tracing (careplan/tracing.py).
+
+1. Spans nest through the context and continue a trace from a carrier
+2. A submit's trace runs from the HTTP request into the Celery task and LLM call
+3. Stage histograms and the JSON-lines trace log
+"""
+
+import json
+
+import pytest
+from prometheus_client import REGISTRY
+from unittest.mock import patch
+
+from careplan import tracing
+from careplan.models import CarePlan, Patient
+from careplan.tasks import generate_careplan_task
+
+
+@pytest.fixture
+def spans():
+    finished = []
+    tracing.add_sink(finished.append)
+    yield finished
+    tracing.remove_sink(finished.append)
+
+
+def by_name(spans):
+    return {span.name: span for span in spans}
+
+
+def test_nested_spans_share_the_trace(spans):
+    with tracing.span('outer') as outer:
+        with tracing.span('inner') as inner:
+            assert tracing.current() is inner
+        assert tracing.current() is outer
+    assert tracing.current() is None
+
+    assert [span.name for span in spans] == ['inner', 'outer']
+    assert inner.trace_id == outer.trace_id
+    assert inner.parent_id == outer.span_id
+    assert outer.parent_id is None
+    assert inner.duration <= outer.duration
+
+
+def test_carrier_continues_the_trace(spans):
+    with tracing.span('producer') as producer:
+        carrier = tracing.inject()
+
+    with tracing.span('consumer', parent=carrier) as consumer:
+        pass
+
+    assert consumer.trace_id == producer.trace_id
+    assert consumer.parent_id == producer.span_id
+    assert tracing.inject() is None
+
+
+def test_failed_span_records_the_error(spans):
+    with pytest.raises(ValueError):
+        with tracing.span('boom'):
+            raise ValueError
+
+    assert spans[0].error == 'ValueError'
+
+
+@pytest.mark.django_db
+def test_submit_trace_reaches_the_task(client, spans):
+    with patch('careplan.tasks.generate_careplan_task') as mock_task:
+        response = client.post('/api/generate/', {
+            'patient_first_name': 'John',
+            'patient_last_name': 'Doe',
+            'date_of_birth': '1990-01-15',
+            'medications': 'Metformin 500mg',
+        }, content_type='application/json')
+
+    trace_id = response['X-Trace-Id']
+    recorded = by_name(spans)
+    assert {'http.request', 'create.insert', 'create.enqueue'} <= set(recorded)
+    assert all(span.trace_id == trace_id for span in spans)
+
+    trace = mock_task.delay.call_args.kwargs['trace']
+    assert trace == recorded['create.enqueue'].context()
+
+
+@pytest.mark.django_db
+def test_task_continues_trace_and_times_stages(spans, settings):
+    settings.CAREPLAN_LLM_STREAMING = False
+    patient = Patient.objects.create(
+        first_name='Ann', last_name='Traced', date_of_birth='1940-01-15',
+        medications='Metformin 500mg', allergies='', health_conditions='',
+    )
+    plan = CarePlan.objects.create(patient=patient)
+    llm_before = REGISTRY.get_sample_value('careplan_stage_duration_seconds_count', {'stage': 'llm.call'}) or 0
+
+    carrier = {'trace_id': 'a' * 32, 'span_id': 'b' * 16}
+    with patch('careplan.tasks.call_llm', return_value='plan text'):
+        generate_careplan_task.apply(args=[plan.id], kwargs={'trace': carrier})
+
+    recorded = by_name(spans)
+    assert recorded['task.run'].parent_id == 'b' * 16
+    assert recorded['task.run'].attrs == {'careplan_id': plan.id}
+    assert recorded['llm.call'].parent_id == recorded['task.run'].span_id
+    assert {span.trace_id for span in spans} == {'a' * 32}
+    assert REGISTRY.get_sample_value(
+        'careplan_stage_duration_seconds_count', {'stage': 'llm.call'},
+    ) == llm_before + 1
+
+
+def test_trace_log_writes_json_lines(tmp_path):
+    path = tmp_path / 'trace.jsonl'
+    log = tracing.TraceLog(str(path))
+    tracing.add_sink(log)
+    try:
+        with tracing.span('outer'):
+            with tracing.span('inner', careplan_id=7):
+                pass
+    finally:
+        tracing.remove_sink(log)
+        log.file.close()
+
+    inner, outer = [json.loads(line) for line in path.read_text().splitlines()]
+    assert inner['name'] == 'inner'
+    assert inner['attrs'] == {'careplan_id': 7}
+    assert inner['parent_id'] == outer['span_id']
+    assert outer['duration_ms'] >= inner['duration_ms']